@@ -0,0 +1,397 @@
+"""
+Synthetic proposal workbooks and a benchmark of the fix/summary pipeline.
+© Thiha Aung (infowizard@gmail.com)
+
+Generates template-like workbooks (Config, Cover, Summary and system sheets
+with Titles, Lineitems, Descriptions, OPTION/INCLUDED/WAIVED scopes,
+lumpsum Titles and several currencies) and times each pipeline stage on
+the offline backend, so performance can be compared between revisions.
+
+Usage:
+    python benchmark.py generate out.xlsx --systems 4 --items 500
+    python benchmark.py run --sizes 100,1000 --output results.json
+    python benchmark.py run --sizes 100,1000 --compare results.json
+
+Results are written as JSON with the seconds of every stage per size (the
+minimum of --repeat runs, each on a fresh copy of the workbook) and the
+import time of the entry modules in a fresh interpreter (python -X
+importtime). --compare reports the stages slower than the baseline by more
+than --threshold and exits with status 1 if there are any.
+
+    python benchmark.py startup --budget 0.3
+
+reports the import time of the entry modules and their largest imports,
+and exits with status 1 if one takes longer than the budget.
+"""
+
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+import functions
+import offline
+
+CURRENCIES = [("USD", 1.0), ("SGD", 1.35), ("EUR", 0.92), ("MYR", 4.7)]
+QUOTED_CURRENCY = "SGD"
+HEADERS = {
+    "A": "NO", "B": "SN", "C": "Description", "D": "Qty", "E": "Unit",
+    "F": "UP", "G": "SP", "H": "Scope", "J": "Currency", "K": "UC",
+    "M": "Discount", "AB": "FUP", "AE": "UPLS", "AL": "Format",
+}  # fmt: skip
+SYSTEMS = ["CCTV", "ACCESS", "PAGA", "TELEPHONE", "LAN", "RADIO", "FIRE", "MATV"]
+PRODUCTS = [
+    "dome camera", "bullet camera", "network video recorder", "PoE switch",
+    "card reader", "door controller", "loudspeaker", "amplifier", "IP phone",
+    "fibre patch panel", "UTP cable cat6", "junction box", "20x rack screw",
+    "power supply unit", "UPS 3kVA", "workstation", "monitor , 24 inch",
+]  # fmt: skip
+DESCRIPTIONS = [
+    "- with mounting bracket", "~ IP66 rated", "* includes cable gland",
+    "stainless steel  housing", "- 5 years warranty;", "complete with accessories",
+]  # fmt: skip
+UNITS = ["nos", "ea", "pcs", "lot", "m", "set", "Nos", "EA"]
+
+# Pipeline stages of mini fix (offline) followed by summary, in order
+STAGES = [
+    "open",
+    "delete_extra_empty_row",
+    "number_title",
+    "fill_formula",
+    "format_text",
+    "format_cell_data",
+    "adjust_columns",
+    "fill_lastrow",
+    "hide_columns",
+    "calculate",
+    "summary",
+    "save",
+]
+
+# Entry modules: excel.py for the Excel buttons (RunPython starts a new
+# interpreter for each), mini.py for the CLI
+STARTUP_MODULES = ("excel", "mini")
+STARTUP_BUDGET = 0.3  # Seconds
+
+
+def generate_workbook(path, systems=4, items=100, seed=0):
+    """
+    Write a proposal workbook with the given number of system sheets of
+    about `items` rows each. The same seed gives the same workbook.
+    """
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook()
+    config = wb.active
+    config.title = "Config"
+    for row, (currency, rate) in enumerate(CURRENCIES, 2):
+        config.cell(row, 1, currency)
+        config.cell(row, 2, rate)
+    config["B12"] = QUOTED_CURRENCY
+    config["B13"] = "COMMERCIAL PROPOSAL"
+    config["B16"] = "Double"
+    config["B26"] = "Benchmark Project"
+    config["B29"] = "J00000"
+    config["B30"] = "R0"
+    wb.create_sheet("Cover")
+    wb.create_sheet("Summary")
+
+    for index in range(systems):
+        name = SYSTEMS[index % len(SYSTEMS)]
+        if index >= len(SYSTEMS):
+            name = f"{name} {index // len(SYSTEMS) + 1}"
+        _write_system(wb.create_sheet(name), name, items, rng)
+    wb.save(path)
+    return Path(path)
+
+
+def _write_system(ws, name, items, rng):
+    """Fill one system sheet: parameters, headers and about `items` rows."""
+    for column, value in {"J": 0.25, "L": 0.02, "N": 0.01, "P": 0.03, "R": 0}.items():
+        ws[f"{column}1"] = value
+    for column in range(1, 50):
+        ws.cell(2, column, f"H{get_column_letter(column)}")
+    for column, header in HEADERS.items():
+        ws[f"{column}2"] = header
+    ws["C3"] = f"{name.lower()} system"
+
+    row = 4
+    title = 0
+    while row - 4 < items:
+        title += 1
+        lumpsum = rng.random() < 0.25
+        ws[f"A{row}"] = title
+        ws[f"C{row}"] = f"{rng.choice(PRODUCTS)} works {title}"
+        if lumpsum:
+            ws[f"D{row}"] = 1
+            ws[f"E{row}"] = "lot"
+        if rng.random() < 0.1:
+            ws[f"H{row}"] = "OPTION"
+        row += 1
+        for _ in range(rng.randint(2, 8)):
+            ws[f"C{row}"] = rng.choice(PRODUCTS)
+            ws[f"D{row}"] = rng.randint(1, 40)
+            ws[f"E{row}"] = rng.choice(UNITS)
+            ws[f"J{row}"] = rng.choice(CURRENCIES)[0]
+            ws[f"K{row}"] = round(rng.uniform(5, 5000), 2)
+            scope = rng.random()
+            if scope < 0.05:
+                ws[f"H{row}"] = "OPTION"
+            elif scope < 0.1:
+                ws[f"H{row}"] = "INCLUDED"
+            elif scope < 0.12:
+                ws[f"H{row}"] = "WAIVED"
+            row += 1
+            for _ in range(rng.choice([0, 0, 1, 2])):
+                ws[f"C{row}"] = rng.choice(DESCRIPTIONS)
+                row += 1
+        # Stray empty rows, removed by delete_extra_empty_row
+        row += rng.choice([0, 0, 1, 3])
+
+
+def run_pipeline(path):
+    """Run the stages on the workbook at path; return {stage: seconds}."""
+    times = {}
+
+    def stage(name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        times[name] = time.perf_counter() - start
+        return result
+
+    app, wb = stage("open", offline.open_workbook, path)
+    stage("delete_extra_empty_row", functions.delete_extra_empty_row_wb, wb)
+    count, step = functions.get_num_scheme(wb)
+    stage("number_title", functions.number_title, wb, count=count, step=step)
+    stage("fill_formula", functions.fill_formula_wb, wb)
+    stage(
+        "format_text",
+        functions.format_text,
+        wb,
+        indent_description=True,
+        bullet_description=True,
+        title_lineitem_or_description=True,
+    )
+    stage("format_cell_data", functions.format_cell_data, wb)
+    stage("adjust_columns", functions.adjust_columns_wb, wb)
+    stage("fill_lastrow", functions.fill_lastrow, wb)
+    stage("hide_columns", functions.hide_columns_wb, wb)
+    stage("calculate", app.calculate)
+    stage("summary", functions.summary, wb, discount=True)
+    stage("save", wb.save)
+    wb.close()
+    return times
+
+
+def parse_importtime(output, module):
+    """
+    Seconds to import module and its direct imports {name: seconds}, from
+    the output of python -X importtime -c "import <module>".
+    """
+    children = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        # Imports are listed after the imports they make
+        if level == 0:
+            if name.strip() == module:
+                return seconds, children
+            children = {}
+        elif level == 1:
+            children[name.strip()] = seconds
+    raise ValueError(f"{module} not found in the importtime output")
+
+
+def import_time(module, repeat=3):
+    """
+    Import module in a fresh interpreter, repeat times. Returns the seconds
+    and direct imports {name: seconds} of the fastest run.
+    """
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=Path(__file__).parent,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timing = parse_importtime(result.stderr, module)
+        if best is None or timing[0] < best[0]:
+            best = timing
+    return best
+
+
+def run_benchmark(sizes=(100, 1000), systems=4, repeat=3, seed=0):
+    """
+    Time the pipeline for each size (rows per system sheet). Returns the
+    results dict written by `benchmark.py run`.
+    """
+    results = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "revision": _revision(),
+        "python": sys.version.split()[0],
+        "systems": systems,
+        "repeat": repeat,
+        "sizes": {},
+        "startup": {
+            module: round(import_time(module, repeat)[0], 4)
+            for module in STARTUP_MODULES
+        },
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            source = generate_workbook(
+                Path(tmp, f"source_{size}.xlsx"), systems, size, seed
+            )
+            best = {}
+            for run in range(repeat):
+                path = Path(tmp, f"run_{size}_{run}.xlsx")
+                shutil.copyfile(source, path)
+                for name, seconds in run_pipeline(str(path)).items():
+                    best[name] = min(seconds, best.get(name, seconds))
+            best["total"] = sum(best.values())
+            results["sizes"][str(size)] = {
+                name: round(seconds, 4) for name, seconds in best.items()
+            }
+    return results
+
+
+def compare(results, baseline, threshold=0.2, floor=0.05):
+    """
+    Stages slower than the baseline by more than threshold (a fraction), as
+    (size, stage, baseline seconds, seconds). Stages faster than floor
+    seconds in both runs are ignored as noise.
+    """
+    slower = []
+    groups = dict(results["sizes"])
+    before_groups = dict(baseline.get("sizes", {}))
+    # Import times, as a size of its own
+    groups["startup"] = results.get("startup", {})
+    before_groups["startup"] = baseline.get("startup", {})
+    for size, stages in groups.items():
+        before = before_groups.get(size, {})
+        for name, seconds in stages.items():
+            old = before.get(name)
+            if old is None or max(old, seconds) < floor:
+                continue
+            if seconds > old * (1 + threshold):
+                slower.append((size, name, old, seconds))
+    return slower
+
+
+def _revision():
+    """Current git commit, if any."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.group()
+def cli() -> None:
+    """Synthetic workbooks and pipeline benchmarks."""
+
+
+@cli.command("generate")
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("--systems", default=4, show_default=True, help="System sheets")
+@click.option("--items", default=100, show_default=True, help="Rows per sheet")
+@click.option("--seed", default=0, show_default=True)
+def generate_cmd(output, systems, items, seed):
+    """Write a synthetic proposal workbook."""
+    path = generate_workbook(output, systems, items, seed)
+    click.echo(f"[SUCCESS] Workbook written: {path}")
+
+
+@cli.command("run")
+@click.option("--sizes", default="100,1000", show_default=True,
+              help="Comma separated rows per system sheet")  # fmt: skip
+@click.option("--systems", default=4, show_default=True, help="System sheets")
+@click.option("--repeat", default=3, show_default=True, help="Runs per size")
+@click.option("--seed", default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False), help="Write JSON here")
+@click.option("--compare", "baseline", type=click.Path(exists=True, dir_okay=False),
+              help="Baseline JSON to compare with")  # fmt: skip
+@click.option("--threshold", default=0.2, show_default=True,
+              help="Allowed slowdown against the baseline (fraction)")  # fmt: skip
+def run_cmd(sizes, systems, repeat, seed, output, baseline, threshold):
+    """Time each pipeline stage on synthetic workbooks."""
+    sizes = [int(size) for size in sizes.split(",") if size.strip()]
+    results = run_benchmark(sizes, systems, repeat, seed)
+
+    for size, stages in results["sizes"].items():
+        click.echo(f"\n{systems} sheets x {size} rows")
+        for name, seconds in stages.items():
+            click.echo(f"  {name:<24}{seconds:>9.3f}s")
+    click.echo("\nimport")
+    for module, seconds in results["startup"].items():
+        click.echo(f"  {module:<24}{seconds:>9.3f}s")
+
+    if output:
+        Path(output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        click.echo(f"\n[SUCCESS] Results written: {output}")
+
+    if baseline:
+        old = json.loads(Path(baseline).read_text(encoding="utf-8"))
+        slower = compare(results, old, threshold)
+        for size, name, before, seconds in slower:
+            click.echo(
+                f"[SLOWER] {size} rows {name}: {before:.3f}s -> {seconds:.3f}s",
+                err=True,
+            )
+        if slower:
+            sys.exit(1)
+        click.echo(f"[SUCCESS] No stage slower than {old.get('revision')}")
+
+
+@cli.command("startup")
+@click.option("--modules", default=",".join(STARTUP_MODULES), show_default=True,
+              help="Comma separated modules to import")  # fmt: skip
+@click.option("--budget", default=STARTUP_BUDGET, show_default=True,
+              help="Allowed import time (seconds)")  # fmt: skip
+@click.option("--repeat", default=3, show_default=True, help="Runs per module")
+@click.option("--top", default=5, show_default=True, help="Direct imports shown")
+def startup_cmd(modules, budget, repeat, top):
+    """Time the import of the entry modules in a fresh interpreter."""
+    over = []
+    for module in [m.strip() for m in modules.split(",") if m.strip()]:
+        seconds, children = import_time(module, repeat)
+        click.echo(f"\n{module:<32}{seconds:>9.3f}s")
+        largest = sorted(children.items(), key=lambda item: -item[1])[:top]
+        for name, child_seconds in largest:
+            click.echo(f"  {name:<30}{child_seconds:>9.3f}s")
+        if seconds > budget:
+            over.append((module, seconds))
+    for module, seconds in over:
+        click.echo(
+            f"[SLOWER] import {module}: {seconds:.3f}s > {budget:.3f}s", err=True
+        )
+    if over:
+        sys.exit(1)
+    click.echo(f"\n[SUCCESS] All imports within {budget:.3f}s")
+
+
+if __name__ == "__main__":
+    cli()
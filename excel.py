@@ -266,8 +266,6 @@ def fill_formula_wb():
     functions.update_template_version(wb)
     update_status(app, "Cleaning up empty rows...")
     functions.delete_extra_empty_row_wb(wb)
-    # Calling twice as sometimes some rows are missed.
-    functions.delete_extra_empty_row_wb(wb)
     update_status(app, "Numbering titles...")
     count, step = functions.get_num_scheme(wb)
     functions.number_title(wb, count=count, step=step)
@@ -470,6 +468,10 @@ def download_planner():
     functions.create_new_planner()
 
 
+def refresh_templates():
+    functions.refresh_cached_files()
+
+
 def generate_sales_checklist():
     import checklists
 
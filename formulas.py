@@ -0,0 +1,272 @@
+"""
+Formulas of the system sheets, compiled to R1C1 templates.
+© Thiha Aung (infowizard@gmail.com)
+
+fill_formula() and fill_lastrow_sheet() write the formulas defined here.
+Each column formula is written in A1 style for the first row it fills (row
+3, row 4 for AL) and compiled to an R1C1 template. An R1C1 formula is the
+same text in every row, so a block of adjacent columns is written with one
+FormulaR1C1 assignment of a single row, without building or adjusting a
+formula per row:
+
+    templates = formulas.block("Q", "AA", last_row)
+    functions.set_formula_r1c1(sheet.range(f"Q3:AA{last_row}"), [templates])
+
+This module is the one definition of the formulas. test_formulas.py pins
+the critical ones and checks that every template converts back to them.
+"""
+
+import functools
+import re
+
+FIRST_ROW = 3
+# Bottom row of the lumpsum look-ahead (AJ, AP, AR, AT) is filled in with
+# pricing.lookahead_limit(last_row) as {end}
+COLUMNS = {
+    # B: Serial Numbering
+    "B": '=IF(AND(A3="", ISNUMBER(D3), ISNUMBER(K3)), COUNT(B2:INDEX($B$1:B2, XMATCH("Title", $AL$1:AL2, 0, -1))) + 1 , "")',
+    # N: UCD
+    "N": '=IF(K3<>"",K3*(1-M3),"")',
+    # O: SCD
+    "O": '=IF(AND(D3<>"", K3<>"",H3<>"OPTION"),D3*N3,"")',
+    # Q: Exchange rate
+    "Q": '=IF(J3<>"", INDEX(Config!$B$2:$B$10, XMATCH(J3, Config!$A$2:$A$10, 0))/INDEX(Config!$B$2:$B$10, XMATCH(Config!$B$12, Config!$A$2:$A$10, 0)), "")',
+    # R: UCDQ
+    "R": '=IF(AND(D3<>"", K3<>""), N3*Q3,"")',
+    # S: SCDQ
+    "S": '=IF(AND(D3<>"", K3<>"", H3<>"OPTION", INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*R3, "")',
+    # T: BUCQ
+    "T": '=IF(AND(D3<>"",K3<>""), (R3*(1+$L$1+$N$1+$P$1+$R$1))/(1-0.05),"")',
+    # U: BSCQ
+    "U": '=IF(AND(D3<>"",K3<>"",H3<>"OPTION",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*T3, "")',
+    # V: Default escalation
+    "V": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$L$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$L$1, ""))',
+    # W: Warranty
+    "W": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$N$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$N$1, ""))',
+    # X: Freight
+    "X": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$P$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$P$1, ""))',
+    # Y: Special
+    "Y": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$R$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$R$1, ""))',
+    # Z: Risk
+    "Z": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AS3-(AQ3+V3+W3+X3+Y3), IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), U3-(S3+V3+W3+X3+Y3), ""))',
+    # AA: Margin reference
+    "AA": '=IF(AND(D3<>"",K3<>""),$J$1,"")',
+    # AC: RUPQ
+    "AC": '=IF(AND(D3<>"",K3<>""),CEILING(T3/(1-AA3), 1),"")',
+    # AD: RSPQ
+    "AD": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*AC3,"")',
+    # AE: UPLS
+    "AE": '=IF(AND(D3<>"",K3<>""), IF(AB3<>"", AB3, AC3),"")',
+    # AF: SPLS
+    "AF": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*AE3,"")',
+    # AG: Profit
+    "AG": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED",AF3<>""),AF3-U3,"")',
+    # AH: Margin %
+    "AH": '=IF(AND(AG3<>"", AG3<>0), AG3/AF3, "")',
+    # AI: Total price
+    "AI": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION"), D3*AE3, "")',
+    # F: Unit Price
+    "F": '=IF(AND(AL3="Title", ISNUMBER(AJ3)), AJ3, IF(AND(AL3="Lineitem", AK3="Lumpsum", H3<>"OPTION"), "", AE3))',
+    # G: Subtotal Price
+    "G": '=IF(AND(F3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED"), D3*F3,"")',
+    # L: Subtotal Cost
+    "L": '=IF(AND(D3<>"",K3<>"",H3<>"OPTION"),D3*K3,"")',
+    # AL: Format field, from row 4 (AL3 holds "System")
+    "AL": '=IF(C4<>"",IF(AND(A4<>"",C4<>""),"Title", IF(B4<>"","Lineitem", IF(LEFT(C4,3)="***","Comment", IF(AND(A4="",B4="",C3="", C5<>"",D5<>""), "Subtitle", IF(AND(A4="",B4="",C3="", C5=""), "Subsystem", "Description"))))),"")',
+    # AJ: Lumpsum total
+    "AJ": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(AI4:INDEX(AI4:AI{end}, XMATCH("Title", AL4:AL{end}, 0, 1)-1)), "")',
+    # AK: Lumpsum/Unit Price flag
+    "AK": '=IF(AL3="Lineitem", IF(ISNUMBER(INDEX($AJ$1:AJ2, XMATCH("Title", $AL$1:AL2, 0, -1))), "Lumpsum", "Unit Price"), "")',
+    # AP: SCDQL
+    "AP": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(S4:INDEX(S4:S{end}, XMATCH("Title", AL4:AL{end}, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), R3, ""))',
+    # AQ: TCDQL (material cost)
+    "AQ": '=IF(AND(ISNUMBER(D3), ISNUMBER(AP3), H3<>"OPTION"), D3*AP3, "")',
+    # AR: BSCQL
+    "AR": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(U4:INDEX(U4:U{end}, XMATCH("Title", AL4:AL{end}, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), T3, ""))',
+    # AS: BTCQL (base cost)
+    "AS": '=IF(AND(ISNUMBER(D3), ISNUMBER(AR3), H3<>"OPTION"), D3*AR3, "")',
+    # AT: SSPL
+    "AT": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(AF4:INDEX(AF4:AF{end}, XMATCH("Title", AL4:AL{end}, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), AE3, ""))',
+    # AU: TSPL (selling price)
+    "AU": '=IF(AND(ISNUMBER(D3), H3<>"WAIVED", H3<>"INCLUDED", H3<>"OPTION", ISNUMBER(AT3)), D3*AT3, "")',
+    # AV: Total Profit
+    "AV": '=IF(AND(ISNUMBER(D3), ISNUMBER(AS3), ISNUMBER(AU3)), AU3-AS3, "")',
+    # AW: Grand Margin
+    "AW": '=IF(AND(H3<>"OPTION", ISNUMBER(D3), ISNUMBER(AU3), AU3<>0, ISNUMBER(AV3)), AV3/AU3, "")',
+}  # fmt: skip
+
+# A1: Reference formula
+REFERENCE = '= "JASON REF: " & Config!B29 &  ", REVISION: " &  Config!B30 & ", PROJECT: " & Config!B26'  # fmt: skip
+
+# Adjacent columns written together by fill_formula(), in order
+BLOCKS = [
+    ("B", "B"),
+    ("N", "O"),  # Cost calculations
+    ("Q", "AA"),  # Exchange rates & escalations
+    ("AC", "AI"),  # Pricing calculations
+    ("F", "G"),  # Unit/Subtotal Price
+    ("L", "L"),
+    ("AL", "AL"),
+    ("AJ", "AK"),  # Lumpsum flags
+    ("AP", "AW"),  # Lumpsum calculations
+]
+
+# Subtotal row written by fill_lastrow_sheet() below the last row, as A1
+# formulas of row {row}: the sums run from row 3 to {last}, the row above.
+# AR and AT are left as they are.
+TOTALS = [
+    ("F", ['="Subtotal(" & Config!B12 & ")"', "=SUM(G3:G{last})"]),
+    ("V", [f"=SUM({c}3:{c}{{last}})" for c in "VWXYZ"]),  # Default .. Risk
+    ("AQ", ["=SUM(AQ3:AQ{last})"]),  # TCDQL, material cost
+    ("AS", ["=SUM(AS3:AS{last})"]),  # BTCQL, base price after escalation
+    (
+        "AU",
+        [
+            "=SUM(AU3:AU{last})",  # TSPL, actual selling price
+            "=SUM(AV3:AV{last})",  # Total Profit
+            '=IF(AU{row}<>0,AV{row}/AU{row}, "")',  # Total Margin
+        ],
+    ),
+]
+
+_QUOTED = re.compile(r"(\"(?:[^\"]|\"\")*\"|'(?:[^']|'')*')")
+# Cell references outside of quoted strings and sheet names
+_A1 = re.compile(r"(?<![A-Za-z0-9_.$])(\$?)([A-Z]{1,3})(\$?)(\d+)(?![A-Za-z0-9_(!])")
+_R1C1 = re.compile(
+    r"(?<![A-Za-z0-9_.$])R(\[-?\d+\]|\d+)?C(\[-?\d+\]|\d+)?(?![A-Za-z0-9_(!\[])"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def column_number(letters):
+    """1-based number of a column ("A" -> 1, "AB" -> 28)."""
+    number = 0
+    for char in letters.upper():
+        number = number * 26 + ord(char) - 64
+    return number
+
+
+@functools.lru_cache(maxsize=None)
+def column_letters(number):
+    """Column letters of a 1-based column number (28 -> "AB")."""
+    letters = ""
+    while number:
+        number, rest = divmod(number - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def first_row(column):
+    """First row fill_formula() writes the column's formula to."""
+    return FIRST_ROW + 1 if column == "AL" else FIRST_ROW
+
+
+def to_r1c1(formula, row, column):
+    """R1C1 form of an A1 formula written to cell (row, column)."""
+    out = []
+    for i, part in enumerate(_QUOTED.split(formula)):
+        if i % 2:
+            out.append(part)
+            continue
+        # text, col_abs, letters, row_abs, number, text, ...
+        pieces = _A1.split(part)
+        out.append(pieces[0])
+        for k in range(1, len(pieces), 5):
+            col_abs, letters, row_abs, number, text = pieces[k : k + 5]
+            number = int(number)
+            col = column_number(letters)
+            out.append(f"R{number}" if row_abs else _offset("R", number - row))
+            out.append(f"C{col}" if col_abs else _offset("C", col - column))
+            out.append(text)
+    return "".join(out)
+
+
+@functools.lru_cache(maxsize=512)
+def _r1c1_pieces(template):
+    """Split an R1C1 formula into text and (row, row_abs, col, col_abs) references."""
+    pieces = []
+    for i, part in enumerate(_QUOTED.split(template)):
+        if i % 2:
+            pieces.append(part)
+            continue
+        pos = 0
+        for match in _R1C1.finditer(part):
+            pieces.append(part[pos : match.start()])
+            r, c = match.groups()
+            pieces.append((
+                int(r.strip("[]")) if r else 0, bool(r) and not r.startswith("["),
+                int(c.strip("[]")) if c else 0, bool(c) and not c.startswith("["),
+            ))  # fmt: skip
+            pos = match.end()
+        pieces.append(part[pos:])
+    return tuple(pieces)
+
+
+def from_r1c1(template, row, column):
+    """A1 form of an R1C1 formula written to cell (row, column)."""
+    out = []
+    for piece in _r1c1_pieces(template):
+        if isinstance(piece, str):
+            out.append(piece)
+            continue
+        r, row_abs, c, col_abs = piece
+        col = column_letters(c if col_abs else column + c)
+        out.append(
+            ("$" if col_abs else "") + col + (f"${r}" if row_abs else str(row + r))
+        )
+    return "".join(out)
+
+
+def _offset(axis, offset):
+    return f"{axis}[{offset}]" if offset else axis
+
+
+def formula(column, last_row, group_keys=False):
+    """
+    A1 formula of a column for its first row on a sheet filled to last_row,
+    rewritten for the group key column with group_keys.
+    """
+    import pricing
+
+    if column == pricing.GROUP_COLUMN:
+        return pricing.GROUP_KEY_FORMULA
+    text = COLUMNS[column].replace("{end}", str(pricing.lookahead_limit(last_row)))
+    if group_keys:
+        text = pricing.group_formula(text, last_row)
+    return text
+
+
+def subtotals(row):
+    """
+    [(first column, R1C1 formulas)] of the TOTALS blocks for a subtotal row,
+    checked to convert back to their A1 formulas.
+    """
+    blocks = []
+    for first, texts in TOTALS:
+        number = column_number(first)
+        templates = []
+        for offset, text in enumerate(texts):
+            text = text.format(row=row, last=row - 1)
+            template = to_r1c1(text, row, number + offset)
+            if from_r1c1(template, row, number + offset) != text:
+                raise ValueError(f"Subtotal formula does not compile to R1C1: {text}")
+            templates.append(template)
+        blocks.append((first, templates))
+    return blocks
+
+
+@functools.lru_cache(maxsize=256)
+def block(first, last, last_row, group_keys=False):
+    """
+    R1C1 templates of the columns first:last, checked to convert back to
+    the A1 formulas they were compiled from.
+    """
+    templates = []
+    for number in range(column_number(first), column_number(last) + 1):
+        letters = column_letters(number)
+        text = formula(letters, last_row, group_keys)
+        template = to_r1c1(text, first_row(letters), number)
+        if from_r1c1(template, first_row(letters), number) != text:
+            raise ValueError(f"Formula of column {letters} does not compile to R1C1: {text}")
+        templates.append(template)
+    return tuple(templates)
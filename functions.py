@@ -1,8 +1,8 @@
 """Multiple functions to support Excel automation.
 © Thiha Aung (infowizard@gmail.com)
 For the excel, the last row technically is 1048576.
-However, I have hard-limited this to 1500 rows.
-The code will need to be updated if more rows are needed.
+Last rows are found below the used range (get_last_row()), and the formulas
+that look ahead to the next title cover the whole sheet on longer sheets.
 """
 
 import getpass
@@ -12,6 +12,7 @@ import shutil
 import subprocess
 import sys
 import tempfile
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
@@ -21,7 +22,9 @@ import xlwings as xw  # type: ignore
 import string
 
 import hide
-import checklist_collections as cc
+import formulas
+import normalize
+import pricing
 
 LEGEND = {
     "UC": "Unit cost in original (buying) currency",
@@ -62,6 +65,49 @@ def get_macro_nb():
     return _MACRO_NB
 
 
+def personal_macro_path():
+    """PERSONAL.XLSB in the user's XLSTART folder, or None if it isn't there."""
+    if sys.platform == "win32":
+        root = Path(os.environ.get("APPDATA") or Path.home() / "AppData/Roaming")
+        path = root / "Microsoft" / "Excel" / "XLSTART" / "PERSONAL.XLSB"
+    elif sys.platform == "darwin":
+        path = (
+            Path.home()
+            / "Library/Group Containers/UBF8T346G9.Office/User Content.localized"
+            / "Startup.localized/Excel/PERSONAL.XLSB"
+        )
+    else:
+        return None
+    return path if path.is_file() else None
+
+
+def open_macro_nb(app):
+    """
+    Use the PERSONAL.XLSB of app for get_macro_nb(), so that the macros run
+    in app and not in another Excel instance. Excel started through
+    automation doesn't load XLSTART, so the book is opened (read only) from
+    there if app hasn't got it. Returns the book, or None if not found.
+    """
+    global _MACRO_NB
+    clear_macro_cache()
+    for book in app.books:
+        if book.name.upper() == "PERSONAL.XLSB":
+            _MACRO_NB = book
+            return book
+    path = personal_macro_path()
+    if path is None:
+        return None
+    _MACRO_NB = app.books.open(str(path), read_only=True)
+    return _MACRO_NB
+
+
+def clear_macro_cache():
+    """Forget PERSONAL.XLSB and its cached ranges (e.g. after Excel restarts)."""
+    global _MACRO_NB
+    _MACRO_NB = None
+    _PERSONAL_RANGE_CACHE.clear()
+
+
 def run_macro(macro_name):
     """Run a VBA macro from PERSONAL.XLSB."""
     get_macro_nb().macro(macro_name)()
@@ -102,6 +148,9 @@ def copy_design_row(pwb, row_num, dest_range):
         row_num: The row number to copy from Design sheet (e.g., "5:5" or "21:21")
         dest_range: The destination range object
     """
+    if getattr(dest_range, "offline", False):
+        # Design rows live in PERSONAL.XLSB, which needs Excel
+        return
     get_cached_range("Design", row_num).copy(dest_range)
 
 
@@ -122,7 +171,10 @@ def apply_lastrow_border(row_range):
     xlThin = 2
 
     # Color #0332FF: R=3, G=50, B=255
-    if sys.platform == "win32":
+    if getattr(row_range, "offline", False):
+        # Offline backend (offline.py): set the borders directly
+        row_range.set_borders(["top", "bottom"], (3, 50, 255))
+    elif sys.platform == "win32":
         # Windows: Use COM API directly (pure Python)
         # Color in BGR long integer format for Windows
         color = 255 * 65536 + 50 * 256 + 3  # 16724483
@@ -246,6 +298,11 @@ def _find_workbook_in_rfqs(workbook_name: str, base_path: Path) -> Path | None:
     Searches year subfolders (2024/, 2025/, 2026/, etc.) up to 5 levels deep.
     Returns the shallowest match if multiple are found.
 
+    The year folders are walked together, one depth level at a time, with
+    the folders of a level listed in parallel (rfq_index.walk_levels()).
+    The walk stops at the first level with a match, as deeper matches can't
+    be the shallowest.
+
     Args:
         workbook_name: The filename to search for (e.g., "JEC-2026-001-v1.xlsx")
         base_path: The @rfqs base path to search in
@@ -253,58 +310,49 @@ def _find_workbook_in_rfqs(workbook_name: str, base_path: Path) -> Path | None:
     Returns:
         Path to the directory containing the workbook, or None if not found.
     """
-    matches: list[tuple[int, Path]] = []  # (depth, parent_dir)
-    workbook_name_lower = workbook_name.lower()
-    max_depth = 5
-
-    # Get current year to search recent years first
-    current_year = datetime.now().year
-    year_folders = []
-
-    # Check years from current down to 2020
-    for year in range(current_year, 2019, -1):
-        year_path = base_path / str(year)
-        if year_path.is_dir() and not year_path.is_symlink():
-            year_folders.append(year_path)
-
-    # Use iterative BFS instead of recursion to avoid stack overflow
-    # Each item is (directory, depth)
-    for year_folder in year_folders:
-        queue: list[tuple[Path, int]] = [(year_folder, 1)]
+    import rfq_index
 
-        while queue:
-            directory, depth = queue.pop(0)
-
-            if depth > max_depth:
-                continue
+    workbook_name_lower = workbook_name.lower()
 
-            try:
-                for entry in directory.iterdir():
-                    # Skip symbolic links to avoid cycles
-                    if entry.is_symlink():
-                        continue
-
-                    if entry.is_file() and entry.name.lower() == workbook_name_lower:
-                        matches.append((depth, directory))
-                    elif entry.is_dir():
-                        queue.append((entry, depth + 1))
-            except (PermissionError, OSError):
-                # Skip directories we can't access
-                continue
+    def scan(directory):
+        """Whether a folder holds the workbook, and its sub folders."""
+        files, subdirs = rfq_index.list_folder(directory)
+        found = any(name.lower() == workbook_name_lower for name in files)
+        return found, [directory / name for name in subdirs]
+
+    matches: list[Path] = []
+    # Years from current down to 2020, recent years first, then breadth first
+    for level in rfq_index.walk_levels(rfq_index.year_folders(base_path), scan):
+        matches = [directory for directory, found in level if found]
+        if matches:
+            break
 
     if not matches:
         return None
 
-    # Sort by depth (shallowest first)
-    matches.sort(key=lambda x: x[0])
-
     if len(matches) > 1:
         # Multiple matches found - alert user, use shallowest
         print(
-            f"Note: Found {len(matches)} locations for '{workbook_name}'. Using: {matches[0][1]}"
+            f"Note: Found {len(matches)} locations for '{workbook_name}'. Using: {matches[0]}"
         )
 
-    return matches[0][1]
+    return matches[0]
+
+
+def _find_workbook_indexed(workbook_name: str, base_path: Path) -> Path | None:
+    """
+    _find_workbook_in_rfqs() through the persistent index of rfq_index.py,
+    which only lists the folders changed since the last lookup. Falls back
+    to the full walk if the index database can't be used.
+    """
+    import sqlite3
+
+    import rfq_index
+
+    try:
+        return rfq_index.find_workbook(workbook_name, base_path)
+    except (sqlite3.Error, OSError):
+        return _find_workbook_in_rfqs(workbook_name, base_path)
 
 
 def get_workbook_directory(wb):
@@ -344,7 +392,7 @@ def get_workbook_directory(wb):
         # Try to find the workbook in the @rfqs folder first
         rfq_base = _get_rfq_base_path()
         if rfq_base is not None:
-            found_dir = _find_workbook_in_rfqs(wb.name, rfq_base)
+            found_dir = _find_workbook_indexed(wb.name, rfq_base)
             if found_dir is not None:
                 return (str(found_dir), True)
 
@@ -379,11 +427,33 @@ LATEST_WB_VERSION = "R2"
 LATEST_MINOR_REVISION = "M3"
 UPDATE_MESSAGE = "Now you can choose the number scheme. Single or Double."
 
+# Last row of a worksheet
+MAX_ROW = 1048576
+# Longest address Excel accepts for a range (e.g. of several areas)
+MAX_ADDRESS = 255
+
 # Skipped sheets (includes TN as alias for Technical_Notes)
 # Note: "Scratch" is handled case-insensitively via should_skip_sheet()
 SKIP_SHEETS = ["Config", "Cover", "Summary", "Technical_Notes", "TN", "T&C", "Scratch"]
 
 
+def get_last_row(sheet, column="C", bottom=None):
+    """
+    Last non-empty row of a column (1 if empty), like
+    sheet.range("C1500").end("up").row without the 1500-row ceiling.
+
+    The probe starts just below the used range, so it costs two calls
+    however long the sheet is. Pass bottom (the last row of the used range)
+    to probe several columns of a sheet.
+    """
+    if bottom is None:
+        bottom = sheet.used_range.last_cell.row
+    if bottom >= MAX_ROW:
+        cell = sheet.range(f"{column}{MAX_ROW}")
+        return MAX_ROW if cell.value not in (None, "") else cell.end("up").row
+    return sheet.range(f"{column}{bottom + 1}").end("up").row
+
+
 def should_skip_sheet(sheet_name):
     """
     Check if a sheet should be skipped during processing.
@@ -508,41 +578,16 @@ def is_sheet_name(name, canonical):
 
 
 def set_nitty_gritty(text):
-    """Fix annoying text"""
-    # Strip EOL
-    text = text.strip()
-    # Strip 2 or more spaces
-    text = re.sub(" {2,}", " ", text)
-    # Put bullet point for Sub-subitem preceded by '-' or '~'.
-    text = re.sub("^(-|~)", "•", text)
-    # Put bullet point for Sub-subitem preceded by a single * followed by space.
-    text = re.sub(r"^[*?]\s", " • ", text)
-    # Instead of ';' at the end of line, use ':' instead.
-    text = re.sub(";$", ":", text)
-    text = set_comma_space(text)
-    text = set_x(text)
-    return text
+    """Fix annoying text (rules in normalize.py)"""
+    return normalize.nitty_gritty(text)
 
 
 def set_comma_space(text):
     """Fix having space before comma and not having space after comma"""
-    # fix word+space+, to word+,
-    x = re.compile(r"\w+\s,")
-    if x.search(text):
-        substring = re.findall(r"\w+\s,", text)
-        for word in substring:
-            text = re.sub(word, word[:-2] + ",", text)
-
-    # Fix word+,+no-space to word+,+space
-    x = re.compile(r",\d?\w+")
-    if x.search(text):
-        # Ignores format like 1,200 but matches 1,w
-        substring = re.findall(r"(?<![0-9]),\w+", text)
-        for word in substring:
-            text = re.sub(word, ", " + word[1:], text)
-    return text
+    return normalize.apply(normalize.COMMA_SPACE, text)
 
 
+@normalize.cached
 def title_case_ignore_double_char(text):
     words = text.split()
     titled_words = []
@@ -557,6 +602,7 @@ def title_case_ignore_double_char(text):
     return " ".join(titled_words)
 
 
+@normalize.cached
 def set_case_preserve_acronym(text, title=False, capitalize=False, upper=False):
     """Maintaion acronyms case when using title or sentence"""
     # The regex below essentially ignore the letters in lower case letter.
@@ -594,166 +640,125 @@ def set_case_preserve_acronym(text, title=False, capitalize=False, upper=False):
 def set_x(text):
     """Function to replace description such as 1x, 20x, 10X ,
     x1, x20, X20 into 1 x, 20 x, 10 x, x 1, x 20, X 10 etc."""
-    # For cases such as 20x, 30X. Allows if followed by -
-    x = re.compile(r"\d+x(?!-)|\d+X(?!-)")
-    if x.search(text):
-        substring = re.findall(r"(\d+x|\d+X)", text)
-        for word in substring:
-            text = re.sub(word, (word[:-1] + " x"), text)
-    # For cases such as x20, X30
-    x = re.compile(r"(x\d+|X\d+)")
-    if x.search(text):
-        substring = re.findall(r"(x\d+|X\d+)", text)
-        for word in substring:
-            text = re.sub(word, ("x " + word[1:]), text)
-    # For cases such as 20 X, 30 X
-    x = re.compile(r"(\d+ X)")
-    if x.search(text):
-        substring = re.findall(r"(\d+ X)", text)
-        for word in substring:
-            text = re.sub(word, (word[:-1] + "x"), text)
-    # For cases such as X 20, X 30
-    x = re.compile(r"(X \d+)")
-    if x.search(text):
-        substring = re.findall(r"(X \d+)", text)
-        for word in substring:
-            text = re.sub(word, ("x" + word[1:]), text)
-    return text
-
-
-def fill_formula(sheet):
-    """
-    Fill formulas in a sheet for pricing calculations.
+    return normalize.apply(normalize.X, text)
 
-    Optimized to batch adjacent column formula assignments, reducing COM calls
-    from ~30 to ~10 for significant performance improvement.
-    """
-    if not should_skip_sheet(sheet.name):
-        # Formula to cells
-        # Increase the last row by 1 so that the cells are not left empty
-        last_row = sheet.range("C1500").end("up").row + 1
-        lr = str(last_row)
 
-        # A1: Reference formula (single cell)
-        sheet.range("A1").formula = (
-            '= "JASON REF: " & Config!B29 &  ", REVISION: " &  Config!B30 & ", PROJECT: " & Config!B26'
-        )
+def set_formula_r1c1(rng, templates):
+    """Write R1C1 formulas to a range, as Range.FormulaR1C1 (cross-platform)."""
+    if getattr(rng, "offline", False):
+        # Offline backend (offline.py)
+        rng.formula_r1c1 = templates
+    elif sys.platform == "win32":
+        rng.api.FormulaR1C1 = templates
+    else:
+        rng.api.formula_r1c1.set(templates)
 
-        # B: Serial Numbering (single column)
-        sheet.range("B3:B" + lr).formula = (
-            '=IF(AND(A3="", ISNUMBER(D3), ISNUMBER(K3)), COUNT(B2:INDEX($B$1:B2, XMATCH("Title", $AL$1:AL2, 0, -1))) + 1 , "")'
-        )
 
-        # BATCH 1: Columns N, O (2 adjacent columns) - Cost calculations
-        sheet.range("N3:O" + lr).formula = [
-            [
-                '=IF(K3<>"",K3*(1-M3),"")',  # N: UCD
-                '=IF(AND(D3<>"", K3<>"",H3<>"OPTION"),D3*N3,"")',  # O: SCD
-            ]
-        ]
+def get_formula_r1c1(rng):
+    """R1C1 formulas of a range as rows of strings (Range.FormulaR1C1)."""
+    if getattr(rng, "offline", False):
+        templates = rng.formula_r1c1
+    elif sys.platform == "win32":
+        templates = rng.api.FormulaR1C1
+    else:
+        templates = rng.api.formula_r1c1.get()
+    if isinstance(templates, str):
+        return [(templates,)]
+    return [tuple(row) for row in templates]
 
-        # BATCH 2: Columns Q through AA (11 adjacent columns) - Exchange rates & escalations
-        sheet.range("Q3:AA" + lr).formula = [
-            [
-                # Q: Exchange rate
-                '=IF(J3<>"", INDEX(Config!$B$2:$B$10, XMATCH(J3, Config!$A$2:$A$10, 0))/INDEX(Config!$B$2:$B$10, XMATCH(Config!$B$12, Config!$A$2:$A$10, 0)), "")',
-                # R: UCDQ
-                '=IF(AND(D3<>"", K3<>""), N3*Q3,"")',
-                # S: SCDQ
-                '=IF(AND(D3<>"", K3<>"", H3<>"OPTION", INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*R3, "")',
-                # T: BUCQ
-                '=IF(AND(D3<>"",K3<>""), (R3*(1+$L$1+$N$1+$P$1+$R$1))/(1-0.05),"")',
-                # U: BSCQ
-                '=IF(AND(D3<>"",K3<>"",H3<>"OPTION",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*T3, "")',
-                # V: Default escalation
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$L$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$L$1, ""))',
-                # W: Warranty
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$N$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$N$1, ""))',
-                # X: Freight
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$P$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$P$1, ""))',
-                # Y: Special
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$R$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$R$1, ""))',
-                # Z: Risk
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AS3-(AQ3+V3+W3+X3+Y3), IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), U3-(S3+V3+W3+X3+Y3), ""))',
-                # AA: Margin reference
-                '=IF(AND(D3<>"",K3<>""),$J$1,"")',
-            ]
-        ]
 
-        # BATCH 3: Columns AC through AI (7 adjacent columns) - Pricing calculations
-        sheet.range("AC3:AI" + lr).formula = [
-            [
-                # AC: RUPQ
-                '=IF(AND(D3<>"",K3<>""),CEILING(T3/(1-AA3), 1),"")',
-                # AD: RSPQ
-                '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*AC3,"")',
-                # AE: UPLS
-                '=IF(AND(D3<>"",K3<>""), IF(AB3<>"", AB3, AC3),"")',
-                # AF: SPLS
-                '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*AE3,"")',
-                # AG: Profit
-                '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED",AF3<>""),AF3-U3,"")',
-                # AH: Margin %
-                '=IF(AND(AG3<>"", AG3<>0), AG3/AF3, "")',
-                # AI: Total price
-                '=IF(AND(D3<>"",K3<>"", H3<>"OPTION"), D3*AE3, "")',
-            ]
-        ]
+def fill_formula(sheet, snapshot=None, group_keys=False, incremental=True):
+    """
+    Fill formulas in a sheet for pricing calculations.
 
-        # BATCH 4: Columns F, G (2 adjacent columns) - Unit/Subtotal Price
-        sheet.range("F3:G" + lr).formula = [
-            [
-                # F: Unit Price
-                '=IF(AND(AL3="Title", ISNUMBER(AJ3)), AJ3, IF(AND(AL3="Lineitem", AK3="Lumpsum", H3<>"OPTION"), "", AE3))',
-                # G: Subtotal Price
-                '=IF(AND(F3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED"), D3*F3,"")',
-            ]
-        ]
+    The formulas come from formulas.py as R1C1 templates, so each block of
+    adjacent columns (formulas.BLOCKS) is written with one FormulaR1C1
+    assignment.
 
-        # L: Subtotal Cost (single column)
-        sheet.range("L3:L" + lr).formula = (
-            '=IF(AND(D3<>"",K3<>"",H3<>"OPTION"),D3*K3,"")'
-        )
+    With group_keys, a helper column (AX) holds the Title row each row belongs
+    to, and the formulas looking for the owning or next Title use it instead
+    of searching (see pricing.group_formula()). Same numbers, but the
+    recalculation no longer grows quadratically with the sheet length.
 
-        # AL: Format field (special handling - values and formulas)
-        sheet.range("AL1").value = "Title"
-        sheet.range("AL3").value = "System"
-        sheet.range("AL4:AL" + lr).formula = (
-            '=IF(C4<>"",IF(AND(A4<>"",C4<>""),"Title", IF(B4<>"","Lineitem", IF(LEFT(C4,3)="***","Comment", IF(AND(A4="",B4="",C3="", C5<>"",D5<>""), "Subtitle", IF(AND(A4="",B4="",C3="", C5=""), "Subsystem", "Description"))))),"")'
-        )
-        sheet.range("AL" + str(last_row + 1)).value = "Title"
+    With incremental (the default) the current formulas are read with one
+    call and only the rows that differ from the expected formulas are
+    written, e.g. a line added since the last fill. Unchanged rows are not
+    written, so Excel does not recalculate them. Returns the number of
+    ranges written.
+    """
+    if not should_skip_sheet(sheet.name):
+        # Formula to cells
+        # Increase the last row by 1 so that the cells are not left empty
+        if snapshot is not None:
+            last_row = snapshot.last_row(sheet.name, "C") + 1
+            # Only the cells written below hold new formulas (and values)
+            columns = [*formulas.COLUMNS, "AL"]
+            if group_keys:
+                columns.append(pricing.GROUP_COLUMN)
+            snapshot.invalidate(sheet.name, ["A"], rows=(1, 1))
+            snapshot.invalidate(sheet.name, columns, rows=(1, last_row + 1))
+        else:
+            last_row = get_last_row(sheet, "C") + 1
+
+        # Current R1C1 formulas (and values) of the sheet, read once
+        last_col = pricing.GROUP_COLUMN if group_keys else "AW"
+        current = None
+        if incremental:
+            current = get_formula_r1c1(sheet.range(f"A1:{last_col}{last_row + 1}"))
+        writes = 0
+
+        def put(column, row, value, formula=True):
+            """Write a single cell unless it already holds value."""
+            nonlocal writes
+            number = formulas.column_number(column)
+            if formula:
+                value = formulas.to_r1c1(value, row, number)
+            if current is not None and str(current[row - 1][number - 1]) == str(value):
+                return
+            if formula:
+                set_formula_r1c1(sheet.range(f"{column}{row}"), value)
+            else:
+                sheet.range(f"{column}{row}").value = value
+            writes += 1
+
+        def fill(first_col, last_col):
+            """
+            Fill columns first_col:last_col down to the last row, or only the
+            rows that differ from their templates if incremental.
+            """
+            nonlocal writes
+            templates = formulas.block(first_col, last_col, last_row, group_keys)
+            value = templates[0] if len(templates) == 1 else [list(templates)]
+            first_row = formulas.first_row(first_col)
+            if current is None:
+                runs = [(0, last_row - first_row + 1)]
+            else:
+                c1 = formulas.column_number(first_col) - 1
+                have = [
+                    row[c1 : c1 + len(templates)]
+                    for row in current[first_row - 1 : last_row]
+                ]
+                runs = changed_runs(have, [templates] * len(have))
+            for start, stop in runs:
+                rows = f"{first_col}{first_row + start}:{last_col}{first_row + stop - 1}"
+                set_formula_r1c1(sheet.range(rows), value)
+                writes += 1
 
-        # BATCH 5: Columns AJ, AK (2 adjacent columns) - Lumpsum flags
-        sheet.range("AJ3:AK" + lr).formula = [
-            [
-                # AJ: Lumpsum total
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(AI4:INDEX(AI4:AI1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)), "")',
-                # AK: Lumpsum/Unit Price flag
-                '=IF(AL3="Lineitem", IF(ISNUMBER(INDEX($AJ$1:AJ2, XMATCH("Title", $AL$1:AL2, 0, -1))), "Lumpsum", "Unit Price"), "")',
-            ]
-        ]
+        if group_keys:
+            # AX: Group key
+            fill(pricing.GROUP_COLUMN, pricing.GROUP_COLUMN)
 
-        # BATCH 6: Columns AP through AW (8 adjacent columns) - Lumpsum calculations
-        sheet.range("AP3:AW" + lr).formula = [
-            [
-                # AP: SCDQL
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(S4:INDEX(S4:S1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), R3, ""))',
-                # AQ: TCDQL (material cost)
-                '=IF(AND(ISNUMBER(D3), ISNUMBER(AP3), H3<>"OPTION"), D3*AP3, "")',
-                # AR: BSCQL
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(U4:INDEX(U4:U1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), T3, ""))',
-                # AS: BTCQL (base cost)
-                '=IF(AND(ISNUMBER(D3), ISNUMBER(AR3), H3<>"OPTION"), D3*AR3, "")',
-                # AT: SSPL
-                '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(AF4:INDEX(AF4:AF1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), AE3, ""))',
-                # AU: TSPL (selling price)
-                '=IF(AND(ISNUMBER(D3), H3<>"WAIVED", H3<>"INCLUDED", H3<>"OPTION", ISNUMBER(AT3)), D3*AT3, "")',
-                # AV: Total Profit
-                '=IF(AND(ISNUMBER(D3), ISNUMBER(AS3), ISNUMBER(AU3)), AU3-AS3, "")',
-                # AW: Grand Margin
-                '=IF(AND(H3<>"OPTION", ISNUMBER(D3), ISNUMBER(AU3), AU3<>0, ISNUMBER(AV3)), AV3/AU3, "")',
-            ]
-        ]
+        # A1: Reference formula (single cell)
+        put("A", 1, formulas.REFERENCE)
+
+        # AL: Format field (special handling - values and formulas)
+        put("AL", 1, "Title", formula=False)
+        put("AL", 3, "System", formula=False)
+        for first_col, last_col in formulas.BLOCKS:
+            fill(first_col, last_col)
+        put("AL", last_row + 1, "Title", formula=False)
+        return writes
+    return 0
 
 
 def sanitize_config_string(value):
@@ -806,10 +811,31 @@ def sanitize_config_sheet(wb):
     config.range("B21:B32").wrap_text = False
 
 
-def fill_formula_wb(wb):
+def fill_formula_wb(wb, snapshot=None, group_keys=False):
     sanitize_config_sheet(wb)
     for sheet in wb.sheets:
-        fill_formula(sheet)
+        fill_formula(sheet, snapshot=snapshot, group_keys=group_keys)
+
+
+def price_workbook(wb):
+    """
+    Price every system sheet without an Excel recalculation.
+
+    Reads the raw inputs of each sheet and computes the fill_formula() columns
+    with the pricing engine. Returns a dict of sheet name -> DataFrame indexed
+    by Excel row number.
+    """
+    config = wb.sheets["Config"]
+    rates = pricing.read_rates(config.range("A2:B10").value)
+    quoted_currency = config.range("B12").value
+    priced = {}
+    for sheet in wb.sheets:
+        if should_skip_sheet(sheet.name):
+            continue
+        last_row = get_last_row(sheet, "C")
+        values = sheet.range(f"A1:AL{last_row + 1}").options(ndim=2).value
+        priced[sheet.name] = pricing.price_sheet(values, rates, quoted_currency)
+    return priced
 
 
 def fill_lastrow(wb):
@@ -820,68 +846,21 @@ def fill_lastrow(wb):
 
 def fill_lastrow_sheet(wb, sheet):  # type: ignore
     if not should_skip_sheet(sheet.name):
-        last_row = sheet.range("C1500").end("up").row
+        last_row = get_last_row(sheet, "C")
         # Apply top and bottom border with color #0332FF (pure Python, cross-platform)
         row_range = sheet.range(f"{last_row + 2}:{last_row + 2}")
         apply_lastrow_border(row_range)
-        sheet.range("F" + str(last_row + 2)).formula = '="Subtotal(" & Config!B12 & ")"'
+        # Subtotals (formulas.TOTALS), one FormulaR1C1 write per block
+        for first_col, templates in formulas.subtotals(last_row + 2):
+            last_col = formulas.column_letters(
+                formulas.column_number(first_col) + len(templates) - 1
+            )
+            set_formula_r1c1(
+                sheet.range(f"{first_col}{last_row + 2}:{last_col}{last_row + 2}"),
+                [templates],
+            )
         sheet.range("F" + str(last_row + 2)).font.size = 9
-        sheet.range("G" + str(last_row + 2)).formula = (
-            "=SUM(G3:G" + str(last_row + 1) + ")"
-        )
-        # SCDQ: Subtotal cost after discount in quoted currency
-        # sheet.range("S" + str(last_row + 2)).formula = (
-        #     "=SUM(S3:S" + str(last_row + 1) + ")"
-        # )
-        # BSCQ: Base subtotal cost in quoted currency
-        # sheet.range("U" + str(last_row + 2)).formula = (
-        #     "=SUM(U3:U" + str(last_row + 1) + ")"
-        # )
-        # Default
-        sheet.range("V" + str(last_row + 2)).formula = (
-            "=SUM(V3:V" + str(last_row + 1) + ")"
-        )
-        # Warranty
-        sheet.range("W" + str(last_row + 2)).formula = (
-            "=SUM(W3:W" + str(last_row + 1) + ")"
-        )
-        # Freight (Inbound)
-        sheet.range("X" + str(last_row + 2)).formula = (
-            "=SUM(X3:X" + str(last_row + 1) + ")"
-        )
-        # Special (Conditions)
-        sheet.range("Y" + str(last_row + 2)).formula = (
-            "=SUM(Y3:Y" + str(last_row + 1) + ")"
-        )
-        # Risk
-        sheet.range("Z" + str(last_row + 2)).formula = (
-            "=SUM(Z3:Z" + str(last_row + 1) + ")"
-        )
-        # sheet.range("AF" + str(last_row + 2)).formula = (
-        #     "=SUM(AF3:AF" + str(last_row + 1) + ")"
-        # )
-        # sheet.range("AG" + str(last_row + 2)).formula = (
-        #     "=SUM(AG3:AG" + str(last_row + 1) + ")"
-        # )
-        # sheet.range("AH" + str(last_row + 2)).formula = (
-        #     "=AG" + str(last_row + 2) + "/AF" + str(last_row + 2)
-        # )
         sheet.range("AL" + str(last_row + 2)).value = "Title"
-        # TCDQL(Total Cost after Discount in Quoted Currency Lumpsum)
-        # Material cost
-        sheet.range(f"AQ{str(last_row + 2)}").formula = f"=SUM(AQ3:AQ{last_row+1})"
-        # BTCQL (Base Total Cost in Quoted Currency Lumpsum)
-        # Base price after escalation
-        sheet.range(f"AS{str(last_row + 2)}").formula = f"=SUM(AS3:AS{last_row+1})"
-        # TSPL (Total Selling Price Lumpsum)
-        # Actual selling price
-        sheet.range(f"AU{str(last_row + 2)}").formula = f"=SUM(AU3:AU{last_row+1})"
-        # TP (Total Profit)
-        sheet.range(f"AV{str(last_row + 2)}").formula = f"=SUM(AV3:AV{last_row+1})"
-        # Total Margin
-        sheet.range(f"AW{str(last_row + 2)}").formula = (
-            f'=IF(AU{str(last_row+2)}<>0,AV{str(last_row + 2)}/AU{str(last_row + 2)}, "")'
-        )
         # The formatting for added row.
         sheet.range(f"AW{str(last_row + 2)}").number_format = "0.00%"
         # Format
@@ -935,6 +914,10 @@ def adjust_columns_wb(wb):
 def hide_columns(sheet):
     if not should_skip_sheet(sheet.name):
         sheet.range("AI:AL").column_width = 0
+        key = pricing.GROUP_COLUMN
+        # Group keys only, if fill_formula(group_keys=True) wrote them
+        if str(sheet.range(f"{key}3").formula).startswith("="):
+            sheet.range(f"{key}:{key}").column_width = 0
         sheet.range("AC:AD").column_width = 0
         sheet.range("AF:AF").column_width = 0
         sheet.range("S:AA").column_width = 0
@@ -966,531 +949,215 @@ def hide_columns_wb(wb):
         hide_columns(sheet)
 
 
-def summary(wb, discount=False, detail=False, simulation=True, discount_level=15):
+def summary(
+    wb, discount=False, detail=False, simulation=True, discount_level=15, snapshot=None
+):
+    """
+    Build the Summary sheet: a row per system, the totals, the notes and,
+    with discount, the discount simulation table.
+
+    The formulas are laid out in memory and written with one range
+    assignment per contiguous block; formats and colors are applied per
+    block. Remarks (column E) and the special discount survive a rebuild.
+    """
     # Calculate first to ensure we read fresh values (not stale)
     wb.app.calculate()
 
-    summary_formula = []
-    collect = []  # Collect formula to be put in summary page.
-    # formula_fragment = '=IF(OR(Config!B13="COMMERCIAL PROPOSAL", Config!B13="BUDGETARY PROPOSAL"),'
     # The design will now be taken from PERSONAL.XLSB (Windows only)
-    pwb = get_macro_nb()
+    # Not available for the offline backend, where design rows are skipped.
+    pwb = None if getattr(wb, "offline", False) else get_macro_nb()
 
     # Initialize counters
     start_row = 19
-    count = 1
-    offset = 20
+    first_row = start_row + 1
     sheet = wb.sheets["Summary"]
-
-    # Need to collect information if already exists so that it can be repopulated
-    # Count actual system sheets (excluding skipped sheets like Config, Cover, Scratch, etc.)
-    system_count = sum(1 for s in wb.sheet_names if not should_skip_sheet(s))
-    remarks = {}
+    systems = [name for name in wb.sheet_names if not should_skip_sheet(name)]
+    system_count = len(systems)
+    offset = first_row + system_count  # Line below the systems
+    total_row = offset + 1
+
+    # Need to collect information if already exists so that it can be repopulated:
+    # the remarks such as 'OPTION' (C:E of the system rows) and the discount,
+    # without checking whether data exists or not.
+    discount_row = system_count + start_row + 3
+    previous = sheet.range(f"C{first_row}:E{discount_row}").options(ndim=2).value
+    remarks = {row[0]: row[2] for row in previous[:system_count]}
     discount_price = 0
+    if previous[-1][0] in ["SPECIAL DISCOUNT", "SPECIAL PROJECT DISCOUNT"]:
+        discount_price = previous[-1][1]
 
-    # Collect the remarks on summary sheet, such as 'OPTION'
-    # It will collect without checking whether data exists or not
-    for item in range(system_count):
-        remarks[sheet.range(f"C{start_row+1+item}").value] = [
-            sheet.range(f"E{start_row+1+item}").value
-        ]
-
-    # Collect discount
-    if sheet.range(f"C{system_count+start_row+3}").value in [
-        "SPECIAL DISCOUNT",
-        "SPECIAL PROJECT DISCOUNT",
-    ]:
-        discount_price = sheet.range(f"D{system_count+start_row+3}").value
-
+    # Detail adds material cost and escalations before the base cost.
+    # Columns from H: cost columns, then difference (D - cost) and margin
     if detail:
-        # Collect formula
-        for sheet in wb.sheet_names:
-            if not should_skip_sheet(sheet):
-                sheet = wb.sheets[sheet]
-                last_row = sheet.range("G1500").end("up").row
-                collect = [
-                    "='" + sheet.name + "'!$C$3",
-                    # Selling price
-                    "='" + sheet.name + "'!$G$" + str(last_row),
-                    # "='" + sheet.name + "'!$S$" + str(last_row),
-                    # Material cost
-                    "='" + sheet.name + "'!$AQ$" + str(last_row),
-                    # Escalations
-                    "='" + sheet.name + "'!$V$" + str(last_row),
-                    "='" + sheet.name + "'!$W$" + str(last_row),
-                    "='" + sheet.name + "'!$X$" + str(last_row),
-                    "='" + sheet.name + "'!$Y$" + str(last_row),
-                    "='" + sheet.name + "'!$Z$" + str(last_row),
-                    # Base cost after escalations
-                    "='" + sheet.name + "'!$AS$" + str(last_row),
-                ]
-                summary_formula.extend(collect)
-                collect = []
-
-        # Reverse the order of collected items
-        odered_summary_formula = summary_formula[::-1]
-
-        # Set sheet to summary
-        sheet = wb.sheets["Summary"]
-        # Clear summary page
-        sheet.range("A18:Z1000").clear()
-        # Set format
-        sheet.range("C:C").column_width = 55
-        # sheet.range('E20:E1000').horizontal_alignment = 'center'
-
-        for system in wb.sheet_names:
-            if not should_skip_sheet(system):
-                copy_design_row(
-                    pwb, "21:21", sheet.range(str(offset) + ":" + str(offset))
-                )
-                sheet.range("B" + str(offset)).value = str(count) + " ‣ "
-                sheet.range("C" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("D" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range(f"G{offset}").formula = (
-                    f'=IF(E{offset}<>"OPTION", IF(D{start_row+system_count+2}>0.00001, D{offset}/D{start_row+system_count+2}, ""), "")'  # For scope percentage
-                )
-                sheet.range("H" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("I" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("J" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("K" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("L" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("M" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("N" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("O" + str(offset)).formula = (
-                    "=IF(N"
-                    + str(offset)
-                    + '<>"",D'
-                    + str(offset)
-                    + "- N"
-                    + str(offset)
-                    + ',"")'
-                )
-                sheet.range("P" + str(offset)).formula = (
-                    "=IF(OR(D"
-                    + str(offset)
-                    + ">0.00001, D"
-                    + str(offset)
-                    + "<-0.00001), O"
-                    + str(offset)
-                    + "/D"
-                    + str(offset)
-                    + ", 0)"
-                )
-                count += 1
-                offset += 1
-
-        # Drawing lines
-        copy_design_row(
-            pwb, "15:15", sheet.range(str(start_row) + ":" + str(start_row))
-        )
-        copy_design_row(pwb, "11:11", sheet.range(str(offset) + ":" + str(offset)))
-        copy_design_row(
-            pwb, "17:17", sheet.range(str(offset + 1) + ":" + str(offset + 1))
+        cost_refs = ["AQ", "V", "W", "X", "Y", "Z", "AS"]
+        design = {"top": "15:15", "total": "17:17", "less": "18:18", "net": "19:19"}
+    else:
+        cost_refs = ["AS"]
+        design = {"top": "13:13", "total": "7:7", "less": "8:8", "net": "9:9"}
+    cost_col = chr(ord("H") + len(cost_refs) - 1)  # Base cost: N or H
+    diff_col = chr(ord(cost_col) + 1)
+    pct_col = chr(ord(cost_col) + 2)
+
+    def difference(row, spaced=False):
+        space = " " if spaced else ""
+        return f'=IF({cost_col}{row}<>"",{space}D{row}- {cost_col}{row},"")'
+
+    def margin(row):
+        return (
+            f"=IF(OR(D{row}>0.00001, D{row}<-0.00001), {diff_col}{row}/D{row}, 0)"
         )
 
-        # sheet = wb.sheets['Summary']
-        sheet.range("C" + str(offset + 1)).value = (
-            '="TOTAL PROJECT (" & Config!B12 & ")"'
-        )
-        sheet.range("D" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",D20:D' + str(offset) + ")"
-        )
-        sheet.range("E" + str(offset + 1)).formula = (
-            "=IF(COUNTIF(E20:E" + str(offset) + ',"OPTION"), "Excluding Option", "")'
-        )
-        sheet.range("H" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",H20:H' + str(offset) + ")"
-        )
-        sheet.range("I" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",I20:I' + str(offset) + ")"
-        )
-        sheet.range("J" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",J20:J' + str(offset) + ")"
+    # System rows: B:D and G:pct
+    names = []
+    costs = []
+    for count, name in enumerate(systems, 1):
+        row = first_row + count - 1
+        last_row = (
+            snapshot.last_row(name, "G")
+            if snapshot is not None
+            else get_last_row(wb.sheets[name], "G")
         )
-        sheet.range("K" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",K20:K' + str(offset) + ")"
-        )
-        sheet.range("L" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",L20:L' + str(offset) + ")"
-        )
-        sheet.range("M" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",M20:M' + str(offset) + ")"
-        )
-        sheet.range("N" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",N20:N' + str(offset) + ")"
-        )
-        sheet.range("O" + str(offset + 1)).formula = (
-            "=IF(N"
-            + str(offset + 1)
-            + '<>"", D'
-            + str(offset + 1)
-            + "- N"
-            + str(offset + 1)
-            + ',"")'
-        )
-        sheet.range("P" + str(offset + 1)).formula = (
-            "=IF(OR(D"
-            + str(offset + 1)
-            + ">0.00001, D"
-            + str(offset + 1)
-            + "<-0.00001), O"
-            + str(offset + 1)
-            + "/D"
-            + str(offset + 1)
-            + ", 0)"
+        names.append([f"{count} ‣ ", f"='{name}'!$C$3", f"='{name}'!$G${last_row}"])
+        costs.append(
+            [
+                f'=IF(E{row}<>"OPTION", IF(D{total_row}>0.00001, D{row}/D{total_row}, ""), "")'  # For scope percentage
+            ]
+            + [f"='{name}'!${column}${last_row}" for column in cost_refs]
+            + [difference(row), margin(row)]
         )
 
-        # Format
-        sheet.range(f"D20:O{offset+1}").number_format = ACCOUNTING
-        sheet.range(f"H20:H{offset+1}").font.color = (4, 50, 255)
-        sheet.range(f"I20:M{offset+1}").font.color = (148, 55, 255)
-        sheet.range(f"P20:P{offset+1}").number_format = "0.00%"
-        sheet.range(f"G20:G{offset+1}").number_format = "0.00%"  # For scope percentage
-        sheet.range(f"G20:G{offset+1}").font.color = (0, 128, 0)  # Teal
-
-        # Write back remarks
-        for item in range(system_count):
-            if sheet.range(f"C{start_row+1+item}").value in remarks:
-                sheet.range(f"E{start_row+1+item}").value = remarks[
-                    sheet.range(f"C{start_row+1+item}").value
-                ]
-
-        if discount:
-            copy_design_row(
-                pwb, "18:18", sheet.range(str(offset + 2) + ":" + str(offset + 2))
-            )
-            copy_design_row(
-                pwb, "19:19", sheet.range(str(offset + 3) + ":" + str(offset + 3))
-            )
-            sheet.range("C" + str(offset + 3)).formula = (
-                '="TOTAL PROJECT PRICE AFTER DISCOUNT (" & Config!B12 & ")"'
-            )
-            sheet.range("D" + str(offset + 3)).formula = (
-                "=SUM(D" + str(offset + 1) + ":D" + str(offset + 2) + ")"
-            )
-            # Number format for discout field
-            sheet.range("D" + str(offset + 2)).number_format = ACCOUNTING
-            sheet.range("D" + str(offset + 3)).number_format = ACCOUNTING
-            sheet.range("N" + str(offset + 3)).formula = "=$N$" + str(offset + 1)
-            sheet.range("N" + str(offset + 3)).number_format = ACCOUNTING
-            sheet.range("O" + str(offset + 3)).formula = (
-                "=IF(N"
-                + str(offset + 3)
-                + '<>"", D'
-                + str(offset + 3)
-                + "- N"
-                + str(offset + 3)
-                + ',"")'
-            )
-            sheet.range("O" + str(offset + 3)).number_format = ACCOUNTING
-            sheet.range("P" + str(offset + 3)).formula = (
-                "=IF(OR(D"
-                + str(offset + 3)
-                + ">0.00001, D"
-                + str(offset + 3)
-                + "<-0.00001), O"
-                + str(offset + 3)
-                + "/D"
-                + str(offset + 3)
-                + ", 0)"
-            )
-            sheet.range("P" + str(offset + 3)).number_format = "0.00%"
-            sheet.range("C" + str(offset + 5)).formula = (
-                '="• All the prices are in " & Config!B12 & " excluding GST."'
-            )
-            sheet.range("C" + str(offset + 6)).value = (
-                "• Total project price does not include prices for optional items set out in the detailed bill of material."
-            )
-            sheet.range("C" + str(offset + 7)).value = (
-                "• Items marked as 'INCLUDED' are included in the scope of supply without price impact."
-            )
-
-            # Write back the discount
-            if sheet.range(f"C{system_count+start_row+3}").value in [
-                "SPECIAL DISCOUNT",
-                "SPECIAL PROJECT DISCOUNT",
-            ]:
-                sheet.range(f"D{system_count+start_row+3}").value = discount_price
-
-            # Discount percentages simulation
-            if simulation:
-                sheet.range(f"H{offset+5}").value = "Actual Dis"
-                sheet.range(f"I{offset+5}").formula = f"=-D{offset+2}/D{offset+1}"
-                sheet.range(f"I{offset+5}").number_format = "0.00%"
-                sheet.range(f"H{offset+6}").value = "Price"
-                sheet.range(f"I{offset+6}").value = "D%"
-                sheet.range(f"J{offset+6}").value = "Discount"
-                sheet.range(f"K{offset+6}").value = "D Price"
-                sheet.range(f"L{offset+6}").value = "Cost"
-                sheet.range(f"M{offset+6}").value = "Profit"
-                sheet.range(f"N{offset+6}").value = "MU"
-                for i in range(discount_level):
-                    sheet.range(f"H{offset+7+i}").formula = f"=D{offset+1}"
-                    sheet.range(f"I{offset+7+i}").value = (i + 1) / 100
-                    sheet.range(f"J{offset+7+i}").formula = (
-                        f"=CEILING(H{offset+7+i}*I{offset+7+i},1)"
-                    )
-                    sheet.range(f"K{offset+7+i}").formula = (
-                        f"=H{offset+7+i}-J{offset+7+i}"
-                    )
-                    sheet.range(f"L{offset+7+i}").formula = f"=N{offset+1}"
-                    sheet.range(f"M{offset+7+i}").formula = (
-                        f"=K{offset+7+i}-L{offset+7+i}"
-                    )
-                    sheet.range(f"N{offset+7+i}").formula = (
-                        f"=M{offset+7+i}/K{offset+7+i}"
-                    )
-                # Format
-                sheet.range(f"H{offset+7}:H{offset+7+discount_level}").number_format = (
-                    ACCOUNTING
-                )
-                sheet.range(f"I{offset+7}:I{offset+7+discount_level}").number_format = (
-                    "0.00%"
-                )
-                sheet.range(f"J{offset+7}:M{offset+7+discount_level}").number_format = (
-                    ACCOUNTING
-                )
-                sheet.range(f"N{offset+7}:N{offset+7+discount_level}").number_format = (
-                    "0.00%"
-                )
-
-        else:
-            sheet.range("C" + str(offset + 3)).formula = (
-                '="• All the prices are in " & Config!B12 & " excluding GST."'
-            )
-            sheet.range("C" + str(offset + 4)).value = (
-                "• Total project price does not include items marked 'OPTION' in the detailed bill of material."
-            )
-            sheet.range("C" + str(offset + 5)).value = (
-                "• Items marked as 'INCLUDED' are included in the scope of supply without price impact."
-            )
-
-    else:
-        for sheet in wb.sheet_names:
-            if not should_skip_sheet(sheet):
-                sheet = wb.sheets[sheet]
-                last_row = sheet.range("G1500").end("up").row
-                collect = [
-                    "='" + sheet.name + "'!$C$3",
-                    "='" + sheet.name + "'!$G$" + str(last_row),
-                    "='" + sheet.name + "'!$AS$" + str(last_row),
-                ]
-                summary_formula.extend(collect)
-                collect = []
-
-        # Reverse the order of collected items
-        odered_summary_formula = summary_formula[::-1]
-
-        # Set sheet to summary
-        sheet = wb.sheets["Summary"]
-        # Clear summary page
-        sheet.range("A18:Z1000").clear()
-        # Set format
-        sheet.range("C:C").column_width = 55
-        # sheet.range('E20:E1000').horizontal_alignment = 'center'
-
-        for system in wb.sheet_names:
-            if not should_skip_sheet(system):
-                copy_design_row(
-                    pwb, "21:21", sheet.range(str(offset) + ":" + str(offset))
-                )
-                sheet.range("B" + str(offset)).value = str(count) + " ‣ "
-                sheet.range("C" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("D" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range(f"G{offset}").formula = (
-                    f'=IF(E{offset}<>"OPTION", IF(D{start_row+system_count+2}>0.00001, D{offset}/D{start_row+system_count+2}, ""), "")'  # For scope percentage
-                )
-                sheet.range("H" + str(offset)).formula = odered_summary_formula.pop()
-                sheet.range("I" + str(offset)).formula = (
-                    "=IF(H"
-                    + str(offset)
-                    + '<>"",D'
-                    + str(offset)
-                    + "- H"
-                    + str(offset)
-                    + ',"")'
-                )
-                sheet.range("J" + str(offset)).formula = (
-                    "=IF(OR(D"
-                    + str(offset)
-                    + ">0.00001, D"
-                    + str(offset)
-                    + "<-0.00001), I"
-                    + str(offset)
-                    + "/D"
-                    + str(offset)
-                    + ", 0)"
-                )
-                count += 1
-                offset += 1
+    # Clear summary page
+    sheet.range("A18:Z1000").clear()
+    # Set format
+    sheet.range("C:C").column_width = 55
+
+    # Drawing lines: one copy per design row, the system row repeated
+    if system_count:
+        copy_design_row(pwb, "21:21", sheet.range(f"{first_row}:{offset - 1}"))
+    copy_design_row(pwb, design["top"], sheet.range(f"{start_row}:{start_row}"))
+    copy_design_row(pwb, "11:11", sheet.range(f"{offset}:{offset}"))
+    copy_design_row(pwb, design["total"], sheet.range(f"{total_row}:{total_row}"))
+
+    if system_count:
+        sheet.range(f"B{first_row}:D{offset - 1}").formula = names
+        sheet.range(f"G{first_row}:{pct_col}{offset - 1}").formula = costs
+
+    # Totals
+    sums = [
+        f'=SUMIF(E20:E{offset},"<>OPTION",{column}20:{column}{offset})'
+        for column in "HIJKLMN"[: len(cost_refs)]
+    ]
+    sheet.range(f"C{total_row}:E{total_row}").formula = [
+        [
+            '="TOTAL PROJECT (" & Config!B12 & ")"',
+            f'=SUMIF(E20:E{offset},"<>OPTION",D20:D{offset})',
+            f'=IF(COUNTIF(E20:E{offset},"OPTION"), "Excluding Option", "")',
+        ]
+    ]
+    sheet.range(f"H{total_row}:{pct_col}{total_row}").formula = [
+        sums + [difference(total_row, spaced=True), margin(total_row)]
+    ]
 
-        # Drawing lines
-        copy_design_row(
-            pwb, "13:13", sheet.range(str(start_row) + ":" + str(start_row))
-        )
-        copy_design_row(pwb, "11:11", sheet.range(str(offset) + ":" + str(offset)))
-        copy_design_row(
-            pwb, "7:7", sheet.range(str(offset + 1) + ":" + str(offset + 1))
+    # Format
+    sheet.range(f"D20:{diff_col}{total_row}").number_format = ACCOUNTING
+    if detail:
+        sheet.range(f"H20:H{total_row}").font.color = (4, 50, 255)
+        sheet.range(f"I20:M{total_row}").font.color = (148, 55, 255)
+    sheet.range(f"{pct_col}20:{pct_col}{total_row}").number_format = "0.00%"
+    sheet.range(f"G20:G{total_row}").number_format = "0.00%"  # For scope percentage
+    sheet.range(f"G20:G{total_row}").font.color = (0, 128, 0)  # Teal
+
+    # Write back remarks, matched on the system titles now in C
+    if system_count:
+        titles = sheet.range(f"C{first_row}:C{offset - 1}").options(ndim=1).value
+        write_changes(
+            sheet,
+            "E",
+            first_row,
+            [None] * system_count,
+            [remarks.get(title) for title in titles],
         )
 
-        # sheet = wb.sheets['Summary']
-        sheet.range("C" + str(offset + 1)).value = (
-            '="TOTAL PROJECT (" & Config!B12 & ")"'
-        )
-        sheet.range("D" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",D20:D' + str(offset) + ")"
-        )
-        sheet.range("E" + str(offset + 1)).formula = (
-            "=IF(COUNTIF(E20:E" + str(offset) + ',"OPTION"), "Excluding Option", "")'
-        )
-        sheet.range("H" + str(offset + 1)).formula = (
-            "=SUMIF(E20:E" + str(offset) + ',"<>OPTION",H20:H' + str(offset) + ")"
-        )
-        sheet.range("I" + str(offset + 1)).formula = (
-            "=IF(H"
-            + str(offset + 1)
-            + '<>"", D'
-            + str(offset + 1)
-            + "- H"
-            + str(offset + 1)
-            + ',"")'
+    if discount:
+        net_row = offset + 3
+        copy_design_row(
+            pwb, design["less"], sheet.range(f"{discount_row}:{discount_row}")
         )
-        sheet.range("J" + str(offset + 1)).formula = (
-            "=IF(OR(D"
-            + str(offset + 1)
-            + ">0.00001, D"
-            + str(offset + 1)
-            + "<-0.00001), I"
-            + str(offset + 1)
-            + "/D"
-            + str(offset + 1)
-            + ", 0)"
+        copy_design_row(pwb, design["net"], sheet.range(f"{net_row}:{net_row}"))
+        sheet.range(f"C{net_row}:D{net_row}").formula = [
+            [
+                '="TOTAL PROJECT PRICE AFTER DISCOUNT (" & Config!B12 & ")"',
+                f"=SUM(D{total_row}:D{discount_row})",
+            ]
+        ]
+        sheet.range(f"{cost_col}{net_row}:{pct_col}{net_row}").formula = [
+            [
+                f"=${cost_col}${total_row}",
+                difference(net_row, spaced=True),
+                margin(net_row),
+            ]
+        ]
+        # Number format for discout field
+        sheet.range(f"D{discount_row}:D{net_row}").number_format = ACCOUNTING
+        sheet.range(f"{cost_col}{net_row}:{diff_col}{net_row}").number_format = (
+            ACCOUNTING
         )
-
-        # Format
-        sheet.range(f"D20:I{offset+1}").number_format = ACCOUNTING
-        sheet.range(f"G20:G{offset+1}").number_format = "0.00%"  # For scope percentage
-        sheet.range(f"G20:G{offset+1}").font.color = (0, 128, 0)  # Teal
-        sheet.range(f"J20:J{offset+1}").number_format = "0.00%"
-
-        # Write back remarks
-        for item in range(system_count):
-            if sheet.range(f"C{start_row+1+item}").value in remarks:
-                sheet.range(f"E{start_row+1+item}").value = remarks[
-                    sheet.range(f"C{start_row+1+item}").value
-                ]
-
-        if discount:
-            copy_design_row(
-                pwb, "8:8", sheet.range(str(offset + 2) + ":" + str(offset + 2))
-            )
-            copy_design_row(
-                pwb, "9:9", sheet.range(str(offset + 3) + ":" + str(offset + 3))
-            )
-            sheet.range("C" + str(offset + 3)).formula = (
-                '="TOTAL PROJECT PRICE AFTER DISCOUNT (" & Config!B12 & ")"'
-            )
-            sheet.range("D" + str(offset + 3)).formula = (
-                "=SUM(D" + str(offset + 1) + ":D" + str(offset + 2) + ")"
-            )
-            # Number format for discout field
-            sheet.range("D" + str(offset + 2)).number_format = ACCOUNTING
-            sheet.range("D" + str(offset + 3)).number_format = ACCOUNTING
-            sheet.range("H" + str(offset + 3)).formula = "=$H$" + str(offset + 1)
-            sheet.range("H" + str(offset + 3)).number_format = ACCOUNTING
-            sheet.range("I" + str(offset + 3)).formula = (
-                "=IF(H"
-                + str(offset + 3)
-                + '<>"", D'
-                + str(offset + 3)
-                + "- H"
-                + str(offset + 3)
-                + ',"")'
-            )
-            sheet.range("I" + str(offset + 3)).number_format = ACCOUNTING
-            # sheet.range('J' + str(offset+3)).formula = '=IF(I' + str(offset+3) + '<>0,I' + str(offset+3) + '/D' + str(offset+3) + ',"")'
-            sheet.range("J" + str(offset + 3)).formula = (
-                "=IF(OR(D"
-                + str(offset + 3)
-                + ">0.00001, D"
-                + str(offset + 3)
-                + "<-0.00001), I"
-                + str(offset + 3)
-                + "/D"
-                + str(offset + 3)
-                + ", 0)"
-            )
-            sheet.range("J" + str(offset + 3)).number_format = "0.00%"
-            sheet.range("C" + str(offset + 5)).formula = (
-                '="• All the prices are in " & Config!B12 & " excluding GST."'
-            )
-            sheet.range("C" + str(offset + 6)).value = (
+        sheet.range(f"{pct_col}{net_row}").number_format = "0.00%"
+        sheet.range(f"C{offset + 5}:C{offset + 7}").formula = [
+            ['="• All the prices are in " & Config!B12 & " excluding GST."'],
+            [
                 "• Total project price does not include prices for optional items set out in the detailed bill of material."
-            )
-            sheet.range("C" + str(offset + 7)).value = (
+            ],
+            [
                 "• Items marked as 'INCLUDED' are included in the scope of supply without price impact."
-            )
+            ],
+        ]
 
-            # Write back the discount
-            if sheet.range(f"C{system_count+start_row+3}").value in [
-                "SPECIAL DISCOUNT",
-                "SPECIAL PROJECT DISCOUNT",
-            ]:
-                sheet.range(f"D{system_count+start_row+3}").value = discount_price
-
-            # Discount percentages simulation
-            # Discount percentages simulation
-            if simulation:
-                sheet.range(f"H{offset+5}").value = "Actual Dis"
-                sheet.range(f"I{offset+5}").formula = f"=-D{offset+2}/D{offset+1}"
-                sheet.range(f"I{offset+5}").number_format = "0.00%"
-                sheet.range(f"H{offset+6}").value = "Price"
-                sheet.range(f"I{offset+6}").value = "D%"
-                sheet.range(f"J{offset+6}").value = "Discount"
-                sheet.range(f"K{offset+6}").value = "D Price"
-                sheet.range(f"L{offset+6}").value = "Cost"
-                sheet.range(f"M{offset+6}").value = "Profit"
-                sheet.range(f"N{offset+6}").value = "MU"
-                for i in range(discount_level):
-                    sheet.range(f"H{offset+7+i}").formula = f"=D{offset+1}"
-                    sheet.range(f"I{offset+7+i}").value = (i + 1) / 100
-                    sheet.range(f"J{offset+7+i}").formula = (
-                        f"=CEILING(H{offset+7+i}*I{offset+7+i},1)"
-                    )
-                    sheet.range(f"K{offset+7+i}").formula = (
-                        f"=H{offset+7+i}-J{offset+7+i}"
-                    )
-                    sheet.range(f"L{offset+7+i}").formula = f"=H{offset+1}"
-                    sheet.range(f"M{offset+7+i}").formula = (
-                        f"=K{offset+7+i}-L{offset+7+i}"
-                    )
-                    sheet.range(f"N{offset+7+i}").formula = (
-                        f"=M{offset+7+i}/K{offset+7+i}"
-                    )
-                # Format
-                sheet.range(f"H{offset+7}:H{offset+7+discount_level}").number_format = (
-                    ACCOUNTING
-                )
-                sheet.range(f"I{offset+7}:I{offset+7+discount_level}").number_format = (
-                    "0.00%"
-                )
-                sheet.range(f"J{offset+7}:M{offset+7+discount_level}").number_format = (
-                    ACCOUNTING
-                )
-                sheet.range(f"N{offset+7}:N{offset+7+discount_level}").number_format = (
-                    "0.00%"
+        # Write back the discount (the label comes with the design row)
+        if sheet.range(f"C{discount_row}").value in [
+            "SPECIAL DISCOUNT",
+            "SPECIAL PROJECT DISCOUNT",
+        ]:
+            sheet.range(f"D{discount_row}").value = discount_price
+
+        # Discount percentages simulation
+        if simulation:
+            top = offset + 7
+            table = [
+                ["Actual Dis", f"=-D{discount_row}/D{total_row}"] + [None] * 5,
+                ["Price", "D%", "Discount", "D Price", "Cost", "Profit", "MU"],
+            ]
+            for row in range(top, top + discount_level):
+                table.append(
+                    [
+                        f"=D{total_row}",
+                        (row - top + 1) / 100,
+                        f"=CEILING(H{row}*I{row},1)",
+                        f"=H{row}-J{row}",
+                        f"={cost_col}{total_row}",
+                        f"=K{row}-L{row}",
+                        f"=M{row}/K{row}",
+                    ]
                 )
+            sheet.range(f"H{offset + 5}:N{top + discount_level - 1}").formula = table
+            # Format
+            sheet.range(f"I{offset + 5}").number_format = "0.00%"
+            bottom = top + discount_level
+            sheet.range(f"H{top}:H{bottom}").number_format = ACCOUNTING
+            sheet.range(f"I{top}:I{bottom}").number_format = "0.00%"
+            sheet.range(f"J{top}:M{bottom}").number_format = ACCOUNTING
+            sheet.range(f"N{top}:N{bottom}").number_format = "0.00%"
 
-        else:
-            sheet.range("C" + str(offset + 3)).formula = (
-                '="• All the prices are in " & Config!B12 & " excluding GST."'
-            )
-            sheet.range("C" + str(offset + 4)).value = (
+    else:
+        sheet.range(f"C{offset + 3}:C{offset + 5}").formula = [
+            ['="• All the prices are in " & Config!B12 & " excluding GST."'],
+            [
                 "• Total project price does not include items marked 'OPTION' in the detailed bill of material."
-            )
-            sheet.range("C" + str(offset + 5)).value = (
+            ],
+            [
                 "• Items marked as 'INCLUDED' are included in the scope of supply without price impact."
-            )
+            ],
+        ]
 
     # Calculate all formulas written to summary sheet to avoid stale values
     wb.app.calculate()
@@ -1498,7 +1165,7 @@ def summary(wb, discount=False, detail=False, simulation=True, discount_level=15
     sheet.range("D:D").autofit()
     sheet.range("E:E").autofit()
     sheet.range("F:P").autofit()
-    last_row = sheet.range("C1500").end("up").row
+    last_row = get_last_row(sheet, "C")
     sheet.page_setup.print_area = "A1:F" + str(last_row + 3)
 
 
@@ -1513,35 +1180,114 @@ def get_num_scheme(wb):
     return 10, 10  # Default to Double
 
 
-def number_title(wb, count=10, step=10):
+def _blank(value):
+    if isinstance(value, float):
+        return bool(np.isnan(value))
+    return value is None or value == ""
+
+
+def _same_value(old, new):
+    """Cell equality for write-back: blanks are equal, as are 10 and 10.0."""
+    if _blank(old) or _blank(new):
+        return _blank(old) and _blank(new)
+    if isinstance(old, str) != isinstance(new, str):
+        return False
+    return bool(old == new)
+
+
+def changed_runs(old, new):
     """
-    For the main numbering. It will fix as long as it is a number.
-    Need to look for only the systems and engineering services.
-    Takes a work book, then start number and step.
+    Return (start, stop) index pairs covering the items of new that differ
+    from old, merging adjacent changes into one run.
+    """
+    runs = []
+    start = None
+    for i, value in enumerate(new):
+        same = i < len(old) and _same_value(old[i], value)
+        if not same and start is None:
+            start = i
+        elif same and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(new)))
+    return runs
 
-    Optimized to use vectorized pandas operations instead of row-by-row iteration.
+
+def write_changes(sheet, column, first_row, old, new, snapshot=None):
     """
-    # Collect system_names and data
-    systems = pd.DataFrame()
-    system_names = []
+    Write back only the cells of a column whose values changed.
+
+    old holds the values read from column (starting at first_row), new the
+    values to write. Each run of changed cells is written with one range
+    assignment, so an unchanged column costs no COM call at all.
+    Returns the number of range writes.
+    """
+    old = old.tolist() if hasattr(old, "tolist") else list(old)
+    new = new.tolist() if hasattr(new, "tolist") else list(new)
+    runs = changed_runs(old, new)
+    for start, stop in runs:
+        address = f"{column}{first_row + start}"
+        values = [[None if _blank(v) else v] for v in new[start:stop]]
+        if snapshot is not None:
+            snapshot.write(sheet.name, address, values)
+        else:
+            sheet.range(address).value = values
+    return len(runs)
+
+
+def read_system_sheets(wb, first_col, last_col, snapshot=None, empty=None):
+    """
+    Read first_col:last_col of the system sheets (row 2 is the header, down
+    to the last row of C) into one DataFrame, concatenated once.
+    Returns the DataFrame, with the upper case sheet name as a categorical
+    System column, and {system: positions of its rows}, in sheet order.
+    Pass a WorkbookSnapshot to reuse sheet data already read by other steps.
+    """
+    options = {"index": False} if empty is None else {"index": False, "empty": empty}
+    names = []
+    frames = []
     for sheet in wb.sheets:
-        if not should_skip_sheet(sheet.name):
-            system_names.append(str.upper(sheet.name))
-            ws = wb.sheets[sheet]
-            last_row = ws.range("C1500").end("up").row
+        if should_skip_sheet(sheet.name):
+            continue
+        if snapshot is not None:
+            data = snapshot.table(sheet.name, first_col, last_col, empty=empty)
+        else:
+            last_row = get_last_row(sheet, "C")
             data = (
-                ws.range("A2:C" + str(last_row))
-                .options(pd.DataFrame, index=False)
+                sheet.range(f"{first_col}2:{last_col}{last_row}")
+                .options(pd.DataFrame, **options)
                 .value
             )
-            data["System"] = str.upper(sheet.name)
-            systems = pd.concat([systems, data], join="outer")
+        names.append(str.upper(sheet.name))
+        frames.append(data)
+
+    systems = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    lengths = [len(data) for data in frames]
+    systems["System"] = pd.Categorical(np.repeat(names, lengths), categories=names)
+    starts = np.cumsum([0] + lengths)
+    rows = {
+        name: np.arange(start, start + length)
+        for name, start, length in zip(names, starts, lengths)
+    }
+    return systems, rows
+
+
+def number_title(wb, count=10, step=10, snapshot=None):
+    """
+    For the main numbering. It will fix as long as it is a number.
+    Need to look for only the systems and engineering services.
+    Takes a work book, then start number and step.
+
+    Optimized to use vectorized pandas operations instead of row-by-row iteration.
+    Pass a WorkbookSnapshot to reuse sheet data already read by other steps.
+    """
+    systems, rows = read_system_sheets(wb, "A", "C", snapshot)
 
     # Now that I have collect the data, let us do the numbering
-    # Index is reset so that index number is continuous
-    systems = systems.reset_index(drop=True)
     # Reindexing will remove columns that are not named.
     systems = systems.reindex(columns=["NO", "Description", "System"])
+    original = systems["NO"].copy()
 
     # Vectorized approach:
     # 1. Identify numeric values (main titles)
@@ -1592,10 +1338,12 @@ def number_title(wb, count=10, step=10):
         systems.loc[is_sub_item, "NO"] = "⠠" + sub_item_count.astype(str)
 
     # Now is the matter of writing to the required sheets
-    for system in system_names:
+    numbers = systems["NO"]
+    for system, positions in rows.items():
         sheet = wb.sheets[system]
-        system_data = systems[systems["System"] == system]
-        sheet.range("A2").options(index=False).value = system_data["NO"]
+        write_changes(
+            sheet, "A", 3, original.iloc[positions], numbers.iloc[positions], snapshot
+        )
 
 
 def prepare_to_print_technical(wb):
@@ -1604,7 +1352,7 @@ def prepare_to_print_technical(wb):
     page_setup(wb)
     for sheet in wb.sheet_names:
         if not should_skip_sheet(sheet):
-            last_row = wb.sheets[sheet].range("C1500").end("up").row
+            last_row = get_last_row(wb.sheets[sheet], "C")
             wb.sheets[sheet].activate()
             wb.sheets[sheet].range("C:C").autofit()
             wb.sheets[sheet].range("C:C").column_width = 60
@@ -1619,8 +1367,49 @@ def prepare_to_print_technical(wb):
     wb.sheets[current_sheet].activate()
 
 
-def technical(wb, show_pdf=True):
-    directory, is_cloud = get_workbook_directory(wb)
+@contextmanager
+def manual_calculation(wb):
+    """
+    Calculate the workbook once, then keep Excel from recalculating until
+    the block exits. For exports that replace formulas with their values:
+    every value written or column deleted would otherwise recalculate the
+    formulas that are left.
+    """
+    app = wb.app
+    original = app.calculation
+    app.calculate()
+    app.calculation = "manual"
+    try:
+        yield
+    finally:
+        app.calculation = original
+
+
+def freeze_system_sheets(wb, last_column="AL", column="C"):
+    """
+    Replace the formulas of every system sheet, from A1 to last_column down
+    to the last row of column, with their values: one read and one write
+    per sheet. Returns {sheet name: last row}.
+    """
+    last_rows = {}
+    for sheet in wb.sheet_names:
+        if should_skip_sheet(sheet):
+            continue
+        ws = wb.sheets[sheet]
+        last_row = get_last_row(ws, column)
+        values = ws.range(f"A1:{last_column}{last_row}")
+        values.value = values.raw_value
+        last_rows[sheet] = last_row
+    return last_rows
+
+
+def technical(wb, show_pdf=True, directory=None):
+    """
+    Technical workbook and PDF, written to directory (default: the folder of
+    the workbook).
+    """
+    if directory is None:
+        directory, is_cloud = get_workbook_directory(wb)
     # Check if Technical PDF already exist
     temp_file_name = Path(directory, "Technical " + wb.name[:-4] + "pdf")
     if temp_file_name.is_file():
@@ -1629,163 +1418,170 @@ def technical(wb, show_pdf=True):
         )
         return
 
-    wb.sheets["Cover"].range("D39").value = "TECHNICAL PROPOSAL"
-    wb.sheets["Cover"].range("D40").value = wb.sheets["Cover"].range("D40").value
+    # Calculate once; freezing values and deleting columns do not recalculate
+    with manual_calculation(wb):
+        wb.sheets["Cover"].range("D39").value = "TECHNICAL PROPOSAL"
+        wb.sheets["Cover"].range("D40").value = wb.sheets["Cover"].range("D40").value
 
-    wb.sheets["Summary"].range("D20:D100").value = ""
-    wb.sheets["Summary"].range("C20:C100").value = (
-        wb.sheets["Summary"].range("C20:C100").raw_value
-    )
+        wb.sheets["Summary"].range("D20:D100").value = ""
+        wb.sheets["Summary"].range("C20:C100").value = (
+            wb.sheets["Summary"].range("C20:C100").raw_value
+        )
+
+        if wb.name[:9] == "Technical":
+            xw.apps.active.alert("The file already seems to be technical.")  # type: ignore
+            return
+
+        if wb.name[:10] == "Commercial":
+            for sheet in wb.sheet_names:
+                ws = wb.sheets[sheet]
+                wb.sheets[2].activate()
+                if not should_skip_sheet(sheet):
+                    # Require to remove h_borders as these willl not be detected
+                    # when columns are removed and page setup changed.
+                    run_macro("remove_h_borders")
+                    last_row = get_last_row(ws, "C")
+                    ws.range("F:G").delete()
+                    ws.range("AL3:AL" + str(last_row)).value = ws.range(
+                        "AL3:AL" + str(last_row)
+                    ).raw_value
+                    # To reduce visual clutter
+                    ws.range(f"AM1:AM{last_row}").value = ws.range(
+                        f"AJ1:AJ{last_row}"
+                    ).raw_value
+                    ws.range("AJ:AJ").delete()
+                    ws.range("AL:AL").column_width = 0
+            if "T&C" in wb.sheet_names:
+                wb.sheets["T&C"].delete()
+            delete_scratch_sheet(wb)
+            prepare_to_print_technical(wb)
+            wb.sheets["Summary"].activate()
+            file_name = "Technical " + wb.name[11:-4] + "xlsx"
+        else:
+            wb.sheets["Cover"].range("C42:C47").value = (
+                wb.sheets["Cover"].range("C42:C47").raw_value
+            )
+            wb.sheets["Cover"].range("D6:D8").value = (
+                wb.sheets["Cover"].range("D6:D8").raw_value
+            )
+            wb.sheets["Summary"].range("G:S").delete()
+            # Values of the system sheets (A1, serial numbers, formats) in one pass
+            last_rows = freeze_system_sheets(wb)
+            for sheet in wb.sheet_names:
+                ws = wb.sheets[sheet]
+                if should_skip_sheet(sheet):
+                    ws.range("A1").value = ws.range("A1").raw_value  # Remove formula
+                ws.range("A1").wrap_text = False
+                if not should_skip_sheet(sheet):
+                    last_row = last_rows[sheet]
+                    ws.range("AM:BD").delete()
+                    ws.range("I:AK").delete()
+                    ws.range("F:G").delete()
+                    # To reduce visual clutter
+                    ws.range(f"AM1:AM{last_row}").value = ws.range(
+                        f"G1:G{last_row}"
+                    ).raw_value
+                    ws.range("G:G").delete()
+                    ws.range("AL:AL").column_width = 0
+            wb.sheets["Config"].delete()
+            tn_sheet = get_sheet(wb, "Technical_Notes", required=False)
+            if tn_sheet:
+                tn_sheet.range("F:I").delete()
+
+            # If T&C does not exist, do nothing.
+            try:
+                wb.sheets["T&C"].delete()
+            except Exception:
+                pass
+            delete_scratch_sheet(wb)
+            prepare_to_print_technical(wb)
+            # wb.sheets["Summary"].activate()
+            file_name = "Technical " + wb.name[:-4] + "xlsx"
+    # Saved after the calculation mode is restored, as it is saved with the file
+    full_path = Path(directory, file_name)
+    save_workbook_safe(wb, full_path, password="")
+    pdf_path = full_path.with_suffix(".pdf")
+    print_technical(wb, pdf_path=str(pdf_path), show_pdf=show_pdf)
 
-    if wb.name[:9] == "Technical":
-        xw.apps.active.alert("The file already seems to be technical.")  # type: ignore
+
+def commercial(wb, show_pdf=True, directory=None):
+    """
+    Commercial workbook and PDF, written to directory (default: the folder of
+    the workbook).
+    """
+    if directory is None:
+        directory, is_cloud = get_workbook_directory(wb)
+    # Check if Commercial PDF already exists
+    temp_file_name = Path(directory, "Commercial " + wb.name[:-4] + "pdf")
+    if temp_file_name.is_file():
+        xw.apps.active.alert(  # type: ignore
+            "The Commercial PDF file already exists!\n Please delete the file and try again."
+        )
         return
 
-    if wb.name[:10] == "Commercial":
-        for sheet in wb.sheet_names:
-            ws = wb.sheets[sheet]
-            wb.sheets[2].activate()
-            if not should_skip_sheet(sheet):
-                # Require to remove h_borders as these willl not be detected
-                # when columns are removed and page setup changed.
-                run_macro("remove_h_borders")
-                last_row = ws.range("C1500").end("up").row
-                ws.range("F:G").delete()
-                ws.range("AL3:AL" + str(last_row)).value = ws.range(
-                    "AL3:AL" + str(last_row)
-                ).raw_value
-                # To reduce visual clutter
-                ws.range(f"AM1:AM{last_row}").value = ws.range(
-                    f"AJ1:AJ{last_row}"
-                ).raw_value
-                ws.range("AJ:AJ").delete()
-                ws.range("AL:AL").column_width = 0
-        if "T&C" in wb.sheet_names:
-            wb.sheets["T&C"].delete()
-        delete_scratch_sheet(wb)
-        prepare_to_print_technical(wb)
-        wb.sheets["Summary"].activate()
-        file_name = "Technical " + wb.name[11:-4] + "xlsx"
-        full_path = Path(directory, file_name)
-        save_workbook_safe(wb, full_path, password="")
-        pdf_path = full_path.with_suffix(".pdf")
-        print_technical(wb, pdf_path=str(pdf_path), show_pdf=show_pdf)
-    else:
+    """Takes a work book, set horizantal borders at pagebreaks."""
+    # current_sheet = wb.sheets.active
+    # Calculate once; freezing values and deleting columns do not recalculate
+    with manual_calculation(wb):
+        wb.sheets["Cover"].range("D6:D8").value = (
+            wb.sheets["Cover"].range("D6:D8").raw_value
+        )
+        wb.sheets["Cover"].range("D39").value = wb.sheets["Config"].range("B13").value
+        wb.sheets["Cover"].range("D40").value = wb.sheets["Config"].range("B14").value
         wb.sheets["Cover"].range("C42:C47").value = (
             wb.sheets["Cover"].range("C42:C47").raw_value
         )
-        wb.sheets["Cover"].range("D6:D8").value = (
-            wb.sheets["Cover"].range("D6:D8").raw_value
+        last_row = get_last_row(wb.sheets["Summary"], "D")
+        wb.sheets["Summary"].range(f"G20:P{last_row}").value = (
+            wb.sheets["Summary"].range(f"G20:P{last_row}").raw_value
         )
-        wb.sheets["Summary"].range("G:S").delete()
+        wb.sheets["Summary"].range("C20:C100").value = (
+            wb.sheets["Summary"].range("C20:C100").raw_value
+        )
+        # Values of the system sheets down to the subtotal row, in one pass
+        last_rows = freeze_system_sheets(wb, column="G")
+        page_setup(wb)
         for sheet in wb.sheet_names:
             ws = wb.sheets[sheet]
-            ws.range("A1").value = ws.range("A1").raw_value  # Remove formula
+            if should_skip_sheet(sheet):
+                ws.range("A1").value = ws.range("A1").raw_value  # Remove formula
             ws.range("A1").wrap_text = False
             if not should_skip_sheet(sheet):
-                last_row = ws.range("C1500").end("up").row
-                ws.range("B3:B" + str(last_row)).value = ws.range(
-                    "B3:B" + str(last_row)
-                ).raw_value
-                ws.range("AL3:AL" + str(last_row)).value = ws.range(
-                    "AL3:AL" + str(last_row)
-                ).raw_value
+                last_row = last_rows[sheet]
+                ws.activate()
+                # Adjust column width as sometimes, the long value does not show.
+                ws.range("A:A").column_width = 4
+                ws.range("B:B").autofit()
+                ws.range("C:C").autofit()
+                ws.range("C:C").column_width = 55
+                # wb.sheets[sheet].range('C:C').wrap_text =
+                ws.range(f"G3:G{last_row-1}").formula = (
+                    '=IF(AND(F3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED"), D3*F3,"")'
+                )
+                ws.range(f"G{last_row}").formula = "=SUM(G3:G" + str(last_row - 1) + ")"
+                wb.sheets[sheet].range("D:H").autofit()
+                ws = wb.sheets[sheet]  # Refresh stale reference before column deletions
                 ws.range("AM:BD").delete()
                 ws.range("I:AK").delete()
-                ws.range("F:G").delete()
-                # To reduce visual clutter
-                ws.range(f"AM1:AM{last_row}").value = ws.range(
-                    f"G1:G{last_row}"
-                ).raw_value
-                ws.range("G:G").delete()
+                ws = wb.sheets[sheet]  # Refresh again after column deletions
+                col_i_values = ws.range(f"I1:I{last_row}").options(ndim=1).value
+                ws.range("I:I").delete()
+                if col_i_values:
+                    ws.range(f"AL1:AL{last_row}").value = [[v] for v in col_i_values]
                 ws.range("AL:AL").column_width = 0
+                # Call macros
+                run_macro("conditional_format")
+                run_macro("remove_h_borders")
+                run_macro("pagebreak_borders")
+
+        wb.sheets["Summary"].range("G:X").delete()
         wb.sheets["Config"].delete()
+        delete_scratch_sheet(wb)
         tn_sheet = get_sheet(wb, "Technical_Notes", required=False)
         if tn_sheet:
             tn_sheet.range("F:I").delete()
-
-        # If T&C does not exist, do nothing.
-        try:
-            wb.sheets["T&C"].delete()
-        except Exception:
-            pass
-        delete_scratch_sheet(wb)
-        prepare_to_print_technical(wb)
-        # wb.sheets["Summary"].activate()
-        file_name = "Technical " + wb.name[:-4] + "xlsx"
-        full_path = Path(directory, file_name)
-        save_workbook_safe(wb, full_path, password="")
-        pdf_path = full_path.with_suffix(".pdf")
-        print_technical(wb, pdf_path=str(pdf_path), show_pdf=show_pdf)
-
-
-def commercial(wb, show_pdf=True):
-    directory, is_cloud = get_workbook_directory(wb)
-    # Check if Commercial PDF already exists
-    temp_file_name = Path(directory, "Commercial " + wb.name[:-4] + "pdf")
-    if temp_file_name.is_file():
-        xw.apps.active.alert(  # type: ignore
-            "The Commercial PDF file already exists!\n Please delete the file and try again."
-        )
-        return
-
-    """Takes a work book, set horizantal borders at pagebreaks."""
-    # current_sheet = wb.sheets.active
-    wb.sheets["Cover"].range("D6:D8").value = (
-        wb.sheets["Cover"].range("D6:D8").raw_value
-    )
-    wb.sheets["Cover"].range("D39").value = wb.sheets["Config"].range("B13").value
-    wb.sheets["Cover"].range("D40").value = wb.sheets["Config"].range("B14").value
-    wb.sheets["Cover"].range("C42:C47").value = (
-        wb.sheets["Cover"].range("C42:C47").raw_value
-    )
-    last_row = wb.sheets["Summary"].range("D1500").end("up").row
-    wb.sheets["Summary"].range(f"G20:P{last_row}").value = (
-        wb.sheets["Summary"].range(f"G20:P{last_row}").raw_value
-    )
-    wb.sheets["Summary"].range("C20:C100").value = (
-        wb.sheets["Summary"].range("C20:C100").raw_value
-    )
-    page_setup(wb)
-    for sheet in wb.sheet_names:
-        ws = wb.sheets[sheet]
-        ws.range("A1").value = ws.range("A1").raw_value  # Remove formula
-        ws.range("A1").wrap_text = False
-        if not should_skip_sheet(sheet):
-            last_row = ws.range("G1500").end("up").row
-            ws.activate()
-            # Adjust column width as sometimes, the long value does not show.
-            ws.range(f"A3:AL{last_row}").value = ws.range(f"A3:AL{last_row}").raw_value
-            ws.range("A:A").column_width = 4
-            ws.range("B:B").autofit()
-            ws.range("C:C").autofit()
-            ws.range("C:C").column_width = 55
-            # wb.sheets[sheet].range('C:C').wrap_text =
-            ws.range(f"G3:G{last_row-1}").formula = (
-                '=IF(AND(F3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED"), D3*F3,"")'
-            )
-            ws.range(f"G{last_row}").formula = "=SUM(G3:G" + str(last_row - 1) + ")"
-            wb.sheets[sheet].range("D:H").autofit()
-            ws = wb.sheets[sheet]  # Refresh stale reference before column deletions
-            ws.range("AM:BD").delete()
-            ws.range("I:AK").delete()
-            ws = wb.sheets[sheet]  # Refresh again after column deletions
-            col_i_values = ws.range(f"I1:I{last_row}").options(ndim=1).value
-            ws.range("I:I").delete()
-            if col_i_values:
-                ws.range(f"AL1:AL{last_row}").value = [[v] for v in col_i_values]
-            ws.range("AL:AL").column_width = 0
-            # Call macros
-            run_macro("conditional_format")
-            run_macro("remove_h_borders")
-            run_macro("pagebreak_borders")
-
-    wb.sheets["Summary"].range("G:X").delete()
-    wb.sheets["Config"].delete()
-    delete_scratch_sheet(wb)
-    tn_sheet = get_sheet(wb, "Technical_Notes", required=False)
-    if tn_sheet:
-        tn_sheet.range("F:I").delete()
+    # The subtotal formulas written above (G) are all that is left to calculate
+    wb.app.calculate()
     wb.sheets["Summary"].activate()
     file_name = "Commercial " + wb.name[:-4] + "xlsx"
     full_path = Path(directory, file_name)
@@ -2026,39 +1822,23 @@ def conditional_format_wb(wb):
     current_sheet.activate()
 
 
-def fix_unit_price(wb):
+def fix_unit_price(wb, snapshot=None):
     """
     Fix unit prices, normally done for subsequent revisions.
     """
-    # Collect system_names and data
-    systems = pd.DataFrame()
-    system_names = []
-    for sheet in wb.sheets:
-        if not should_skip_sheet(sheet.name):
-            system_names.append(str.upper(sheet.name))
-            ws = wb.sheets[sheet]
-            last_row = ws.range("C1500").end("up").row
-            data = (
-                ws.range("AE2:AE" + str(last_row))
-                .options(pd.DataFrame, index=False)
-                .value
-            )
-            data["System"] = str.upper(sheet.name)
-            systems = pd.concat([systems, data], join="outer")
-
-            # Set font color for FUP column AB2
-            sheet.range(f"AB3:AB{str(last_row)}").font.color = (4, 50, 255)
-
-    systems = systems.reset_index(
-        drop=True
-    )  # Otherwise separate sheet will have own index.
+    systems, rows = read_system_sheets(wb, "AE", "AE", snapshot)
     systems.columns = ["FUP", "System"]
 
     # Write fixed unit price in FUP field
-    for system in system_names:
+    for system, positions in rows.items():
         sheet = wb.sheets[system]
-        system = systems[systems["System"] == system]
-        sheet.range("AB2").options(index=False).value = system["FUP"]
+        # Set font color for FUP column AB2
+        sheet.range(f"AB3:AB{len(positions) + 2}").font.color = (4, 50, 255)
+        fup = systems["FUP"].iloc[positions]
+        if snapshot is not None:
+            snapshot.write(sheet.name, "AB2", fup, index=False)
+        else:
+            sheet.range("AB2").options(index=False).value = fup
 
 
 def format_text(
@@ -2068,41 +1848,28 @@ def format_text(
     title_lineitem_or_description=False,
     upper_title=False,
     upper_system=True,
+    snapshot=None,
 ):
     """
     Format text in the workbook to remove inconsistencies.
 
     Optimized to use vectorized pandas operations instead of row-by-row iteration.
+    Pass a WorkbookSnapshot to reuse sheet data already read by other steps.
     """
-    # Collect system_names and data
-    systems = pd.DataFrame()
-    system_names = []
-    for sheet in wb.sheets:
-        if not should_skip_sheet(sheet.name):
-            system_names.append(str.upper(sheet.name))
-            ws = wb.sheets[sheet]
-            last_row = ws.range("C1500").end("up").row
-            data = (
-                ws.range("C2:AL" + str(last_row))
-                .options(pd.DataFrame, empty="", index=False)
-                .value
-            )
-            data["System"] = str.upper(sheet.name)
-            systems = pd.concat([systems, data], join="outer")
-
-    systems = systems.reset_index(drop=True)
+    systems, rows = read_system_sheets(wb, "C", "AL", snapshot, empty="")
     systems = systems.reindex(
         columns=["Description", "Unit", "Scope", "Format", "System"]
     )
+    original = systems[["Description", "Unit", "Scope"]].copy()
 
     # Vectorized processing of Description column
-    # Apply set_nitty_gritty using vectorized apply (faster than row iteration)
+    # set_nitty_gritty, once per distinct description (normalize.py)
     systems["Description"] = (
         systems["Description"]
         .astype(str)
         .str.strip()
         .str.lstrip("• ")
-        .apply(set_nitty_gritty)
+        .pipe(normalize.nitty_gritty_series)
     )
 
     # Vectorized Unit processing
@@ -2153,66 +1920,70 @@ def format_text(
     if indent_description:
         mask = systems["Format"] == "Description"
         if mask.any():
-            desc_col = systems.loc[mask, "Description"].str.strip().str.lstrip("• ")
-
-            if bullet_description:
-                # Handle # prefix -> ‣ bullet
-                starts_hash = desc_col.str.startswith("#")
-                # Handle ‣ prefix -> ‣ bullet
-                starts_triangle = desc_col.str.startswith("‣")
-                # Default -> • bullet
-
-                result = pd.Series(index=desc_col.index, dtype=str)
-                result[starts_hash] = "      ‣ " + desc_col[starts_hash].str.lstrip(
-                    "# "
-                )
-                result[starts_triangle] = "      ‣ " + desc_col[
-                    starts_triangle
-                ].str.lstrip("‣ ")
-                result[~starts_hash & ~starts_triangle] = (
-                    "   • " + desc_col[~starts_hash & ~starts_triangle]
-                )
-                systems.loc[mask, "Description"] = result
-            else:
-                systems.loc[mask, "Description"] = "   " + desc_col
+            systems.loc[mask, "Description"] = indented_descriptions(
+                systems.loc[mask, "Description"], bullet=bullet_description
+            )
 
     # Write formatted description to Description field
-    for system in system_names:
+    for system, positions in rows.items():
         sheet = wb.sheets[system]
-        system_data = systems[systems["System"] == system]
-        sheet.range("C2").options(index=False).value = system_data["Description"]
-        sheet.range("E2").options(index=False).value = system_data["Unit"]
-        sheet.range("H2").options(index=False).value = system_data["Scope"]
+        for column, field in [("C", "Description"), ("E", "Unit"), ("H", "Scope")]:
+            write_changes(
+                sheet,
+                column,
+                3,
+                original[field].iloc[positions],
+                systems[field].iloc[positions],
+                snapshot,
+            )
+
+
+def indented_descriptions(descriptions, bullet=True):
+    """
+    Text of Description rows (a Series), indented under their Lineitem.
+    With bullet, "#" and "‣" give a second level "‣" bullet, others "•".
+    """
+    text = descriptions.astype(str).str.strip().str.lstrip("• ")
+    if not bullet:
+        return "   " + text
+    # Handle # and ‣ prefix -> ‣ bullet
+    starts_hash = text.str.startswith("#")
+    starts_triangle = text.str.startswith("‣")
+    # Default -> • bullet
+    result = "   • " + text
+    result[starts_hash] = "      ‣ " + text[starts_hash].str.lstrip("# ")
+    result[starts_triangle] = "      ‣ " + text[starts_triangle].str.lstrip("‣ ")
+    return result
 
 
 def indent_description(wb):
     """
-    Depricated.
-    Indent description
-    This function works but slow. Replaced with 'format_text' function
+    Indent and bullet the Description rows and remove the indent of the
+    Subtitle rows, by the Format column (AL). Only the indent part of
+    'format_text': columns C and AL are read once per sheet and the
+    changed cells of C written back in runs. Returns the number of writes.
     """
+    writes = 0
     for sheet in wb.sheets:
         if not should_skip_sheet(sheet.name):
             ws = wb.sheets[sheet]
-            last_row = ws.range("C1500").end("up").row
-            for format in ws.range("AL3:AL" + str(last_row)):
-                if format.value == "Subtitle":
-                    ws.range("C" + str(format.row)).value = str(
-                        ws.range("C" + str(format.row)).value
-                    ).strip()
-                    ws.range("C" + str(format.row)).value = str(
-                        ws.range("C" + str(format.row)).value
-                    ).lstrip("• ")
-                elif format.value == "Description":
-                    ws.range("C" + str(format.row)).value = str(
-                        ws.range("C" + str(format.row)).value
-                    ).strip()
-                    ws.range("C" + str(format.row)).value = str(
-                        ws.range("C" + str(format.row)).value
-                    ).lstrip("• ")
-                    ws.range("C" + str(format.row)).value = (
-                        "   • " + ws.range("C" + str(format.row)).value
-                    )
+            last_row = get_last_row(ws, "C")
+            if last_row < 3:
+                continue
+            old = pd.Series(
+                ws.range(f"C3:C{last_row}").options(ndim=1, empty="").value,
+                dtype=object,
+            )
+            formats = pd.Series(
+                ws.range(f"AL3:AL{last_row}").options(ndim=1, empty="").value
+            )
+            new = old.copy()
+            subtitle = formats == "Subtitle"
+            new[subtitle] = old[subtitle].astype(str).str.strip().str.lstrip("• ")
+            description = formats == "Description"
+            new[description] = indented_descriptions(old[description])
+            writes += write_changes(ws, "C", 3, old, new)
+    return writes
 
 
 def shaded(wb, shaded=True):
@@ -2229,131 +2000,151 @@ def shaded(wb, shaded=True):
     # wb.sheets[current_sheet].activate()
 
 
-def internal_costing(wb):
-    directory, is_cloud = get_workbook_directory(wb)
-
-    wb.sheets["Cover"].range("D39").value = "INTERNAL COSTING"
-    wb.sheets["Cover"].range("D40").value = wb.sheets["Cover"].range("D40").raw_value
-    wb.sheets["Cover"].range("C42:C47").value = (
-        wb.sheets["Cover"].range("C42:C47").raw_value
-    )
-    wb.sheets["Cover"].range("D6:D8").value = (
-        wb.sheets["Cover"].range("D6:D8").raw_value
-    )
+def internal_costing(wb, directory=None):
+    """
+    Internal costing workbook, written to directory (default: the folder of
+    the workbook).
+    """
+    if directory is None:
+        directory, is_cloud = get_workbook_directory(wb)
+
+    # Calculate once; freezing values and deleting columns do not recalculate
+    with manual_calculation(wb):
+        wb.sheets["Cover"].range("D39").value = "INTERNAL COSTING"
+        wb.sheets["Cover"].range("D40").value = (
+            wb.sheets["Cover"].range("D40").raw_value
+        )
+        wb.sheets["Cover"].range("C42:C47").value = (
+            wb.sheets["Cover"].range("C42:C47").raw_value
+        )
+        wb.sheets["Cover"].range("D6:D8").value = (
+            wb.sheets["Cover"].range("D6:D8").raw_value
+        )
 
-    summary_last_row = wb.sheets["Summary"].range("D1500").end("up").row
-    wb.sheets["Summary"].range("D20:D100").value = ""
-    wb.sheets["Summary"].range("C20:C100").value = (
-        wb.sheets["Summary"].range("C20:C100").raw_value
-    )
-    wb.sheets["Summary"].range(f"H20:H{summary_last_row}").value = (
-        wb.sheets["Summary"].range(f"H20:H{summary_last_row}").raw_value
-    )
-    wb.sheets["Summary"].range(
-        f"H{summary_last_row+1}:H{summary_last_row+50}"
-    ).value = ""
-    wb.sheets["Summary"].range("I:P").value = ""
-
-    # Write out exchange rates
-    wb.sheets["Summary"].range("H7:I16").value = (
-        wb.sheets["Config"].range("A1:B10").raw_value
-    )
-    wb.sheets["Summary"].range("I8:I16").number_format = "0.0000"
-    wb.sheets["Summary"].range("K7").value = "Legend"
-    wb.sheets["Summary"].range("K9").value = LEGEND
-    wb.sheets["Summary"].range("K:L").clear_formats()
+        summary_last_row = get_last_row(wb.sheets["Summary"], "D")
+        wb.sheets["Summary"].range("D20:D100").value = ""
+        wb.sheets["Summary"].range("C20:C100").value = (
+            wb.sheets["Summary"].range("C20:C100").raw_value
+        )
+        wb.sheets["Summary"].range(f"H20:H{summary_last_row}").value = (
+            wb.sheets["Summary"].range(f"H20:H{summary_last_row}").raw_value
+        )
+        wb.sheets["Summary"].range(
+            f"H{summary_last_row+1}:H{summary_last_row+50}"
+        ).value = ""
+        wb.sheets["Summary"].range("I:P").value = ""
+
+        # Write out exchange rates
+        wb.sheets["Summary"].range("H7:I16").value = (
+            wb.sheets["Config"].range("A1:B10").raw_value
+        )
+        wb.sheets["Summary"].range("I8:I16").number_format = "0.0000"
+        wb.sheets["Summary"].range("K7").value = "Legend"
+        wb.sheets["Summary"].range("K9").value = LEGEND
+        wb.sheets["Summary"].range("K:L").clear_formats()
 
-    for sheet in wb.sheet_names:
-        ws = wb.sheets[sheet]
-        ws.range("A1").value = ws.range("A1").raw_value  # Remove formula
-        if not should_skip_sheet(sheet):
-            # Collect escalation
-            escalation = ws.range("K1:R1").value
-            ws.range("I1:R1").value = ""
-            # Construct as dictionary
-            escalation = dict(zip(escalation[::2], escalation[1::2]))
-
-            # Work on columns
-            last_row = ws.range("G1500").end("up").row
-            ws.range("B3:B" + str(last_row)).value = ws.range(
-                "B3:B" + str(last_row)
-            ).raw_value
-            ws.range("F3:G" + str(last_row)).value = ""
-            # ws.range('K3:Q'+ str(last_row)).value = ws.range('K3:Q'+ str(last_row)).raw_value
-            ws.range("Q3:Q" + str(last_row)).value = ws.range(
-                "Q3:Q" + str(last_row)
-            ).raw_value
-            # Copy Flag
-            ws.range(f"AK2:AK{last_row}").value = ws.range(
-                f"AK2:AK{last_row}"
-            ).raw_value
-            ws.range("AK:AK").copy(ws.range("BB:BB"))
-            ws.range("AP:AW").delete()
-            ws.range("R:AK").delete()
-
-            # Copy row first to get formatting right
-            ws.range("K:K").copy(ws.range("V:V"))
-            ws.range("W:AB").insert("right")
-            ws.range("V:V").delete()
-            # Insert Escalation
-            ws.range("V2").value = "Escalation"
-            ws.range("V3:V" + str(last_row - 1)).formula = (
-                '=IF(AND(D3<>"", J3<>"",K3<>""), $AD$7, "")'
-            )
-            ws.range("V3:V" + str(last_row)).number_format = "0.00%"
+        for sheet in wb.sheet_names:
+            ws = wb.sheets[sheet]
+            ws.range("A1").value = ws.range("A1").raw_value  # Remove formula
+            if not should_skip_sheet(sheet):
+                # Collect escalation
+                escalation = ws.range("K1:R1").value
+                ws.range("I1:R1").value = ""
+                # Construct as dictionary
+                escalation = dict(zip(escalation[::2], escalation[1::2]))
+
+                # Work on columns
+                last_row = get_last_row(ws, "G")
+                ws.range("B3:B" + str(last_row)).value = ws.range(
+                    "B3:B" + str(last_row)
+                ).raw_value
+                ws.range("F3:G" + str(last_row)).value = ""
+                # ws.range('K3:Q'+ str(last_row)).value = ws.range('K3:Q'+ str(last_row)).raw_value
+                ws.range("Q3:Q" + str(last_row)).value = ws.range(
+                    "Q3:Q" + str(last_row)
+                ).raw_value
+                # Copy Flag
+                ws.range(f"AK2:AK{last_row}").value = ws.range(
+                    f"AK2:AK{last_row}"
+                ).raw_value
+                ws.range("AK:AK").copy(ws.range("BB:BB"))
+                ws.range("AP:AW").delete()
+                ws.range("R:AK").delete()
+
+                # Copy row first to get formatting right
+                ws.range("K:K").copy(ws.range("V:V"))
+                ws.range("W:AB").insert("right")
+                ws.range("V:V").delete()
+                # Insert Escalation
+                ws.range("V2").value = "Escalation"
+                ws.range("V3:V" + str(last_row - 1)).formula = (
+                    '=IF(AND(D3<>"", J3<>"",K3<>""), $AD$7, "")'
+                )
+                ws.range("V3:V" + str(last_row)).number_format = "0.00%"
 
-            # Insert UCDQ
-            ws.range("W2").value = "UCDQ"
-            ws.range(f"W3:W{last_row - 1}").formula = (
-                '=IF(AND(D3<>"", K3<>""), N3*Q3,"")'
-            )
+                # Insert UCDQ
+                ws.range("W2").value = "UCDQ"
+                ws.range(f"W3:W{last_row - 1}").formula = (
+                    '=IF(AND(D3<>"", K3<>""), N3*Q3,"")'
+                )
 
-            # Insert SCDQ
-            ws.range("X2").value = "SCDQ"
-            ws.range(f"X3:X{last_row - 1}").formula = (
-                '=IF(AND(D3<>"", K3<>"", H3<>"OPTION",INDEX($H$1:H2, XMATCH("Title", $R$1:R2, 0, -1))<>"OPTION"), D3*W3, "")'
-            )
+                # Insert SCDQ
+                ws.range("X2").value = "SCDQ"
+                ws.range(f"X3:X{last_row - 1}").formula = (
+                    '=IF(AND(D3<>"", K3<>"", H3<>"OPTION",INDEX($H$1:H2, XMATCH("Title", $R$1:R2, 0, -1))<>"OPTION"), D3*W3, "")'
+                )
 
-            # Insert SCDQL
-            ws.range("Y2").value = "SCDQL"
-            ws.range(f"Y3:Y{last_row - 1}").formula = (
-                '=IF(AND(R3="Title", ISNUMBER(D3), E3<>""), SUM(X4:INDEX(X4:X1500, XMATCH("Title", R4:R1500, 0, 1)-1)), IF(AND(R3="Lineitem", AE3="Unit Price"), W3, ""))'
-            )
+                # Insert SCDQL
+                ws.range("Y2").value = "SCDQL"
+                end = pricing.lookahead_limit(last_row)
+                ws.range(f"Y3:Y{last_row - 1}").formula = (
+                    f'=IF(AND(R3="Title", ISNUMBER(D3), E3<>""), SUM(X4:INDEX(X4:X{end}, XMATCH("Title", R4:R{end}, 0, 1)-1)), IF(AND(R3="Lineitem", AE3="Unit Price"), W3, ""))'
+                )
 
-            # Insert TCDQL
-            ws.range("Z2").value = "TCDQL"
-            ws.range(f"Z3:Z{last_row - 1}").formula = (
-                '=IF(AND(ISNUMBER(D3), ISNUMBER(Y3), H3<>"OPTION"), D3*Y3, "")'
-            )
+                # Insert TCDQL
+                ws.range("Z2").value = "TCDQL"
+                ws.range(f"Z3:Z{last_row - 1}").formula = (
+                    '=IF(AND(ISNUMBER(D3), ISNUMBER(Y3), H3<>"OPTION"), D3*Y3, "")'
+                )
 
-            # Insert BSCQL
-            ws.range("AA2").value = "BSCQL"
-            ws.range(f"AA3:AA{last_row - 1}").formula = (
-                '=IF(ISNUMBER(Y3), Y3*(1+$AD$7)/(1-0.05), "")'
-            )
+                # Insert BSCQL
+                ws.range("AA2").value = "BSCQL"
+                ws.range(f"AA3:AA{last_row - 1}").formula = (
+                    '=IF(ISNUMBER(Y3), Y3*(1+$AD$7)/(1-0.05), "")'
+                )
 
-            # Insert BTCQL
-            ws.range("AB2").value = "BTCQL"
-            ws.range(f"AB3:AB{last_row - 1}").formula = (
-                '=IF(AND(ISNUMBER(D3), ISNUMBER(AA3), H3<>"OPTION"), D3*AA3, "")'
-            )
+                # Insert BTCQL
+                ws.range("AB2").value = "BTCQL"
+                ws.range(f"AB3:AB{last_row - 1}").formula = (
+                    '=IF(AND(ISNUMBER(D3), ISNUMBER(AA3), H3<>"OPTION"), D3*AA3, "")'
+                )
 
-            ws.range(f"AB{last_row}").formula = "=SUM(AB3:AB" + str(last_row - 1) + ")"
-            ws.range(f"W3:AB{last_row}").number_format = ACCOUNTING
-            # Consolidated escalation
-            ws.range("AC3").value = escalation
-            ws.range("AC7").value = "Total"
-            ws.range("AD7").formula = "=SUM(AD3:AD6)"
-            ws.range("AD3:AD7").number_format = "0.00%"
-
-            # To reduce visual clutter
-            ws.range("D:X").autofit()
-            ws.range("I:I").column_width = 20
-            ws.range("P:P").column_width = 20
-            ws.range("F:G").column_width = 0
-            ws.range("R:R").column_width = 0
-            ws.range("AE:AG").column_width = 0
-    wb.sheets["Config"].delete()
+                ws.range(f"AB{last_row}").formula = (
+                    "=SUM(AB3:AB" + str(last_row - 1) + ")"
+                )
+                ws.range(f"W3:AB{last_row}").number_format = ACCOUNTING
+                # Consolidated escalation
+                ws.range("AC3").value = escalation
+                ws.range("AC7").value = "Total"
+                ws.range("AD7").formula = "=SUM(AD3:AD6)"
+                ws.range("AD3:AD7").number_format = "0.00%"
+
+        # The escalation and costing formulas written above, before fitting
+        # the columns to their values
+        wb.app.calculate()
+        for sheet in wb.sheet_names:
+            if not should_skip_sheet(sheet):
+                ws = wb.sheets[sheet]
+                # To reduce visual clutter
+                ws.range("D:X").autofit()
+                ws.range("I:I").column_width = 20
+                ws.range("P:P").column_width = 20
+                ws.range("F:G").column_width = 0
+                ws.range("R:R").column_width = 0
+                ws.range("AE:AG").column_width = 0
+        wb.sheets["Config"].delete()
+    # Values saved with the file, after deleting Config
+    wb.app.calculate()
     # wb.sheets['T&C'].delete()
     prepare_to_print_internal(wb)
     wb.sheets["Summary"].activate()
@@ -2361,9 +2152,45 @@ def internal_costing(wb):
     save_workbook_safe(wb, Path(directory, file_name), password="")
 
 
-def convert_legacy(wb):
-    import requests
+def clean_legacy_systems(systems):
+    """
+    Clean the line items read from a legacy workbook: drop the line item
+    numbers, number the titles by 10, move Option/Included to Scope and
+    clear the TRUE/FALSE and "start line" artefacts. Returns a new frame
+    with a fresh index.
+    """
+    systems = systems.reset_index(drop=True)
+
+    def text(column):
+        return systems[column].map(str).str.lower().str.strip()
+
+    # Remove lineitem numbers (1.1.1) and the numbers of rows without Qty
+    no = systems["NO"].mask(systems["NO"].map(str).str.count(r"\.") == 2)
+    no = no.mask(no.notna() & systems["Qty"].isna())
+
+    # Let's take care of the main numbering
+    is_title = no.notna()
+    systems["NO"] = no.astype(object)
+    systems.loc[is_title, "NO"] = range(10, 10 * (int(is_title.sum()) + 1), 10)
+    systems["Format"] = pd.Series("Title", index=systems.index).where(is_title)
+
+    # Move Option and Included to scope
+    subtotal = systems["Subtotal Price"].map(str).str.lower()
+    systems["Scope"] = systems["Scope"].astype(object)
+    systems.loc[subtotal.isin(["option", "optional"]), "Scope"] = "OPTION"
+    systems.loc[subtotal.isin(["included", "inclusive"]), "Scope"] = "INCLUDED"
+
+    # Cleaning data
+    booleans = ["true", "false"]
+    systems["Model"] = systems["Model"].mask(
+        text("Model").isin(["start line:  delete forbidden"] + booleans)
+    )
+    for column in ("UC", "SC"):
+        systems[column] = systems[column].mask(text(column).isin(booleans))
+    return systems
 
+
+def convert_legacy(wb):
     directory, is_cloud = get_workbook_directory(wb)
 
     if wb.name[-4:] == "xlsm":
@@ -2477,7 +2304,7 @@ def convert_legacy(wb):
                 default_mu = ws.range("H5").value
                 escalation["default_mu"] = default_mu
                 defaults[sheet.upper()] = escalation
-                last_row = ws.range("D1500").end("up").row  # Returns a number
+                last_row = get_last_row(ws, "D")  # Returns a number
                 data = (
                     ws.range("A8:K" + str(last_row))
                     .options(pd.DataFrame, index=False)
@@ -2504,7 +2331,7 @@ def convert_legacy(wb):
             "Discount",
         ]
         es = wb.sheets["ES"]
-        es_last_row = es.range("D1500").end("up").row
+        es_last_row = get_last_row(es, "D")
         eng_service = (
             es.range("A8:K" + str(es_last_row)).options(pd.DataFrame, index=False).value
         )
@@ -2521,78 +2348,11 @@ def convert_legacy(wb):
         # Set font case for some columns
         systems["Unit"] = systems["Unit"].str.lower()
 
-        # Remove lineitem numbers
-        systems = systems.reset_index(drop=True)
-        for idx in systems.index:
-            if str(systems.loc[idx, "NO"]).count(".") == 2:
-                systems.loc[idx, "NO"] = np.nan
-
-        for idx in systems.index:
-            if pd.notna(systems.loc[idx, "NO"]) and not pd.notna(
-                systems.loc[idx, "Qty"]
-            ):
-                systems.loc[idx, "NO"] = np.nan
-
-        # Let's take care of the main numbering
-        systems["Format"] = np.nan
-        item_count = 10
-        for idx in systems.index:
-            if pd.notna(systems.loc[idx, "NO"]):
-                try:
-                    systems.at[idx, "NO"] = item_count
-                    systems.at[idx, "Format"] = "Title"
-                    item_count += 10
-                except Exception as e:
-                    print(str(e))
-                    pass
-
-        # Move Option and Included to scope
-        for idx in systems.index:
-            if str(systems.loc[idx, "Subtotal Price"]).lower() in [
-                "option",
-                "optional",
-            ]:
-                systems.at[idx, "Scope"] = "OPTION"
-            if str(systems.loc[idx, "Subtotal Price"]).lower() in [
-                "included",
-                "inclusive",
-            ]:
-                systems.at[idx, "Scope"] = "INCLUDED"
-
-        # Cleaning data
-        for idx in systems.index:
-            # if set_nitty_gritty(str(systems.loc[idx, 'Description'])) != 'None':
-            #     systems.at[idx, 'Description'] = set_nitty_gritty(str(systems.loc[idx, 'Description']))
-            if (
-                str(systems.loc[idx, "Model"]).lower().strip()
-                == "start line:  delete forbidden"
-            ):
-                systems.at[idx, "Model"] = np.nan
-            if (
-                str(systems.loc[idx, "UC"]).lower().strip() == "true"
-                or str(systems.loc[idx, "UC"]).lower().strip() == "false"
-            ):
-                systems.at[idx, "UC"] = np.nan
-            if (
-                str(systems.loc[idx, "SC"]).lower().strip() == "true"
-                or str(systems.loc[idx, "SC"]).lower().strip() == "false"
-            ):
-                systems.at[idx, "SC"] = np.nan
-            if (
-                str(systems.loc[idx, "Model"]).lower().strip() == "true"
-                or str(systems.loc[idx, "Model"]).lower().strip() == "false"
-            ):
-                systems.at[idx, "Model"] = np.nan
+        systems = clean_legacy_systems(systems)
 
         # Previoulsy using Proposal_Template.xlsx
-        # url = "https://filedn.com/liTeg81ShEXugARC7cg981h/Proposal_Template.xlsx"
-        # Now using Template.xlsx
-        url = "https://filedn.com/liTeg81ShEXugARC7cg981h/Template.xlsx"
-        resp = requests.get(url)
-
-        with open(Path(directory, "Template.xlsx"), "wb") as fd:
-            for chunk in resp.iter_content(chunk_size=8192):
-                fd.write(chunk)
+        # Now using Template.xlsx, from the local cache (template_cache.py)
+        copy_cached_file("Template.xlsx", directory)
 
         # Copy sheet from template to new workbook
         nb = xw.Book()
@@ -2698,7 +2458,7 @@ def convert_legacy(wb):
         for system in system_names:
             sheet = nb.sheets[system]
             unhide_columns(sheet)
-            last_row = sheet.range("G1500").end("up").row
+            last_row = get_last_row(sheet, "G")
             sheet.range("AL" + str(last_row)).value = "Title"
             sheet.page_setup.print_area = "A1:H" + str(last_row)
 
@@ -2756,60 +2516,85 @@ def fill_formula_active_row(wb, ws):
         )
 
 
-def delete_extra_empty_row(ws):
+def empty_row_runs(data):
+    """
+    Rows to delete from a 2-D list of row values (the first being row 1):
+    all but the first row of every run of 2 or more empty rows.
+    Returns (first, last) Excel row pairs, from the top.
+    """
+    values = np.array(data, dtype=object).reshape(len(data), -1)
+    empty = (np.equal(values, None) | np.equal(values, "")).all(axis=1)
+    # Edges of the runs of empty rows: start at even, stop at odd positions
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], empty, [False]))))
+    starts, stops = edges[::2], edges[1::2]
+    long = stops - starts >= 2
+    # Keep the first empty row of a run (Excel row start + 1)
+    return list(zip((starts[long] + 2).tolist(), stops[long].tolist()))
+
+
+def row_areas(runs, limit=MAX_ADDRESS):
+    """
+    Addresses of several row ranges ("4:6,9:12") for (first, last) runs,
+    each at most limit characters long, the bottom rows first.
     """
-    Delete consecutive empty rows (2 or more) from a worksheet.
+    areas = []
+    parts = []
+    length = -1
+    for first, last in sorted(runs, reverse=True):
+        part = f"{first}:{last}"
+        if parts and length + 1 + len(part) > limit:
+            areas.append(",".join(reversed(parts)))
+            parts, length = [], -1
+        parts.append(part)
+        length += 1 + len(part)
+    if parts:
+        areas.append(",".join(reversed(parts)))
+    return areas
+
+
+def delete_extra_empty_row(ws, snapshot=None):
+    """
+    Delete consecutive empty rows (2 or more) from a worksheet, keeping one.
 
-    Optimized to read all data at once instead of row-by-row COM calls.
+    A:H is read at once and the rows are deleted with one multi-area delete
+    per row_areas() address. Deleting keeps a single empty row per run, so
+    a second call deletes nothing. Returns the number of rows deleted.
     """
-    c_column = ws.range("C1500").end("up").row
-    g_column = ws.range("G1500").end("up").row
+    if snapshot is not None:
+        c_column = snapshot.last_row(ws.name, "C")
+        g_column = snapshot.last_row(ws.name, "G")
+    else:
+        bottom = ws.used_range.last_cell.row
+        c_column = get_last_row(ws, "C", bottom)
+        g_column = get_last_row(ws, "G", bottom)
     last_row = max(c_column, g_column)
 
     if last_row <= 1:
-        return
+        return 0
 
     # Read all data at once (single COM call instead of row-by-row)
-    data = ws.range(f"A1:H{last_row}").value
-
-    # Handle single row case (value is a list, not list of lists)
-    if last_row == 1:
-        data = [data]
-
-    # Find empty rows using numpy for speed
-    empty_mask = np.array(
-        [all(cell is None or cell == "" for cell in row) for row in data]
+    if snapshot is not None:
+        data = snapshot.rows(ws.name, "A", "H", 1, last_row)
+    else:
+        data = ws.range(f"A1:H{last_row}").options(ndim=2).value
+
+    runs = empty_row_runs(data)
+    # Areas are deleted from the bottom up, so rows above them do not move
+    for address in row_areas(runs):
+        ws.range(address).delete(shift="up")
+    if snapshot is not None:
+        snapshot.deleted(ws.name, runs)
+    return sum(last - first + 1 for first, last in runs)
+
+
+def delete_extra_empty_row_wb(wb, snapshot=None):
+    """delete_extra_empty_row() of every system sheet. Returns the rows deleted."""
+    return sum(
+        delete_extra_empty_row(sheet, snapshot=snapshot)
+        for sheet in wb.sheets
+        if not should_skip_sheet(sheet.name)
     )
 
-    # Find ranges of consecutive empty rows (2 or more)
-    ranges_to_delete = []
-    i = 0
-    while i < len(empty_mask):
-        if empty_mask[i]:
-            # Found start of empty region
-            start = i
-            while i < len(empty_mask) and empty_mask[i]:
-                i += 1
-            end = i
-            # Only delete if 2 or more consecutive empty rows
-            # Keep one empty row, delete the rest
-            if end - start >= 2:
-                # Delete from start+1 to end (keep one empty row)
-                ranges_to_delete.append((start + 2, end))  # +2 for 1-based Excel row
-        else:
-            i += 1
-
-    # Delete ranges from bottom to top to avoid index shifting
-    for start_row, end_row in reversed(ranges_to_delete):
-        ws.range(f"{start_row}:{end_row}").delete(shift="up")
-
-
-def delete_extra_empty_row_wb(wb):
-
-    for sheet in wb.sheets:
-        if not should_skip_sheet(sheet.name):
-            delete_extra_empty_row(sheet)
-
 
 def format_cell_data_sheet(sheet):
     """
@@ -2819,7 +2604,7 @@ def format_cell_data_sheet(sheet):
     Optimized to format only used range instead of entire columns.
     """
     if not should_skip_sheet(sheet.name):
-        last_row = sheet.range("C1500").end("up").row + 1
+        last_row = get_last_row(sheet, "C") + 1
         lr = str(last_row)
 
         # Set cell font and size for data range only
@@ -2870,38 +2655,38 @@ def format_cell_data(wb):
         format_cell_data_sheet(sheet)
 
 
-def download_file(path, filename, url):
+def copy_cached_file(name, path, filename=None):
     """
-    path: directory
-    filename: filename with extension
-    url: url to download
+    Copy a file of the download folder from the local cache (see
+    template_cache.py) to path, as filename (default: its own name).
+    Only the first use, or a damaged cache, downloads it.
     """
-    import requests
+    from template_cache import TemplateCache
+
+    local_file_path = Path(path, filename or Path(name).name)
+    shutil.copyfile(TemplateCache().path(name), local_file_path)
+    return local_file_path
 
-    local_file_path = Path(path, filename)
-    if not os.path.exists(local_file_path):
-        response = requests.get(url)
-        if response.status_code == 200:
-            with open(local_file_path, "wb") as fd:
-                for chunk in response.iter_content(chunk_size=8192):
-                    fd.write(chunk)
-            print(f"Downloaded {local_file_path}")
-        else:
-            print("Download is not necessary.")
 
+def refresh_cached_files():
+    """Check the cached download folder files against the server now."""
+    from template_cache import TemplateCache
 
-# Download necessary files to local machine in 'Documents' folder
+    changed = TemplateCache().refresh()
+    xw.apps.active.alert(  # type: ignore
+        f"Updated: {', '.join(changed)}" if changed else "Templates are up to date."
+    )
+
+
+# Copy necessary files to local machine in 'Documents' folder
 def download_logo():
     try:
         bid = os.path.join(os.path.expanduser("~/Documents"), "Bid")
         if not os.path.exists(bid):
             os.makedirs(bid)
-        # Download Jason Logo
-        download_file(
-            bid,
-            "Jason_Transparent_Logo_SS.png",
-            "https://filedn.com/liTeg81ShEXugARC7cg981h/Bid/Jason_Transparent_Logo_SS.png",
-        )
+        # Jason Logo
+        if not os.path.exists(Path(bid, "Jason_Transparent_Logo_SS.png")):
+            copy_cached_file("Bid/Jason_Transparent_Logo_SS.png", bid)
     except Exception as e:
         print(f"{e} has occured.")
 
@@ -2910,14 +2695,9 @@ def download_logo():
 def download_template():
     try:
         bid = os.path.join(os.path.expanduser("~/Documents"), "Bid")
-        filename = "Template.xlsx"
-        file_path = Path(bid, filename)
-        # Delete the file if exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        download_file(
-            bid, filename, "https://filedn.com/liTeg81ShEXugARC7cg981h/Template.xlsx"
-        )
+        os.makedirs(bid, exist_ok=True)
+        # Overwrites the previous copy
+        file_path = copy_cached_file("Template.xlsx", bid)
         wb = xw.Book.caller()
         wb.app.books.open(file_path.absolute(), password=hide.legacy)
     except Exception as e:
@@ -2942,16 +2722,9 @@ def create_new_template():
 def download_planner():
     try:
         bid = os.path.join(os.path.expanduser("~/Documents"), "Bid")
-        filename = "Planner.xlsx"
-        file_path = Path(bid, filename)
-        # Delete the file if exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        download_file(
-            bid,
-            filename,
-            "https://filedn.com/liTeg81ShEXugARC7cg981h/Project_Planner_R0.xlsx",
-        )
+        os.makedirs(bid, exist_ok=True)
+        # Overwrites the previous copy
+        file_path = copy_cached_file("Project_Planner_R0.xlsx", bid, "Planner.xlsx")
         wb = xw.Book.caller()
         wb.app.books.open(file_path.absolute())
     except Exception as e:
@@ -3014,9 +2787,11 @@ def update_template_version(wb):
 
 def update_checklist(wb):
     "Update checklist"
+    import checklist_collections as cc
+
     wb.sheets["Config"].range("C15").value = LATEST_MINOR_REVISION
     # Clear previous data if any
-    last_row = wb.sheets["Config"].range("A1500").end("up").row
+    last_row = get_last_row(wb.sheets["Config"], "A")
     if last_row > 95:
         wb.sheets["Config"].range(f"A95:A{last_row}").clear()
     wb.sheets["Config"].range("A95").value = "SYSTEMS"
@@ -3042,7 +2817,7 @@ def update_checklist(wb):
 
     # For general checklist
     # Clear previous data if any
-    last_row = wb.sheets["Config"].range("E1500").end("up").row
+    last_row = get_last_row(wb.sheets["Config"], "E")
     if last_row > 95:
         wb.sheets["Config"].range(f"E95:E{last_row}").clear()
     wb.sheets["Config"].range("E95").value = "CHECKLISTS"
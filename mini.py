@@ -7,6 +7,8 @@
 #     "pandas",
 #     "requests",
 #     "reportlab",
+#     "openpyxl",
+#     "msoffcrypto-tool",
 # ]
 # ///
 """
@@ -15,27 +17,43 @@ Run operations without Excel stealing focus.
 
 Usage:
     ./mini.py fix <file>                # Fill formulas and fix workbook
+    ./mini.py fix <file> --offline      # Same, without Excel (openpyxl)
+    ./mini.py fix <file> --group-keys   # Linear-time lumpsum/title formulas
     ./mini.py summary <file>            # Generate summary sheet
     ./mini.py summary <file> --discount # Generate summary with discount
     ./mini.py summary <file> --detail   # Generate summary with detail
+    ./mini.py summary <file> --offline  # Generate summary without Excel
     ./mini.py commercial <file>         # Generate commercial PDF
     ./mini.py technical <file>          # Generate technical PDF
+    ./mini.py --profile fix <file>      # Also write <file>.profile.json
+    ./mini.py serve                     # Keep a warm worker for the commands
+    ./mini.py batch <dir|glob> --op fix,commercial  # Many workbooks in parallel
+    ./mini.py export <file> --all       # Commercial, technical and internal
+
+Heavy modules (pandas, xlwings, functions) are imported when a job runs,
+so commands handed to a running `mini serve` worker start quickly
+(`python benchmark.py startup` times the import of this module).
 """
 
+import glob
+import io
+import os
 import sys
 import time
+from contextlib import contextmanager, nullcontext, redirect_stderr, redirect_stdout
 from pathlib import Path
 
 import click
-import xlwings as xw
-
-import functions
-import hide
-from excel import (
-    is_script_running,
-    acquire_lock,
-    release_lock,
-)
+
+import worker
+
+# Set by `mini --profile`: records the Excel calls of the operation
+PROFILER = None
+# Set by `mini serve`: keep the Excel app open between jobs
+KEEP_APP = False
+# Set in `mini batch`/`mini export` processes: the Excel app of the workbook
+# being processed
+BATCH_APP = None
 
 # CLI Mode Alert Handling
 
@@ -48,16 +66,38 @@ def cli_alert(message, title=None, buttons="ok", mode=None, callback=None):
 
 def enable_cli_mode():
     """Patch xlwings alert to use terminal output."""
+    import xlwings as xw
+
     xw.App.alert = lambda self, *args, **kwargs: cli_alert(*args, **kwargs)
 
 
 # Workbook Operations
 
 
-def open_workbook(filepath: str):
-    """Open workbook using existing Excel app or create new instance."""
+def open_workbook(filepath: str, offline: bool = False):
+    """
+    Open workbook using existing Excel app or create new instance.
+    With offline=True the workbook is opened with the openpyxl backend
+    (offline.py) and Excel is not used at all.
+    """
+    import hide
+
+    if offline:
+        import offline as backend
+
+        app = backend.App()
+        wb = app.books.open(filepath, password=hide.legacy)
+        return profiled(app), profiled(wb), True, False
+
+    import xlwings as xw
+
+    if BATCH_APP is not None:
+        # The app of the batch process, see batch_app()
+        app = BATCH_APP
+        created_app = False
+        original_screen_updating = False
     # Use existing Excel app if available to avoid PERSONAL.XLSB conflict
-    if xw.apps:
+    elif xw.apps:
         app = xw.apps.active
         created_app = False
         original_screen_updating = app.screen_updating
@@ -66,38 +106,135 @@ def open_workbook(filepath: str):
         app = xw.App(visible=False)
         created_app = True
         original_screen_updating = True
+        if KEEP_APP:
+            import functions
+
+            # PERSONAL.XLSB references of a previous (closed) app are invalid
+            functions.clear_macro_cache()
 
     app.display_alerts = False
     app.screen_updating = False
     wb = app.books.open(filepath, password=hide.legacy)
 
-    return app, wb, created_app, original_screen_updating
+    return profiled(app), profiled(wb), created_app, original_screen_updating
+
+
+@contextmanager
+def batch_app(shared=False):
+    """
+    Set BATCH_APP for a mini batch/export process: a new hidden Excel app,
+    quit at the end of the block, with PERSONAL.XLSB opened in it for the
+    macros (functions.open_macro_nb()). On macOS, where every process
+    shares the one Excel instance, or if shared (see shared_excel()), a
+    running Excel is used and left running (only the workbooks opened in
+    the block are closed).
+    """
+    global BATCH_APP
+    import xlwings as xw
+
+    import functions
+
+    created = not ((shared or sys.platform == "darwin") and xw.apps)
+    BATCH_APP = xw.App(visible=False, add_book=False) if created else xw.apps.active
+    BATCH_APP.display_alerts = False
+    functions.open_macro_nb(BATCH_APP)
+    try:
+        yield BATCH_APP
+    finally:
+        functions.clear_macro_cache()
+        if created:
+            BATCH_APP.quit()
+        BATCH_APP = None
+
+
+@contextmanager
+def profiling(enabled: bool):
+    """Set PROFILER (mini --profile) for the operations run in the block."""
+    global PROFILER
+    import functions
+    from profiler import Profiler
+
+    PROFILER = Profiler() if enabled else None
+    try:
+        with PROFILER.instrument(functions) if PROFILER else nullcontext():
+            yield PROFILER
+    finally:
+        PROFILER = None
+
+
+@contextmanager
+def text_cache():
+    """Warm the text caches from the last runs, and save them after the block."""
+    import normalize
+
+    normalize.load()
+    try:
+        yield
+    finally:
+        normalize.save()
+
 
+def profiled(obj):
+    """Return obj wrapped by the --profile profiler, or obj itself."""
+    return obj if PROFILER is None else PROFILER.wrap(obj)
+
+
+def write_profile(filepath: str, operation: str, elapsed: float) -> None:
+    """Write the --profile report next to the workbook (<name>.profile.json)."""
+    if PROFILER is None:
+        return
+    path = PROFILER.write(
+        Path(filepath).with_suffix(".profile.json"),
+        operation=operation,
+        file=filepath,
+        seconds=round(elapsed, 3),
+    )
+    click.echo(f"[PROFILE] {operation} report: {path}")
+
+
+def run_fix_workbook(
+    filepath: str, offline: bool = False, group_keys: bool = False
+) -> bool:
+    """
+    Run fill_formula_wb operation (Fix Workbook).
+
+    With group_keys=True the lumpsum/title formulas use the AX group key
+    column instead of an XMATCH look-ahead per row.
+    """
+    import functions
 
-def run_fix_workbook(filepath: str) -> bool:
-    """Run fill_formula_wb operation (Fix Workbook)."""
     start_time = time.perf_counter()
     click.echo(f"Opening: {filepath}")
-    app, wb, created_app, original_screen_updating = open_workbook(filepath)
+    app, wb, created_app, original_screen_updating = open_workbook(
+        filepath, offline=offline
+    )
 
     try:
         if "Config" not in wb.sheet_names:
             click.echo("[ERROR] The excel file is not a recognized template.", err=True)
             return False
 
-        click.echo("Updating template version check...")
-        functions.update_template_version(wb)
+        if offline:
+            # Template updates and conditional formats use PERSONAL.XLSB macros
+            click.echo("Skipping template update and conditional formats (offline)")
+        else:
+            click.echo("Updating template version check...")
+            functions.update_template_version(wb)
+
+        from snapshot import WorkbookSnapshot
+
+        # One read of the system sheets, shared until a step changes them
+        snapshot = WorkbookSnapshot(wb)
 
         click.echo("Cleaning up empty rows...")
-        functions.delete_extra_empty_row_wb(wb)
-        functions.delete_extra_empty_row_wb(wb)
+        functions.delete_extra_empty_row_wb(wb, snapshot=snapshot)
 
         click.echo("Numbering titles...")
         count, step = functions.get_num_scheme(wb)
-        functions.number_title(wb, count=count, step=step)
+        functions.number_title(wb, count=count, step=step, snapshot=snapshot)
 
         click.echo("Filling formulas...")
-        functions.fill_formula_wb(wb)
+        functions.fill_formula_wb(wb, snapshot=snapshot, group_keys=group_keys)
 
         click.echo("Formatting text...")
         functions.format_text(
@@ -105,6 +242,7 @@ def run_fix_workbook(filepath: str) -> bool:
             indent_description=True,
             bullet_description=True,
             title_lineitem_or_description=True,
+            snapshot=snapshot,
         )
 
         click.echo("Formatting cells...")
@@ -113,8 +251,9 @@ def run_fix_workbook(filepath: str) -> bool:
         click.echo("Adjusting columns...")
         functions.adjust_columns_wb(wb)
 
-        click.echo("Applying conditional formatting...")
-        functions.conditional_format_wb(wb)
+        if not offline:
+            click.echo("Applying conditional formatting...")
+            functions.conditional_format_wb(wb)
 
         click.echo("Filling subtotals...")
         functions.fill_lastrow(wb)
@@ -129,6 +268,7 @@ def run_fix_workbook(filepath: str) -> bool:
         elapsed = time.perf_counter() - start_time
         click.echo(f"[SUCCESS] Workbook saved: {filepath}")
         click.echo(f"[TIME] fix_workbook completed in {elapsed:.2f}s")
+        write_profile(filepath, "fix_workbook", elapsed)
         return True
 
     except Exception as e:
@@ -137,12 +277,14 @@ def run_fix_workbook(filepath: str) -> bool:
     finally:
         wb.close()
         app.screen_updating = original_screen_updating
-        if created_app:
+        if created_app and not KEEP_APP:
             app.quit()
 
 
 def run_commercial(filepath: str) -> bool:
     """Run commercial PDF generation."""
+    import functions
+
     start_time = time.perf_counter()
     click.echo(f"Opening: {filepath}")
     app, wb, created_app, original_screen_updating = open_workbook(filepath)
@@ -157,6 +299,7 @@ def run_commercial(filepath: str) -> bool:
         elapsed = time.perf_counter() - start_time
         click.echo("[SUCCESS] Commercial PDF generated.")
         click.echo(f"[TIME] commercial completed in {elapsed:.2f}s")
+        write_profile(filepath, "commercial", elapsed)
         return True
 
     except Exception as e:
@@ -165,12 +308,14 @@ def run_commercial(filepath: str) -> bool:
     finally:
         wb.close()
         app.screen_updating = original_screen_updating
-        if created_app:
+        if created_app and not KEEP_APP:
             app.quit()
 
 
 def run_technical(filepath: str) -> bool:
     """Run technical PDF generation."""
+    import functions
+
     start_time = time.perf_counter()
     click.echo(f"Opening: {filepath}")
     app, wb, created_app, original_screen_updating = open_workbook(filepath)
@@ -181,6 +326,7 @@ def run_technical(filepath: str) -> bool:
         elapsed = time.perf_counter() - start_time
         click.echo("[SUCCESS] Technical PDF generated.")
         click.echo(f"[TIME] technical completed in {elapsed:.2f}s")
+        write_profile(filepath, "technical", elapsed)
         return True
 
     except Exception as e:
@@ -189,12 +335,14 @@ def run_technical(filepath: str) -> bool:
     finally:
         wb.close()
         app.screen_updating = original_screen_updating
-        if created_app:
+        if created_app and not KEEP_APP:
             app.quit()
 
 
 def run_with_lock(operation, filepath: str) -> bool:
     """Run operation with lock to prevent concurrent execution."""
+    from excel import acquire_lock, is_script_running, release_lock
+
     if is_script_running():
         click.echo(
             "[ERROR] Another operation is already running. Please wait.", err=True
@@ -212,52 +360,125 @@ def run_with_lock(operation, filepath: str) -> bool:
 
 
 @click.group()
-def cli() -> None:
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Write a JSON report of the Excel calls made per function",
+)
+@click.option(
+    "--no-worker",
+    is_flag=True,
+    help="Run in this process even if a mini serve worker is running",
+)
+@click.pass_context
+def cli(ctx, profile, no_worker) -> None:
     """CLI tool for minimalist Excel automation."""
-    enable_cli_mode()
+    ctx.obj = {"profile": profile, "no_worker": no_worker}
+
+
+def run_job(job: dict) -> bool:
+    """
+    Run one command, here or in the mini serve worker.
+    job: {"command": "fix", "file": <absolute path>, <options>, "profile": bool}
+    """
+    filepath = job["file"]
+    command = job["command"]
+    with text_cache(), profiling(job.get("profile", False)):
+        if command == "fix":
+            return run_fix(filepath, job["offline"], job["group_keys"])
+        if command == "commercial":
+            return run_with_lock(run_commercial, filepath)
+        if command == "technical":
+            return run_with_lock(run_technical, filepath)
+        if command == "summary":
+            discount, detail = job["discount"], job["detail"]
+            if job["offline"]:
+                return run_summary(filepath, discount, detail, offline=True)
+            return run_with_lock(
+                lambda f: run_summary(f, discount, detail), filepath
+            )
+    raise click.UsageError(f"Unknown command: {command}")
+
+
+def submit(ctx, command: str, file: str, **options) -> None:
+    """Run a command in the mini serve worker if one is running, else here."""
+    job = {
+        "command": command,
+        "file": str(Path(file).resolve()),
+        "profile": ctx.obj["profile"],
+        **options,
+    }
+    success = None if ctx.obj["no_worker"] else worker.submit(job)
+    if success is None:
+        enable_cli_mode()
+        success = run_job(job)
+    sys.exit(0 if success else 1)
+
+
+def run_fix(filepath: str, offline: bool, group_keys: bool = False) -> bool:
+    """Run fix_workbook, without the Excel lock when offline."""
+    if offline:
+        return run_fix_workbook(filepath, offline=True, group_keys=group_keys)
+    return run_with_lock(
+        lambda path: run_fix_workbook(path, group_keys=group_keys), filepath
+    )
 
 
 @cli.command("fix_workbook")  # pyright: ignore[reportFunctionMemberAccess]
 @click.argument("file", type=click.Path(exists=True))
-def fix_workbook_cmd(file):
+@click.option("--offline", is_flag=True, help="Process without Excel (openpyxl)")
+@click.option(
+    "--group-keys",
+    is_flag=True,
+    help="Use the AX group key column for lumpsum/title formulas",
+)
+@click.pass_context
+def fix_workbook_cmd(ctx, file, offline, group_keys):
     """Fill formulas and fix workbook."""
-    filepath = str(Path(file).resolve())
-    success = run_with_lock(run_fix_workbook, filepath)
-    sys.exit(0 if success else 1)
+    submit(ctx, "fix", file, offline=offline, group_keys=group_keys)
 
 
 @cli.command("fix")  # pyright: ignore[reportFunctionMemberAccess]
 @click.argument("file", type=click.Path(exists=True))
-def fix_cmd(file):
+@click.option("--offline", is_flag=True, help="Process without Excel (openpyxl)")
+@click.option(
+    "--group-keys",
+    is_flag=True,
+    help="Use the AX group key column for lumpsum/title formulas",
+)
+@click.pass_context
+def fix_cmd(ctx, file, offline, group_keys):
     """Alias for fix_workbook."""
-    filepath = str(Path(file).resolve())
-    success = run_with_lock(run_fix_workbook, filepath)
-    sys.exit(0 if success else 1)
+    submit(ctx, "fix", file, offline=offline, group_keys=group_keys)
 
 
 @cli.command("commercial")  # pyright: ignore[reportFunctionMemberAccess]
 @click.argument("file", type=click.Path(exists=True))
-def commercial_cmd(file):
+@click.pass_context
+def commercial_cmd(ctx, file):
     """Generate commercial PDF proposal."""
-    filepath = str(Path(file).resolve())
-    success = run_with_lock(run_commercial, filepath)
-    sys.exit(0 if success else 1)
+    submit(ctx, "commercial", file)
 
 
 @cli.command("technical")  # pyright: ignore[reportFunctionMemberAccess]
 @click.argument("file", type=click.Path(exists=True))
-def technical_cmd(file):
+@click.pass_context
+def technical_cmd(ctx, file):
     """Generate technical PDF proposal."""
-    filepath = str(Path(file).resolve())
-    success = run_with_lock(run_technical, filepath)
-    sys.exit(0 if success else 1)
+    submit(ctx, "technical", file)
 
 
-def run_summary(filepath: str, discount: bool, detail: bool) -> bool:
+def run_summary(
+    filepath: str, discount: bool, detail: bool, offline: bool = False
+) -> bool:
     """Run summary generation."""
+    import functions
+
     start_time = time.perf_counter()
     click.echo(f"Opening: {filepath}")
-    app, wb, created_app, original_screen_updating = open_workbook(filepath)
+    app, wb, created_app, original_screen_updating = open_workbook(
+        filepath, offline=offline
+    )
 
     try:
         if "Config" not in wb.sheet_names:
@@ -278,6 +499,7 @@ def run_summary(filepath: str, discount: bool, detail: bool) -> bool:
         elapsed = time.perf_counter() - start_time
         click.echo(f"[SUCCESS] Summary generated: {filepath}")
         click.echo(f"[TIME] summary completed in {elapsed:.2f}s")
+        write_profile(filepath, "summary", elapsed)
         return True
 
     except Exception as e:
@@ -286,7 +508,7 @@ def run_summary(filepath: str, discount: bool, detail: bool) -> bool:
     finally:
         wb.close()
         app.screen_updating = original_screen_updating
-        if created_app:
+        if created_app and not KEEP_APP:
             app.quit()
 
 
@@ -294,10 +516,428 @@ def run_summary(filepath: str, discount: bool, detail: bool) -> bool:
 @click.argument("file", type=click.Path(exists=True))
 @click.option("--discount", is_flag=True, help="Apply discount pricing")
 @click.option("--detail", is_flag=True, help="Include detailed breakdown")
-def summary_cmd(file, discount, detail):
+@click.option("--offline", is_flag=True, help="Process without Excel (openpyxl)")
+@click.pass_context
+def summary_cmd(ctx, file, discount, detail, offline):
     """Generate summary sheet."""
+    submit(ctx, "summary", file, discount=discount, detail=detail, offline=offline)
+
+
+@cli.command("serve")  # pyright: ignore[reportFunctionMemberAccess]
+@click.option("--port", default=0, help="Local port (default: any free port)")
+@click.option("--stop", is_flag=True, help="Stop the running worker")
+def serve_cmd(port, stop):
+    """Keep a worker running for the other commands (Ctrl+C to stop)."""
+    global KEEP_APP
+    if stop:
+        if worker.stop():
+            click.echo("[SUCCESS] Worker stopped.")
+        else:
+            click.echo("[INFO] No worker is running.")
+        return
+    if worker.running():
+        click.echo("[ERROR] A worker is already running.", err=True)
+        sys.exit(1)
+
+    # Import everything a job needs now, not on the first job
+    import functions  # noqa: F401
+    import offline  # noqa: F401
+    import profiler  # noqa: F401
+    import snapshot  # noqa: F401
+
+    enable_cli_mode()
+    KEEP_APP = True
+
+    def ready(address):
+        click.echo(f"[SUCCESS] Worker listening on {address[0]}:{address[1]}")
+
+    try:
+        worker.serve(run_job, port=port, on_ready=ready)
+    except KeyboardInterrupt:
+        pass
+    click.echo("[INFO] Worker stopped.")
+
+
+# Batch Processing
+
+WORKBOOK_SUFFIXES = (".xlsx", ".xlsm")
+BATCH_OPS = {
+    "fix": lambda filepath, offline: run_fix_workbook(filepath, offline=offline),
+    "summary": lambda filepath, offline: run_summary(
+        filepath, False, False, offline=offline
+    ),
+    "commercial": lambda filepath, offline: run_commercial(filepath),
+    "technical": lambda filepath, offline: run_technical(filepath),
+}
+EXCEL_OPS = ("commercial", "technical")  # PDF export needs Excel
+# Ops using PERSONAL.XLSB (macros and design rows) with Excel
+MACRO_OPS = ("fix", "summary", "commercial", "technical", "internal")
+
+
+def shared_excel(ops: list[str]) -> bool:
+    """
+    Whether the mini batch/export processes must share the running Excel
+    (one at a time): on macOS, where there is only one, and when the ops
+    use PERSONAL.XLSB but it can't be opened in a new app, as it isn't in
+    the XLSTART folder.
+    """
+    import functions
+
+    if sys.platform == "darwin":
+        return True
+    uses_macros = bool(set(ops) & set(MACRO_OPS))
+    return uses_macros and functions.personal_macro_path() is None
+
+
+def batch_files(target: str) -> list[str]:
+    """Workbooks in a directory (not recursive) or matching a glob pattern."""
+    path = Path(target)
+    if path.is_dir():
+        candidates = path.iterdir()
+    else:
+        candidates = (Path(p) for p in glob.glob(target, recursive=True))
+    return sorted(
+        str(p.resolve())
+        for p in candidates
+        if p.is_file()
+        and p.suffix.lower() in WORKBOOK_SUFFIXES
+        and not p.name.startswith("~$")  # Excel lock files
+    )
+
+
+def batch_file(
+    filepath: str, ops: list[str], offline: bool, profile: bool, shared: bool = False
+):
+    """
+    Run the ops on one workbook in a mini batch process, in the Excel app of
+    batch_app(shared) (or offline backend). Ops after a failed one are skipped.
+    Returns [(op, status, seconds)] and the output of the ops.
+    """
+    enable_cli_mode()
+    output = io.StringIO()
+    results = []
+    with redirect_stdout(output), redirect_stderr(output), text_cache():
+        try:
+            with nullcontext() if offline else batch_app(shared):
+                for op in ops:
+                    if results and results[-1][1] != "ok":
+                        results.append((op, "skipped", 0.0))
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        with profiling(profile):
+                            success = BATCH_OPS[op](filepath, offline)
+                    except Exception as e:
+                        click.echo(f"[ERROR] {e}", err=True)
+                        success = False
+                    elapsed = time.perf_counter() - start
+                    results.append((op, "ok" if success else "failed", elapsed))
+        except Exception as e:
+            click.echo(f"[ERROR] {e}", err=True)
+            done = {op for op, _, _ in results}
+            results += [(op, "failed", 0.0) for op in ops if op not in done]
+    return results, output.getvalue()
+
+
+def print_batch_table(rows: dict, ops: list[str]) -> None:
+    """Final mini batch table: one line per file with the time of each op."""
+    width = max([len("File")] + [len(Path(f).name) for f in rows]) + 2
+    click.echo("\n" + "File".ljust(width) + "".join(op.rjust(12) for op in ops))
+    for filepath, results in rows.items():
+        cells = []
+        for op, status, seconds in results:
+            cells.append((f"{seconds:.2f}s" if status == "ok" else status).rjust(12))
+        click.echo(Path(filepath).name.ljust(width) + "".join(cells))
+
+
+@cli.command("batch")  # pyright: ignore[reportFunctionMemberAccess]
+@click.argument("target")
+@click.option(
+    "--op",
+    "ops",
+    default="fix",
+    show_default=True,
+    help="Comma separated operations: fix, summary, commercial, technical",
+)
+@click.option("--jobs", "-j", type=int, help="Parallel processes (default: CPUs)")
+@click.option("--offline", is_flag=True, help="Process without Excel (openpyxl)")
+@click.option("--verbose", is_flag=True, help="Show the output of every file")
+@click.pass_context
+def batch_cmd(ctx, target, ops, jobs, offline, verbose):
+    """Run operations on all workbooks of a directory or glob pattern."""
+    ops = [op.strip() for op in ops.split(",") if op.strip()]
+    unknown = [op for op in ops if op not in BATCH_OPS]
+    if unknown:
+        raise click.BadParameter(f"Unknown operation: {', '.join(unknown)}")
+    if offline and set(ops) & set(EXCEL_OPS):
+        raise click.BadParameter("PDF export (commercial, technical) needs Excel")
+    files = batch_files(target)
+    if not files:
+        click.echo(f"[ERROR] No workbooks found: {target}", err=True)
+        sys.exit(1)
+    if not offline:
+        from excel import is_script_running
+
+        if is_script_running():
+            click.echo(
+                "[ERROR] Another operation is already running. Please wait.", err=True
+            )
+            sys.exit(1)
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    shared = not offline and shared_excel(ops)
+    if shared:
+        # One Excel instance, shared by all the processes
+        jobs = 1
+    jobs = jobs or min(os.cpu_count() or 1, len(files))
+    click.echo(f"Processing {len(files)} workbooks with {jobs} processes...")
+    start_time = time.perf_counter()
+    rows = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(batch_file, f, ops, offline, ctx.obj["profile"], shared): f
+            for f in files
+        }
+        for future in as_completed(futures):
+            filepath = futures[future]
+            try:
+                results, output = future.result()
+            except Exception as e:  # e.g. the process crashed
+                results, output = [(op, "failed", 0.0) for op in ops], f"[ERROR] {e}\n"
+            rows[filepath] = results
+            failed = any(status != "ok" for _, status, _ in results)
+            seconds = sum(s for _, _, s in results)
+            status = "FAILED" if failed else "OK"
+            click.echo(f"[{status}] {Path(filepath).name} ({seconds:.2f}s)")
+            if failed or verbose:
+                for line in output.splitlines():
+                    click.echo(f"    {line}")
+
+    rows = {f: rows[f] for f in files}
+    print_batch_table(rows, ops)
+    failed = [f for f, r in rows.items() if any(s != "ok" for _, s, _ in r)]
+    elapsed = time.perf_counter() - start_time
+    click.echo(
+        f"\n[TIME] batch of {len(files)} workbooks completed in {elapsed:.2f}s: "
+        f"{len(files) - len(failed)} ok, {len(failed)} failed"
+    )
+    sys.exit(1 if failed else 0)
+
+
+# Export: the deliverables of one workbook from a single calculation
+
+EXPORT_OPS = ("commercial", "technical", "internal")
+
+
+def export_outputs(filepath: str, op: str) -> list[Path]:
+    """Files written by an export op, next to the workbook."""
+    path = Path(filepath)
+    name = path.name[:-4]  # As functions.py: "proposal.xlsx" -> "proposal."
+    if op == "technical" and name.startswith("Commercial "):
+        name = name[len("Commercial ") :]
+    prefix = op.capitalize()
+    suffixes = ("xlsx",) if op == "internal" else ("xlsx", "pdf")
+    return [path.with_name(f"{prefix} {name}{suffix}") for suffix in suffixes]
+
+
+def export_snapshot(filepath: str, snapshot: Path) -> None:
+    """
+    Open the workbook, calculate it once and save the calculated copy to
+    snapshot with manual calculation: Excel takes the calculation mode of the
+    first workbook it opens, so the export processes do not calculate the
+    copies again when they open them.
+    """
+    import functions
+
+    app, wb, created_app, original_screen_updating = open_workbook(filepath)
+    calculation = app.calculation
+    try:
+        if "Config" not in wb.sheet_names:
+            raise ValueError("The excel file is not a recognized template.")
+        app.calculate()
+        app.calculation = "manual"
+        functions.save_workbook_safe(wb, snapshot)
+    finally:
+        app.calculation = calculation
+        wb.close()
+        app.screen_updating = original_screen_updating
+        if created_app and not KEEP_APP:
+            app.quit()
+
+
+def run_export_op(filepath: str, op: str, directory: str) -> bool:
+    """Run one export op on a snapshot copy, writing the outputs to directory."""
+    import functions
+
+    start_time = time.perf_counter()
+    app, wb, created_app, original_screen_updating = open_workbook(filepath)
+    calculation = app.calculation
+    # The snapshot copy is saved with manual calculation (export_snapshot()),
+    # but the outputs are opened by engineers: save them calculating
+    app.calculation = "automatic"
+    try:
+        click.echo(f"Generating {op}...")
+        if op == "internal":
+            functions.internal_costing(wb, directory=directory)
+        else:
+            getattr(functions, op)(wb, show_pdf=False, directory=directory)
+        elapsed = time.perf_counter() - start_time
+        target = Path(directory, Path(filepath).name)
+        missing = [p.name for p in export_outputs(str(target), op) if not p.exists()]
+        if missing:
+            click.echo(f"[ERROR] Not written: {', '.join(missing)}", err=True)
+            return False
+        click.echo(f"[TIME] {op} completed in {elapsed:.2f}s")
+        write_profile(str(target.with_suffix(f".{op}.xlsx")), op, elapsed)
+        return True
+    finally:
+        wb.close()
+        app.calculation = calculation
+        app.screen_updating = original_screen_updating
+        if created_app and not KEEP_APP:
+            app.quit()
+
+
+def export_file(
+    filepath: str, op: str, directory: str, profile: bool, shared: bool = False
+):
+    """
+    Run one export op in a mini export process, in the Excel app of
+    batch_app(shared).
+    Returns (op, status, seconds) and the output of the op.
+    """
+    enable_cli_mode()
+    output = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            with batch_app(shared), text_cache(), profiling(profile):
+                success = run_export_op(filepath, op, directory)
+        except Exception as e:
+            click.echo(f"[ERROR] {e}", err=True)
+            success = False
+    status = "ok" if success else "failed"
+    return (op, status, time.perf_counter() - start), output.getvalue()
+
+
+def run_export(
+    filepath: str,
+    ops: list[str],
+    jobs: int | None = None,
+    profile: bool = False,
+    verbose: bool = False,
+) -> bool:
+    """
+    Write the outputs of the ops from one calculated snapshot of the
+    workbook: each op works on its own copy in a separate process, so the
+    source workbook is opened and calculated once and is left unchanged.
+    """
+    outputs = [p for op in ops for p in export_outputs(filepath, op)]
+    existing = [p.name for p in outputs if p.exists()]
+    if existing:
+        click.echo(
+            f"[ERROR] Already exists: {', '.join(existing)}. "
+            "Please delete the files and try again.",
+            err=True,
+        )
+        return False
+
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    start_time = time.perf_counter()
+    source = Path(filepath)
+    with tempfile.TemporaryDirectory(prefix="mini_export_") as tmp:
+        click.echo(f"Opening: {filepath}")
+        snapshot = Path(tmp, source.name)
+        try:
+            export_snapshot(filepath, snapshot)
+        except Exception as e:
+            click.echo(f"[ERROR] {e}", err=True)
+            return False
+
+        # The copies keep the name of the workbook, which the ops rely on
+        copies = {}
+        for op in ops:
+            copies[op] = Path(tmp, op, source.name)
+            copies[op].parent.mkdir()
+            shutil.copyfile(snapshot, copies[op])
+
+        shared = shared_excel(ops)
+        if shared:
+            # One Excel instance: workbooks of the same name can't be open together
+            jobs = 1
+        jobs = jobs or len(ops)
+        click.echo(f"Exporting {', '.join(ops)} with {jobs} processes...")
+        results = {}
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(
+                    export_file,
+                    str(copies[op]),
+                    op,
+                    str(source.parent),
+                    profile,
+                    shared,
+                ): op
+                for op in ops
+            }
+            for future in as_completed(futures):
+                op = futures[future]
+                try:
+                    result, output = future.result()
+                except Exception as e:  # e.g. the process crashed
+                    result, output = (op, "failed", 0.0), f"[ERROR] {e}\n"
+                results[op] = result
+                status = "OK" if result[1] == "ok" else "FAILED"
+                click.echo(f"[{status}] {op} ({result[2]:.2f}s)")
+                if status != "OK" or verbose:
+                    for line in output.splitlines():
+                        click.echo(f"    {line}")
+
+    rows = {filepath: [results[op] for op in ops]}
+    print_batch_table(rows, ops)
+    failed = [op for op in ops if results[op][1] != "ok"]
+    elapsed = time.perf_counter() - start_time
+    click.echo(
+        f"\n[TIME] export completed in {elapsed:.2f}s: "
+        f"{len(ops) - len(failed)} ok, {len(failed)} failed"
+    )
+    return not failed
+
+
+@cli.command("export")  # pyright: ignore[reportFunctionMemberAccess]
+@click.argument("file", type=click.Path(exists=True))
+@click.option(
+    "--all", "all_ops", is_flag=True, help="Commercial, technical and internal"
+)
+@click.option(
+    "--op",
+    "ops",
+    help="Comma separated outputs: commercial, technical, internal",
+)
+@click.option("--jobs", "-j", type=int, help="Parallel processes (default: one per op)")
+@click.option("--verbose", is_flag=True, help="Show the output of every op")
+@click.pass_context
+def export_cmd(ctx, file, all_ops, ops, jobs, verbose):
+    """Generate several outputs from one calculation of the workbook."""
+    if all_ops:
+        ops = list(EXPORT_OPS)
+    elif ops:
+        ops = [op.strip() for op in ops.split(",") if op.strip()]
+    else:
+        raise click.UsageError("Give --all or --op")
+    unknown = [op for op in ops if op not in EXPORT_OPS]
+    if unknown:
+        raise click.BadParameter(f"Unknown output: {', '.join(unknown)}")
+
+    enable_cli_mode()
     filepath = str(Path(file).resolve())
-    success = run_with_lock(lambda f: run_summary(f, discount, detail), filepath)
+    success = run_with_lock(
+        lambda f: run_export(f, ops, jobs, ctx.obj["profile"], verbose), filepath
+    )
     sys.exit(0 if success else 1)
 
 
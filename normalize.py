@@ -0,0 +1,207 @@
+"""
+Description text clean up, compiled once to ordered rule tables.
+© Thiha Aung (infowizard@gmail.com)
+
+set_nitty_gritty(), set_comma_space() and set_x() in functions.py apply
+these rules to one text, and format_text() to a whole column:
+
+    descriptions = normalize.nitty_gritty_series(descriptions)
+
+A rule is (pattern, replacement, guard). The replacement is only made in
+the texts where guard (a substring, or a pattern searched for) is found.
+Checking a guard costs much less than a replacement, and most
+descriptions pass few of them. Repeated descriptions are cleaned once.
+
+The rules give the same text as the replacements they replaced, which
+found each word and substituted it wherever it appeared in the text. The
+one case where that differs from a single substitution, a comma after a
+digit (1,200), is handled by _digit_comma().
+
+Descriptions repeat across systems and revisions, so the text helpers
+(nitty_gritty() here, the case helpers of functions.py) are wrapped in
+@cached: a bounded LRU cache per helper, with hit and miss counters
+(cache_stats(), reported by the profiler). save() and load() keep the
+most recent entries in the user cache directory between mini runs.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+MAXSIZE = 50_000  # Entries per helper
+SAVED = 5_000  # Most recent entries per helper kept by save()
+CACHES = {}  # name: TextCache
+_loaded = False
+
+# Words after a comma that is not preceded by a digit
+_COMMA_WORD = re.compile(r"(?<![0-9]),(\w+)")
+
+
+def _digit_comma(match):
+    """
+    A comma after a digit gets a space too if the word after it starts with
+    a word that follows another comma (which gets the space): "1,ab x,a".
+    """
+    word = match.group(1)
+    if any(word.startswith(other) for other in _COMMA_WORD.findall(match.string)):
+        return ", " + word
+    return match.group(0)
+
+
+NITTY_GRITTY = [
+    # Strip 2 or more spaces
+    (re.compile(" {2,}"), " ", "  "),
+    # Put bullet point for Sub-subitem preceded by '-' or '~'.
+    (re.compile("^(-|~)"), "•", re.compile("^[-~]")),
+    # Put bullet point for Sub-subitem preceded by a single * followed by space.
+    (re.compile(r"^[*?]\s"), " • ", re.compile(r"^[*?]\s")),
+    # Instead of ';' at the end of line, use ':' instead.
+    (re.compile(";$"), ":", ";"),
+]
+COMMA_SPACE = [
+    # Fix word+space+, to word+,
+    (re.compile(r"(\w)\s,"), r"\1,", ","),
+    # Fix word+,+no-space to word+,+space. Ignores format like 1,200
+    (re.compile(r"(?<=[0-9]),(\w+)"), _digit_comma, re.compile(r"[0-9],\w")),
+    (re.compile(r"(?<![0-9]),(\w)"), r", \1", ","),
+]
+X = [
+    # For cases such as 20x, 30X, if one of them is not followed by -
+    (re.compile(r"(\d)[xX]"), r"\1 x", re.compile(r"\d[xX](?!-)")),
+    # For cases such as x20, X30
+    (re.compile(r"[xX](\d)"), r"x \1", re.compile(r"[xX]\d")),
+    # For cases such as 20 X, 30 X
+    (re.compile(r"(\d) X"), r"\1 x", " X"),
+    # For cases such as X 20, X 30
+    (re.compile(r"X (\d)"), r"x \1", "X "),
+]
+RULES = NITTY_GRITTY + COMMA_SPACE + X
+
+
+def apply(rules, text):
+    """Apply rules to one text."""
+    for pattern, replacement, guard in rules:
+        if guard in text if isinstance(guard, str) else guard.search(text):
+            text = pattern.sub(replacement, text)
+    return text
+
+
+class TextCache:
+    """Bounded LRU cache of a function of a text, counting hits and misses."""
+
+    def __init__(self, func, maxsize=MAXSIZE):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, text, *args, **kwargs):
+        key = (text, *args, *kwargs.items())
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            value = self.entries[key] = self.func(text, *args, **kwargs)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return value
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def stats(self):
+        calls = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / calls, 4) if calls else None,
+            "size": len(self.entries),
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+
+def cached(func):
+    """Decorator: func(text, ...) through a TextCache, registered in CACHES."""
+    cache = TextCache(func)
+    CACHES[f"{func.__module__}.{func.__name__}"] = cache
+    return cache
+
+
+def cache_stats():
+    """{helper: {"hits", "misses", "hit_rate", "size"}} of the caches."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+def cache_path():
+    from rfq_index import cache_dir
+
+    return cache_dir() / "text_cache.json"
+
+
+def _version(cache):
+    """Hash of the module of the cached function: results of other code are stale."""
+    module = sys.modules.get(cache.func.__module__)
+    try:
+        return hashlib.sha1(Path(module.__file__).read_bytes()).hexdigest()[:12]
+    except (AttributeError, TypeError, OSError):
+        return None
+
+
+def save(path=None):
+    """Write the SAVED most recent entries of every cache."""
+    path = path or cache_path()
+    data = {}
+    for name, cache in CACHES.items():
+        entries = [[list(key), value] for key, value in cache.entries.items()]
+        data[name] = {"version": _version(cache), "entries": entries[-SAVED:]}
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp, path)
+    except OSError as e:
+        print(f"Could not save the text cache: {e}")
+
+
+def load(path=None):
+    """Fill the caches with the saved entries, once per process."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    try:
+        data = json.loads((path or cache_path()).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return
+    if not isinstance(data, dict):
+        return
+    for name, saved in data.items():
+        cache = CACHES.get(name)
+        if cache is None or saved.get("version") != _version(cache):
+            continue
+        for key, value in saved["entries"]:
+            # Keyword arguments were saved as [name, value] lists
+            key = tuple(tuple(part) if isinstance(part, list) else part for part in key)
+            cache.entries.setdefault(key, value)
+
+
+@cached
+def nitty_gritty(text):
+    """set_nitty_gritty() of one text."""
+    return apply(RULES, text.strip())
+
+
+def nitty_gritty_series(texts):
+    """set_nitty_gritty() of a Series of texts, each distinct text once."""
+    unique = texts.drop_duplicates()
+    return texts.map(dict(zip(unique, map(nitty_gritty, unique))))
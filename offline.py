@@ -0,0 +1,1214 @@
+"""
+Offline workbook backend.
+© Thiha Aung (infowizard@gmail.com)
+
+Implements the subset of the xlwings API used in functions.py on top of
+openpyxl, so the same pipeline can process .xlsx files without Excel
+(e.g. on Linux build and batch machines).
+
+    app = offline.App()
+    wb = app.books.open("proposal.xlsx")
+    functions.fill_formula_wb(wb)
+    app.calculate()
+    wb.save()
+
+Limitations:
+- Values of formula cells come from App.calculate() (the pricing columns via
+  pricing.py, plus plain references and SUM ranges) or else from the values
+  Excel cached at the last save. As in Excel's automatic mode, reading a
+  formula cell after a change recalculates the book first. Saved workbooks are flagged for a full
+  recalculation when Excel next opens them.
+- Excel-only features (.api, macros, PDF export, autofit, PERSONAL.XLSB
+  design rows) are not available. Formatting calls that need them are no-ops.
+- Deleting rows or columns does not rewrite formulas that refer to moved
+  cells. fill_formula() rewrites the pricing formulas anyway.
+- Encrypted workbooks need the optional msoffcrypto-tool package.
+"""
+
+import bisect
+import datetime as dt
+import functools
+import io
+import math
+import re
+from copy import copy
+from pathlib import Path
+
+import openpyxl
+from openpyxl.styles import Border, Side
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE, BUILTIN_FORMATS_REVERSE
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+import formulas
+
+MAX_ROW = 1048576
+MAX_COLUMN = 16384
+
+_CELL = re.compile(r"^\$?([A-Z]{1,3})?\$?(\d+)?$")
+# Cell references outside of quoted strings and sheet names
+_REFERENCE = re.compile(
+    r"(?<![A-Za-z0-9_.$])(\$?)([A-Z]{1,3})(\$?)(\d+)(?![A-Za-z0-9_(!])"
+)
+_QUOTED = re.compile(r"(\"(?:[^\"]|\"\")*\"|'(?:[^']|'')*')")
+# Simple formulas evaluated by App.calculate(): a reference or a SUM of a range
+_SIMPLE_REF = re.compile(
+    r"^=\s*(?:'?(?P<sheet>[^'!]+)'?!)?\$?(?P<col>[A-Z]{1,3})\$?(?P<row>\d+)\s*$"
+)
+_SIMPLE_SUM = re.compile(
+    r"^=\s*SUM\(\s*\$?(?P<c1>[A-Z]{1,3})\$?(?P<r1>\d+):"
+    r"\$?(?P<c2>[A-Z]{1,3})\$?(?P<r2>\d+)\s*\)\s*$",
+    re.IGNORECASE,
+)
+_STYLE_REGISTRY = {"font": "_fonts", "alignment": "_alignments", "border": "_borders"}
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+# Functions newer than Excel 2007 are stored with an _xlfn. prefix in the file
+_FUTURE_FUNCTIONS = re.compile(
+    r"(?<![A-Za-z0-9_.])(XMATCH|XLOOKUP|IFS|SWITCH|CONCAT|TEXTJOIN|MAXIFS|MINIFS)\(",
+    re.IGNORECASE,
+)
+
+
+def _parse_cell(text):
+    """Return (row, column) of "A1", "A" or "1"; missing parts are None."""
+    match = _CELL.match(text)
+    if match is None or not any(match.groups()):
+        raise ValueError(f"Invalid cell reference: {text}")
+    col, row = match.groups()
+    return (
+        int(row) if row else None,
+        column_index_from_string(col) if col else None,
+    )
+
+
+def _parse_address(address):
+    """Return (row1, col1, row2, col2) of "A1", "A1:B2", "C:C" or "5:5"."""
+    parts = address.upper().split(":")
+    first = _parse_cell(parts[0])
+    last = _parse_cell(parts[-1])
+    r1, c1 = first
+    r2, c2 = last
+    if r1 is None:
+        r1, r2 = 1, MAX_ROW
+    if c1 is None:
+        c1, c2 = 1, MAX_COLUMN
+    return min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_formula(formula):
+    """Split a formula into literal text and (col_abs, col, row_abs, row) references."""
+    pieces = []
+    for i, part in enumerate(_QUOTED.split(formula)):
+        if i % 2:
+            pieces.append(part)
+            continue
+        pos = 0
+        for match in _REFERENCE.finditer(part):
+            pieces.append(part[pos : match.start()])
+            col_abs, col, row_abs, row = match.groups()
+            pieces.append((col_abs, column_index_from_string(col), row_abs, int(row)))
+            pos = match.end()
+        pieces.append(part[pos:])
+    return tuple(pieces)
+
+
+def shift_formula(formula, rows, cols=0):
+    """
+    Move the relative references of an A1 formula by rows and cols, the way
+    Excel does when a formula is filled or copied. Absolute references,
+    quoted strings and sheet names are left alone.
+    """
+    if not rows and not cols:
+        return formula
+    out = []
+    for piece in _compile_formula(formula):
+        if isinstance(piece, str):
+            out.append(piece)
+            continue
+        col_abs, col, row_abs, row = piece
+        if not col_abs:
+            col += cols
+        if not row_abs:
+            row += rows
+        out.append(f"{col_abs}{get_column_letter(col)}{row_abs}{row}")
+    return "".join(out)
+
+
+def _to_file_formula(formula):
+    """Formula as typed in Excel -> formula as stored in the .xlsx file."""
+    parts = _QUOTED.split(formula)
+    for i in range(0, len(parts), 2):
+        parts[i] = _FUTURE_FUNCTIONS.sub(r"_xlfn.\1(", parts[i])
+    return "".join(parts)
+
+
+def is_formula(value):
+    """True if a raw openpyxl cell value is a formula."""
+    if isinstance(value, str):
+        return value.startswith("=")
+    return value is not None and type(value).__name__ in (
+        "ArrayFormula",
+        "DataTableFormula",
+    )
+
+
+def _from_cell(value):
+    """openpyxl value -> value as xlwings returns it."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return float(value)
+    if isinstance(value, str):
+        return value if value != "" else None
+    if isinstance(value, dt.date) and not isinstance(value, dt.datetime):
+        return dt.datetime(value.year, value.month, value.day)
+    return value
+
+
+def _to_cell(value):
+    """Python/numpy/pandas value -> value openpyxl can store."""
+    if value is None or isinstance(value, (str, bool, dt.datetime, dt.date)):
+        return value
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if isinstance(value, int):
+        return value
+    if hasattr(value, "to_pydatetime"):  # pandas Timestamp
+        try:
+            return value.to_pydatetime()
+        except ValueError:  # NaT
+            return None
+    if hasattr(value, "item"):  # numpy scalar
+        return _to_cell(value.item())
+    try:
+        import pandas as pd
+
+        if pd.isna(value):
+            return None
+    except (ImportError, TypeError, ValueError):
+        pass
+    return value
+
+
+def _rgb(color):
+    """xlwings color tuple (r, g, b) or "#RRGGBB" -> openpyxl "FFRRGGBB"."""
+    if isinstance(color, str):
+        return "FF" + color.lstrip("#").upper()
+    return "FF" + "".join(f"{int(c):02X}" for c in color)
+
+
+def _read_workbook_bytes(path, password=None):
+    """
+    Read a workbook file, decrypting it if it is password protected.
+    Returns (xlsx bytes, encrypted).
+    """
+    data = Path(path).read_bytes()
+    if not data.startswith(_OLE_MAGIC):
+        return data, False
+    try:
+        import msoffcrypto  # type: ignore
+    except ImportError:
+        raise ValueError(
+            f"{Path(path).name} is encrypted. Install msoffcrypto-tool to open it offline."
+        ) from None
+    encrypted = msoffcrypto.OfficeFile(io.BytesIO(data))
+    encrypted.load_key(password=password or "")
+    decrypted = io.BytesIO()
+    encrypted.decrypt(decrypted)
+    return decrypted.getvalue(), True
+
+
+class App:
+    """Stands in for xw.App: holds the open books and calculates them."""
+
+    offline = True
+
+    def __init__(self):
+        self.books = Books(self)
+        self.display_alerts = False
+        self.screen_updating = False
+        self.visible = False
+        # "automatic": formula cells read after a change recalculate the book
+        self.calculation = "automatic"
+
+    def calculate(self):
+        for book in self.books:
+            book.calculate()
+
+    def quit(self):
+        for book in list(self.books):
+            book.close()
+
+
+class Books:
+    """Stands in for xw.main.Books."""
+
+    def __init__(self, app):
+        self.app = app
+        self._books = []
+
+    def open(self, fullname, password=None):
+        return Book(fullname, app=self.app, password=password)
+
+    def __iter__(self):
+        return iter(list(self._books))
+
+    def __len__(self):
+        return len(self._books)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._books[key]
+        for book in self._books:
+            if book.name == key:
+                return book
+        raise KeyError(key)
+
+
+class Book:
+    """Stands in for xw.Book, backed by an openpyxl workbook."""
+
+    offline = True
+
+    def __init__(self, fullname, app=None, password=None):
+        self.fullname = str(Path(fullname).resolve())
+        self.name = Path(fullname).name
+        self.password = password
+        self._data, self._encrypted = _read_workbook_bytes(fullname, password)
+        self._xl = openpyxl.load_workbook(
+            io.BytesIO(self._data),
+            keep_vba=Path(fullname).suffix.lower() == ".xlsm",
+        )
+        self._cached = None
+        self._dirty = False
+        self.app = app if app is not None else App()
+        self.app.books._books.append(self)
+        self.sheets = Sheets(self)
+
+    @property
+    def sheet_names(self):
+        return list(self._xl.sheetnames)
+
+    def cached_values(self):
+        """Values Excel stored for formula cells at the last save."""
+        if self._cached is None:
+            self._cached = openpyxl.load_workbook(
+                io.BytesIO(self._data), data_only=True
+            )
+        return self._cached
+
+    def calculate(self):
+        """
+        Calculate formula values without Excel: the fill_formula() columns of
+        each system sheet with pricing.py, then plain references and SUM ranges.
+        """
+        import pricing
+        from functions import get_last_row, should_skip_sheet
+
+        self._dirty = False
+        for sheet in self.sheets:
+            sheet._calc.clear()
+
+        rates, quoted_currency = {}, None
+        if "Config" in self.sheet_names:
+            config = self.sheets["Config"]
+            rates = pricing.read_rates(config.range("A2:B10").options(ndim=2).value)
+            quoted_currency = config.range("B12").value
+
+        for sheet in self.sheets:
+            if should_skip_sheet(sheet.name):
+                continue
+            last_row = get_last_row(sheet, "C")
+            values = sheet.range(f"A1:AL{last_row + 1}").options(ndim=2).value
+            priced = pricing.price_sheet(values, rates, quoted_currency)
+            cells = sheet._ws._cells
+            for letter in pricing.PRICING_COLUMNS:
+                col = column_index_from_string(letter)
+                for row, value in priced[letter].items():
+                    cell = cells.get((row, col))
+                    if cell is None or not is_formula(cell.value):
+                        continue
+                    if isinstance(value, float) and math.isnan(value):
+                        value = ""  # Blank result or error
+                    sheet._calc[(row, col)] = value
+
+        for sheet in self.sheets:
+            for (row, col), cell in list(sheet._ws._cells.items()):
+                if is_formula(cell.value) and (row, col) not in sheet._calc:
+                    sheet._evaluate(row, col, set())
+
+    def save(self, path=None, password=None):
+        path = Path(path) if path else Path(self.fullname)
+        self._xl.calculation.fullCalcOnLoad = True
+        buffer = io.BytesIO()
+        self._xl.save(buffer)
+        data = buffer.getvalue()
+        if password is None and self._encrypted:
+            password = self.password
+        if password:
+            try:
+                import msoffcrypto  # type: ignore
+            except ImportError:
+                raise ValueError(
+                    "Saving with a password needs msoffcrypto-tool."
+                ) from None
+            plain = msoffcrypto.format.ooxml.OOXMLFile(io.BytesIO(data))
+            encrypted = io.BytesIO()
+            plain.encrypt(password, encrypted)
+            data = encrypted.getvalue()
+        path.write_bytes(data)
+        if path.resolve() != Path(self.fullname):
+            self.fullname = str(path.resolve())
+            self.name = path.name
+
+    def close(self):
+        if self in self.app.books._books:
+            self.app.books._books.remove(self)
+
+    def activate(self):
+        pass
+
+    def macro(self, name):
+        raise NotImplementedError(f"Macro {name} needs Excel.")
+
+    def to_pdf(self, *args, **kwargs):
+        raise NotImplementedError("PDF export needs Excel.")
+
+    @property
+    def api(self):
+        raise NotImplementedError("The Excel API is not available offline.")
+
+
+class Sheets:
+    """Stands in for xw.main.Sheets."""
+
+    def __init__(self, book):
+        self.book = book
+        self._sheets = {}
+
+    def _sheet(self, ws):
+        if ws.title not in self._sheets or self._sheets[ws.title]._ws is not ws:
+            self._sheets[ws.title] = Sheet(self.book, ws)
+        return self._sheets[ws.title]
+
+    def __getitem__(self, key):
+        if isinstance(key, Sheet):
+            key = key.name
+        if isinstance(key, int):
+            return self._sheet(self.book._xl.worksheets[key])
+        if key not in self.book._xl.sheetnames:
+            # Sheet names are case-insensitive in Excel
+            matches = [n for n in self.book._xl.sheetnames if n.upper() == key.upper()]
+            if not matches:
+                raise KeyError(key)
+            key = matches[0]
+        return self._sheet(self.book._xl[key])
+
+    def __iter__(self):
+        return iter([self._sheet(ws) for ws in self.book._xl.worksheets])
+
+    def __len__(self):
+        return len(self.book._xl.worksheets)
+
+    @property
+    def active(self):
+        return self._sheet(self.book._xl.active)
+
+    def add(self, name=None, before=None, after=None):
+        index = None
+        if before is not None:
+            index = self.book.sheet_names.index(self[before].name)
+        elif after is not None:
+            index = self.book.sheet_names.index(self[after].name) + 1
+        ws = self.book._xl.create_sheet(title=name, index=index)
+        return self._sheet(ws)
+
+
+class PageSetup:
+    def __init__(self, sheet):
+        self._sheet = sheet
+
+    @property
+    def print_area(self):
+        return self._sheet._ws.print_area
+
+    @print_area.setter
+    def print_area(self, value):
+        self._sheet._ws.print_area = value
+
+
+class Sheet:
+    """Stands in for xw.Sheet."""
+
+    offline = True
+
+    def __init__(self, book, ws):
+        self.book = book
+        self._ws = ws
+        # Calculated values of formula cells, keyed by (row, column)
+        self._calc = {}
+        # Formula cells written since the workbook was opened (cache is stale)
+        self._written = set()
+        # Cached values of formula cells, loaded on first use
+        self._cached = None
+
+    @property
+    def name(self):
+        return self._ws.title
+
+    @name.setter
+    def name(self, value):
+        self._ws.title = value
+
+    @property
+    def page_setup(self):
+        return PageSetup(self)
+
+    @property
+    def used_range(self):
+        return Range(
+            self, self._ws.min_row, self._ws.min_column, self._ws.max_row, self._ws.max_column
+        )
+
+    @property
+    def api(self):
+        raise NotImplementedError("The Excel API is not available offline.")
+
+    def range(self, cell1, cell2=None):
+        if isinstance(cell1, tuple):
+            r1, c1 = cell1
+            r2, c2 = cell2 if cell2 is not None else cell1
+            return Range(self, min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2))
+        if isinstance(cell1, Range):
+            cell1 = cell1.address
+        if "," in cell1 and cell2 is None:
+            return Areas(self, [self.range(part) for part in cell1.split(",")])
+        r1, c1, r2, c2 = _parse_address(cell1.replace("$", ""))
+        if cell2 is not None:
+            other = cell2 if isinstance(cell2, Range) else self.range(cell2)
+            r1, c1 = min(r1, other.row), min(c1, other.column)
+            r2, c2 = max(r2, other.last_cell.row), max(c2, other.last_cell.column)
+        return Range(self, r1, c1, r2, c2)
+
+    def __getitem__(self, address):
+        return self.range(address)
+
+    def activate(self):
+        self.book._xl.active = self._ws
+
+    def delete(self):
+        self.book._xl.remove(self._ws)
+
+    # Cell access
+
+    def _filled(self, row, col):
+        cell = self._ws._cells.get((row, col))
+        return cell is not None and cell.value is not None and cell.value != ""
+
+    def _value(self, row, col):
+        cell = self._ws._cells.get((row, col))
+        if cell is None:
+            return None
+        if is_formula(cell.value):
+            book = self.book
+            if book._dirty and book.app.calculation == "automatic":
+                book.calculate()
+            key = (row, col)
+            if key in self._calc:
+                return self._calc[key]
+            if key in self._written:
+                return None
+            return self._cached_values().get(key)
+        return _from_cell(cell.value)
+
+    def _cached_values(self):
+        """Values Excel stored for this sheet's formula cells at the last save."""
+        if self._cached is None:
+            cached = self.book.cached_values()
+            cells = cached[self.name]._cells if self.name in cached.sheetnames else {}
+            self._cached = {
+                key: _from_cell(cell.value)
+                for key, cell in cells.items()
+                if cell.value is not None
+            }
+        return self._cached
+
+    def _write(self, row, col, value, stored=False):
+        """Write a value; stored=True means formulas are already in file form."""
+        value = _to_cell(value)
+        if not stored and isinstance(value, str) and value.startswith("="):
+            value = _to_file_formula(value)
+        key = (row, col)
+        if value is None and key not in self._ws._cells:
+            return
+        self._ws.cell(row=row, column=col).value = value
+        self._calc.pop(key, None)
+        self._written.add(key)
+        self.book._dirty = True
+
+    def _evaluate(self, row, col, visiting):
+        """Evaluate a reference or SUM formula; other formulas are left alone."""
+        key = (row, col)
+        if key in self._calc or key in visiting:
+            return self._calc.get(key)
+        formula = self._ws._cells[key].value
+        if not isinstance(formula, str):
+            return None
+        visiting.add(key)
+        value = None
+        match = _SIMPLE_REF.match(formula)
+        if match and (not match["sheet"] or match["sheet"] in self.book.sheet_names):
+            sheet = self.book.sheets[match["sheet"]] if match["sheet"] else self
+            ref = (int(match["row"]), column_index_from_string(match["col"]))
+            value = sheet._resolve(*ref, visiting)
+            value = 0.0 if value is None else value
+        elif not match:
+            match = _SIMPLE_SUM.match(formula)
+            if match:
+                r1, r2 = int(match["r1"]), int(match["r2"])
+                c1 = column_index_from_string(match["c1"].upper())
+                c2 = column_index_from_string(match["c2"].upper())
+                value = 0.0
+                for r in range(min(r1, r2), max(r1, r2) + 1):
+                    for c in range(min(c1, c2), max(c1, c2) + 1):
+                        v = self._resolve(r, c, visiting)
+                        if isinstance(v, (int, float)) and not isinstance(v, bool):
+                            value += v
+        visiting.discard(key)
+        if match:
+            self._calc[key] = value
+            return value
+        return self._value(row, col)
+
+    def _resolve(self, row, col, visiting):
+        cell = self._ws._cells.get((row, col))
+        if cell is not None and is_formula(cell.value) and (row, col) not in self._calc:
+            return self._evaluate(row, col, visiting)
+        return self._value(row, col)
+
+    def _delete(self, axis, spans):
+        """
+        Delete rows (axis 0) or columns (axis 1), moving the cells after them
+        up or left. spans: (start, count) of each block, deleted in one pass.
+        """
+        self._cached_values()  # Load before positions go out of step
+        self.book._dirty = True
+        shift = _Shift(spans)
+        ws = self._ws
+        moved = {}
+        for key, cell in ws._cells.items():
+            index = shift(key[axis])
+            if index is None:
+                continue
+            if index != key[axis]:
+                if axis == 0:
+                    cell.row = index
+                else:
+                    cell.column = index
+                key = (cell.row, cell.column)
+            moved[key] = cell
+        ws._cells = moved
+        self._calc = _shift_keys(self._calc, axis, shift)
+        self._cached = _shift_keys(self._cached, axis, shift)
+        self._written = set(_shift_keys(dict.fromkeys(self._written), axis, shift))
+
+
+class _Shift:
+    """New index of a row or column after deleting spans, None if deleted."""
+
+    def __init__(self, spans):
+        self.starts = []
+        self.stops = []
+        for start, count in sorted(spans):
+            if self.stops and start <= self.stops[-1]:
+                self.stops[-1] = max(self.stops[-1], start + count)
+            else:
+                self.starts.append(start)
+                self.stops.append(start + count)
+        # Indexes deleted before each span
+        self.before = [0]
+        for start, stop in zip(self.starts, self.stops):
+            self.before.append(self.before[-1] + stop - start)
+
+    def __call__(self, index):
+        i = bisect.bisect_right(self.starts, index) - 1
+        if i >= 0 and index < self.stops[i]:
+            return None
+        return index - self.before[i + 1]
+
+
+def _shift_keys(mapping, axis, shift):
+    """Re-key a {(row, col): value} mapping after deleting rows or columns."""
+    shifted = {}
+    for key, value in mapping.items():
+        index = shift(key[axis])
+        if index is None:
+            continue
+        shifted[(index, key[1]) if axis == 0 else (key[0], index)] = value
+    return shifted
+
+
+class Font:
+    """Stands in for xw.main.Font of a range."""
+
+    def __init__(self, rng):
+        self._rng = rng
+
+    def _get(self, attr):
+        return getattr(self._rng._first_cell().font, attr)
+
+    def _set(self, **attrs):
+        def change(font):
+            for attr, value in attrs.items():
+                setattr(font, attr, value)
+            return font
+
+        self._rng._restyle("font", change)
+
+    @property
+    def name(self):
+        return self._get("name")
+
+    @name.setter
+    def name(self, value):
+        self._set(name=value)
+
+    @property
+    def size(self):
+        return self._get("size")
+
+    @size.setter
+    def size(self, value):
+        self._set(size=value)
+
+    @property
+    def bold(self):
+        return self._get("bold")
+
+    @bold.setter
+    def bold(self, value):
+        self._set(bold=value)
+
+    @property
+    def italic(self):
+        return self._get("italic")
+
+    @italic.setter
+    def italic(self, value):
+        self._set(italic=value)
+
+    @property
+    def color(self):
+        color = self._get("color")
+        if color is None or not isinstance(color.rgb, str):
+            return None
+        rgb = color.rgb[-6:]
+        return tuple(int(rgb[i : i + 2], 16) for i in (0, 2, 4))
+
+    @color.setter
+    def color(self, value):
+        self._set(color=_rgb(value))
+
+
+class Range:
+    """Stands in for xw.Range: a rectangle of cells on an offline sheet."""
+
+    offline = True
+
+    def __init__(self, sheet, row1, col1, row2, col2, options=None):
+        self.sheet = sheet
+        self._r1, self._c1, self._r2, self._c2 = row1, col1, row2, col2
+        self._options = options or {}
+
+    def __repr__(self):
+        return f"<Range [{self.sheet.book.name}]{self.sheet.name}!{self.address}>"
+
+    # Geometry
+
+    @property
+    def row(self):
+        return self._r1
+
+    @property
+    def column(self):
+        return self._c1
+
+    @property
+    def shape(self):
+        return (self._r2 - self._r1 + 1, self._c2 - self._c1 + 1)
+
+    @property
+    def count(self):
+        rows, cols = self.shape
+        return rows * cols
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def last_cell(self):
+        return Range(self.sheet, self._r2, self._c2, self._r2, self._c2)
+
+    @property
+    def address(self):
+        first = f"${get_column_letter(self._c1)}${self._r1}"
+        if (self._r1, self._c1) == (self._r2, self._c2):
+            return first
+        return f"{first}:${get_column_letter(self._c2)}${self._r2}"
+
+    @property
+    def rows(self):
+        return self
+
+    @property
+    def columns(self):
+        return self
+
+    def __iter__(self):
+        r1, c1, r2, c2 = self._bounds()
+        for r in range(r1, r2 + 1):
+            for c in range(c1, c2 + 1):
+                yield Range(self.sheet, r, c, r, c)
+
+    def resize(self, row_size=None, column_size=None):
+        rows, cols = self.shape
+        rows = row_size or rows
+        cols = column_size or cols
+        return Range(self.sheet, self._r1, self._c1, self._r1 + rows - 1, self._c1 + cols - 1)
+
+    def offset(self, row_offset=0, column_offset=0):
+        return Range(
+            self.sheet,
+            self._r1 + row_offset,
+            self._c1 + column_offset,
+            self._r2 + row_offset,
+            self._c2 + column_offset,
+        )
+
+    def _bounds(self):
+        """Bounds limited to the used area for whole rows and columns."""
+        ws = self.sheet._ws
+        r2 = min(self._r2, max(ws.max_row, self._r1)) if self._r2 == MAX_ROW else self._r2
+        c2 = (
+            min(self._c2, max(ws.max_column, self._c1))
+            if self._c2 == MAX_COLUMN
+            else self._c2
+        )
+        return self._r1, self._c1, r2, c2
+
+    def _cells(self, create=False):
+        r1, c1, r2, c2 = self._bounds()
+        ws = self.sheet._ws
+        for r in range(r1, r2 + 1):
+            for c in range(c1, c2 + 1):
+                cell = ws.cell(row=r, column=c) if create else ws._cells.get((r, c))
+                if cell is not None:
+                    yield cell
+
+    def _first_cell(self):
+        return self.sheet._ws.cell(row=self._r1, column=self._c1)
+
+    # Values
+
+    def options(self, convert=None, **options):
+        options = {**self._options, **options}
+        if convert is not None:
+            options["convert"] = convert
+        return Range(self.sheet, self._r1, self._c1, self._r2, self._c2, options)
+
+    @property
+    def value(self):
+        r1, c1, r2, c2 = self._bounds()
+        empty = self._options.get("empty", None)
+        data = [
+            [self.sheet._value(r, c) for c in range(c1, c2 + 1)]
+            for r in range(r1, r2 + 1)
+        ]
+        if empty is not None:
+            data = [[empty if v is None else v for v in row] for row in data]
+        if self._options.get("transpose"):
+            data = [list(col) for col in zip(*data)]
+
+        convert = self._options.get("convert")
+        if convert is not None:
+            import pandas as pd
+            from xlwings.conversion import (
+                PandasDataFrameConverter,
+                PandasSeriesConverter,
+            )
+
+            if convert is pd.DataFrame:
+                return PandasDataFrameConverter.read_value(data, self._options)
+            if convert is pd.Series:
+                return PandasSeriesConverter.read_value(data, self._options)
+            raise NotImplementedError(f"Offline conversion to {convert}")
+
+        ndim = self._options.get("ndim")
+        if ndim == 2:
+            return data
+        if len(data) == 1 and len(data[0]) == 1 and ndim != 1:
+            return data[0][0]
+        if ndim == 1 or len(data) == 1 or len(data[0]) == 1:
+            return data[0] if len(data) == 1 else [row[0] for row in data]
+        return data
+
+    @property
+    def raw_value(self):
+        """Values without conversion: a scalar, or a tuple of row tuples."""
+        r1, c1, r2, c2 = self._bounds()
+        data = tuple(
+            tuple(self.sheet._value(r, c) for c in range(c1, c2 + 1))
+            for r in range(r1, r2 + 1)
+        )
+        if len(data) == 1 and len(data[0]) == 1:
+            return data[0][0]
+        return data
+
+    @raw_value.setter
+    def raw_value(self, data):
+        self.value = data
+
+    @value.setter
+    def value(self, data):
+        data, scalar = self._prepare(data)
+        if scalar:
+            for r in range(self._r1, self._r2 + 1):
+                for c in range(self._c1, self._c2 + 1):
+                    self.sheet._write(r, c, data)
+            return
+        for i, row in enumerate(data):
+            for j, value in enumerate(row):
+                self.sheet._write(self._r1 + i, self._c1 + j, value)
+
+    def _prepare(self, data):
+        """Value to write -> (2-D list, False) or (scalar, True), as xlwings does."""
+        try:
+            import pandas as pd
+        except ImportError:  # pragma: no cover
+            pd = None
+        if pd is not None and isinstance(data, (pd.DataFrame, pd.Series)):
+            from xlwings.conversion import (
+                PandasDataFrameConverter,
+                PandasSeriesConverter,
+            )
+
+            options = dict(self._options)
+            options.pop("convert", None)
+            if isinstance(data, pd.DataFrame):
+                data = PandasDataFrameConverter.write_value(data, options)
+            else:
+                data = PandasSeriesConverter.write_value(data, options)
+        elif hasattr(data, "tolist") and not isinstance(data, str):
+            data = data.tolist()
+        if isinstance(data, tuple):
+            data = list(data)
+        if not isinstance(data, list):
+            return data, True
+        if data and not isinstance(data[0], (list, tuple)):
+            data = [data]
+        if self._options.get("transpose"):
+            data = [list(col) for col in zip(*data)]
+        return data, False
+
+    @property
+    def formula(self):
+        rows = []
+        r1, c1, r2, c2 = self._bounds()
+        for r in range(r1, r2 + 1):
+            row = []
+            for c in range(c1, c2 + 1):
+                cell = self.sheet._ws._cells.get((r, c))
+                value = None if cell is None else cell.value
+                if value is None:
+                    row.append("")
+                elif isinstance(value, str):
+                    row.append(value.replace("_xlfn.", ""))
+                elif isinstance(value, float) and value.is_integer():
+                    row.append(str(int(value)))
+                else:
+                    row.append(str(getattr(value, "text", value)))
+            rows.append(tuple(row))
+        if len(rows) == 1 and len(rows[0]) == 1:
+            return rows[0][0]
+        return tuple(rows)
+
+    @formula.setter
+    def formula(self, formulas):
+        """
+        Write formulas like Excel's Range.Formula. A single formula or a
+        smaller array is repeated over the range, and relative references
+        are adjusted from the cell the formula was written for.
+        """
+        formulas, scalar = self._prepare(formulas)
+        if scalar:
+            formulas = [[formulas]]
+        formulas = [
+            [
+                _to_file_formula(f) if isinstance(f, str) and f.startswith("=") else f
+                for f in row
+            ]
+            for row in formulas
+        ]
+        height, width = len(formulas), len(formulas[0])
+        rows, cols = self.shape
+        if rows % height or cols % width:
+            rows, cols = max(rows, height), max(cols, width)
+        for i in range(rows):
+            for j in range(cols):
+                formula = formulas[i % height][j % width]
+                if isinstance(formula, str) and formula.startswith("="):
+                    formula = shift_formula(formula, i - i % height, j - j % width)
+                self.sheet._write(self._r1 + i, self._c1 + j, formula, stored=True)
+
+    @property
+    def formula_r1c1(self):
+        formula = self.formula
+        rows = [[formula]] if isinstance(formula, str) else formula
+        # Formulas filled down a column share their template: try the one
+        # of the cell above before converting
+        above = {}
+        out = []
+        for i, row in enumerate(rows):
+            converted = []
+            for j, text in enumerate(row):
+                if text.startswith("="):
+                    r, c = self._r1 + i, self._c1 + j
+                    template = above.get(j)
+                    if template is None or formulas.from_r1c1(template, r, c) != text:
+                        template = above[j] = formulas.to_r1c1(text, r, c)
+                    text = template
+                converted.append(text)
+            out.append(tuple(converted))
+        return out[0][0] if isinstance(formula, str) else tuple(out)
+
+    @formula_r1c1.setter
+    def formula_r1c1(self, templates):
+        """
+        Write R1C1 formulas like Excel's Range.FormulaR1C1. A single formula
+        or a smaller array is repeated over the range as it is.
+        """
+        templates, scalar = self._prepare(templates)
+        if scalar:
+            templates = [[templates]]
+        height, width = len(templates), len(templates[0])
+        rows, cols = self.shape
+        if rows % height or cols % width:
+            rows, cols = max(rows, height), max(cols, width)
+        # File form of each template in the first rows, moved down from there
+        first = [
+            [
+                _to_file_formula(formulas.from_r1c1(t, self._r1 + i, self._c1 + j))
+                if isinstance(t, str) and t.startswith("=")
+                else (None if t == "" else t)  # "" clears the cell, as in Excel
+                for j, t in enumerate(row)
+            ]
+            for i, row in enumerate(templates)
+        ]
+        for i in range(rows):
+            for j in range(cols):
+                formula = first[i % height][j % width]
+                if isinstance(formula, str) and formula.startswith("="):
+                    formula = shift_formula(formula, i - i % height, j - j % width)
+                self.sheet._write(self._r1 + i, self._c1 + j, formula, stored=True)
+
+    # Navigation
+
+    def end(self, direction):
+        """Ctrl+Arrow navigation, as xlwings' Range.end()."""
+        step = {
+            "up": (-1, 0),
+            "down": (1, 0),
+            "left": (0, -1),
+            "right": (0, 1),
+        }[direction.lower()]
+        ws = self.sheet._ws
+        filled = self.sheet._filled
+        row, col = self._r1, self._c1
+        dr, dc = step
+
+        def inside(r, c):
+            return 1 <= r <= MAX_ROW and 1 <= c <= MAX_COLUMN
+
+        if not inside(row + dr, col + dc):
+            return Range(self.sheet, row, col, row, col)
+        if filled(row, col) and filled(row + dr, col + dc):
+            # Move to the last filled cell of this block
+            while inside(row + dr, col + dc) and filled(row + dr, col + dc):
+                row, col = row + dr, col + dc
+        else:
+            # Move to the next filled cell, or the edge of the sheet
+            row, col = row + dr, col + dc
+            while not filled(row, col) and inside(row + dr, col + dc):
+                if (dr > 0 and row > ws.max_row) or (dc > 0 and col > ws.max_column):
+                    row = MAX_ROW if dr else row
+                    col = MAX_COLUMN if dc else col
+                    break
+                row, col = row + dr, col + dc
+        return Range(self.sheet, row, col, row, col)
+
+    # Editing
+
+    def clear_contents(self):
+        for cell in list(self._cells()):
+            self.sheet._write(cell.row, cell.column, None)
+
+    def clear(self):
+        r1, c1, r2, c2 = self._bounds()
+        cells = self.sheet._ws._cells
+        for key in [k for k in cells if r1 <= k[0] <= r2 and c1 <= k[1] <= c2]:
+            del cells[key]
+            self.sheet._calc.pop(key, None)
+
+    def delete(self, shift=None):
+        rows, cols = self.shape
+        if self._c1 == 1 and self._c2 == MAX_COLUMN:
+            self.sheet._delete(0, [(self._r1, rows)])
+        elif self._r1 == 1 and self._r2 == MAX_ROW:
+            self.sheet._delete(1, [(self._c1, cols)])
+        else:
+            raise NotImplementedError("Offline delete supports whole rows or columns.")
+
+    def copy(self, destination=None):
+        """Copy values, formulas and styles to the destination's top-left cell."""
+        if destination is None:
+            raise NotImplementedError("Copying to the clipboard needs Excel.")
+        source = self.sheet._ws
+        target = destination.sheet
+        dr, dc = destination.row - self._r1, destination.column - self._c1
+        r1, c1, r2, c2 = self._bounds()
+        for r in range(r1, r2 + 1):
+            for c in range(c1, c2 + 1):
+                cell = source._cells.get((r, c))
+                if cell is None:
+                    continue
+                value = cell.value
+                if isinstance(value, str) and value.startswith("="):
+                    value = shift_formula(value, dr, dc)
+                target._write(r + dr, c + dc, value, stored=True)
+                if cell.has_style:
+                    target._ws.cell(row=r + dr, column=c + dc)._style = copy(cell._style)
+
+    # Formatting
+
+    @property
+    def font(self):
+        return Font(self)
+
+    @property
+    def number_format(self):
+        return self._first_cell().number_format
+
+    @number_format.setter
+    def number_format(self, value):
+        if value in BUILTIN_FORMATS_REVERSE:
+            format_id = BUILTIN_FORMATS_REVERSE[value]
+        else:
+            formats = self.sheet.book._xl._number_formats
+            format_id = formats.add(value) + BUILTIN_FORMATS_MAX_SIZE
+        for cell in self._cells(create=True):
+            if cell._style is None:
+                cell._style = StyleArray()
+            cell._style.numFmtId = format_id
+
+    @property
+    def wrap_text(self):
+        return self._first_cell().alignment.wrap_text
+
+    @wrap_text.setter
+    def wrap_text(self, value):
+        def change(alignment):
+            alignment.wrap_text = value
+            return alignment
+
+        self._restyle("alignment", change)
+
+    @property
+    def column_width(self):
+        # Hidden columns are 0 wide, as in Excel
+        dimension = self.sheet._ws.column_dimensions[get_column_letter(self._c1)]
+        return 0 if dimension.hidden else dimension.width
+
+    @column_width.setter
+    def column_width(self, value):
+        last = min(self._c2, max(self.sheet._ws.max_column, self._c1))
+        for col in range(self._c1, last + 1):
+            dimension = self.sheet._ws.column_dimensions[get_column_letter(col)]
+            if value == 0:
+                dimension.hidden = True
+            else:
+                dimension.hidden = False
+                dimension.width = value
+
+    def autofit(self):
+        """Column and row autofit need Excel's text metrics; no-op offline."""
+
+    def set_borders(self, edges, color, style="thin"):
+        """Set the top and/or bottom border of every cell (offline only)."""
+        side = Side(style=style, color=_rgb(color))
+
+        def change(border):
+            sides = {
+                "top": border.top,
+                "bottom": border.bottom,
+                "left": border.left,
+                "right": border.right,
+            }
+            for edge in edges:
+                sides[edge] = side
+            return Border(**sides)
+
+        self._restyle("border", change)
+
+    def _restyle(self, kind, change):
+        """
+        Apply change(style) -> style to the font, alignment or border of every
+        cell. Each distinct style is changed and registered only once.
+        """
+        registry = getattr(self.sheet.book._xl, _STYLE_REGISTRY[kind])
+        id_attr = f"{kind}Id"
+        changed = {}
+        for cell in self._cells(create=True):
+            if cell._style is None:
+                cell._style = StyleArray()
+            old = getattr(cell._style, id_attr)
+            if old not in changed:
+                changed[old] = registry.add(change(copy(registry[old])))
+            setattr(cell._style, id_attr, changed[old])
+
+    @property
+    def api(self):
+        raise NotImplementedError("The Excel API is not available offline.")
+
+
+class Areas:
+    """Stands in for a range of several areas, e.g. "3:5,8:9": delete() only."""
+
+    offline = True
+
+    def __init__(self, sheet, areas):
+        self.sheet = sheet
+        self.areas = areas
+
+    def __repr__(self):
+        return f"<Range [{self.sheet.book.name}]{self.sheet.name}!{self.address}>"
+
+    @property
+    def address(self):
+        return ",".join(area.address for area in self.areas)
+
+    def delete(self, shift=None):
+        """Delete the areas at once, like Excel: addresses are before the delete."""
+        if all(area._c1 == 1 and area._c2 == MAX_COLUMN for area in self.areas):
+            self.sheet._delete(0, [(area._r1, area.shape[0]) for area in self.areas])
+        elif all(area._r1 == 1 and area._r2 == MAX_ROW for area in self.areas):
+            self.sheet._delete(1, [(area._c1, area.shape[1]) for area in self.areas])
+        else:
+            raise NotImplementedError("Offline delete supports whole rows or columns.")
+
+
+def open_workbook(filepath, password=None):
+    """Open a workbook offline. Returns (app, wb) like mini.open_workbook."""
+    app = App()
+    wb = app.books.open(filepath, password=password)
+    return app, wb
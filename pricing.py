@@ -0,0 +1,456 @@
+"""Pure-Python pricing engine that mirrors the formulas written by fill_formula().
+© Thiha Aung (infowizard@gmail.com)
+
+The engine takes the raw values of a system sheet (as read from A1:AL<last>)
+and computes the same numbers Excel would show in the formula columns,
+without writing formulas or recalculating the workbook.
+
+Conventions:
+- Blank cells ("" in Excel) are returned as NaN in numeric columns and as ""
+  in the text columns (AK, AL).
+- Cells that Excel would show as an error (e.g. #VALUE! from a text quantity)
+  are also returned as NaN. Group sums (AJ, AP, AR, AT) propagate these errors
+  the same way SUM does in Excel.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Formula columns computed by the engine, in sheet order.
+PRICING_COLUMNS = [
+    "B",
+    "F",
+    "G",
+    "L",
+    "N",
+    "O",
+    "Q",
+    "R",
+    "S",
+    "T",
+    "U",
+    "V",
+    "W",
+    "X",
+    "Y",
+    "Z",
+    "AA",
+    "AC",
+    "AD",
+    "AE",
+    "AF",
+    "AG",
+    "AH",
+    "AI",
+    "AJ",
+    "AK",
+    "AL",
+    "AP",
+    "AQ",
+    "AR",
+    "AS",
+    "AT",
+    "AU",
+    "AV",
+    "AW",
+]
+TEXT_COLUMNS = ["AK", "AL"]
+
+# Columns summed into the subtotal row by fill_lastrow_sheet().
+TOTAL_COLUMNS = ["G", "V", "W", "X", "Y", "Z", "AQ", "AS", "AU", "AV"]
+
+# Lumpsum formulas look ahead over AI4:AI1500 (relative to row 3), i.e. up to
+# 1497 rows below a title; longer sheets look further (see lookahead_limit()).
+ROW_LIMIT = 1500
+
+# Risk factor used by BUCQ (T).
+RISK = 0.05
+
+# Helper column of fill_formula(group_keys=True): the group key of each row,
+# i.e. the row of the Title starting its group (1 above the first Title).
+# Row 3 seeds the key itself, so the header in row 2 is left as it is.
+GROUP_COLUMN = "AX"
+GROUP_KEY_FORMULA = '=IF(AL3="Title", ROW(AL3), IF(ROW(AL3)=3, 1, AX2))'  # AX3 down
+
+# INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1)): value at the owning Title
+_OWNER_LOOKUP = re.compile(
+    r'INDEX\(\$([A-Z]+)\$1:\1(\d+), XMATCH\("Title", \$AL\$1:AL\2, 0, -1\)\)'
+)
+# SUM(AI4:INDEX(AI4:AI1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)): group total
+_GROUP_SUM = re.compile(
+    r'SUM\(([A-Z]+)(\d+):INDEX\(\1\2:\1\d+, XMATCH\("Title", AL\2:AL\d+, 0, 1\)-1\)\)'
+)
+
+
+def column_index(letter):
+    """Convert an Excel column letter to a 0-based index ("A" -> 0, "AB" -> 27)."""
+    index = 0
+    for char in letter.upper():
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+_NUMBER_TYPES = {int, float, np.int32, np.int64, np.float32, np.float64}
+
+
+def _grid(values, height, width):
+    """Return values as an object array of exactly height x width, padded with None."""
+    grid = np.full((height, width), None, dtype=object)
+    rows = values[:height]
+    if len(rows) and all(isinstance(row, (list, tuple)) and len(row) >= width for row in rows):
+        grid[: len(rows)] = [row[:width] for row in rows]
+        return grid
+    for i, row in enumerate(rows):
+        if not isinstance(row, (list, tuple)):
+            row = [row]
+        row = row[:width]
+        grid[i, : len(row)] = row
+    return grid
+
+
+def _blank(col):
+    """Excel `cell=""` for raw cells: None, empty string or NaN."""
+    return pd.isna(col) | (col == "")
+
+
+def _is_number(col):
+    """Excel ISNUMBER() for raw cells (booleans are not numbers)."""
+    numeric = np.fromiter(
+        (type(v) in _NUMBER_TYPES for v in col), dtype=bool, count=len(col)
+    )
+    return numeric & ~pd.isna(col)
+
+
+def _number(col, is_number, blank):
+    """Raw cells as used in arithmetic: blank -> 0, text -> NaN (#VALUE!)."""
+    out = np.where(is_number, col, np.nan).astype(float)
+    out[blank] = 0.0
+    return out
+
+
+def _upper(col):
+    """Upper-cased text for case-insensitive comparisons; non-text becomes ""."""
+    return np.array([v.upper() if isinstance(v, str) else "" for v in col], dtype=object)
+
+
+def _finite(values):
+    """Division by zero and overflow show as errors in Excel."""
+    values = np.array(values, dtype=float)
+    values[~np.isfinite(values)] = np.nan
+    return values
+
+
+def _last_nonblank(col):
+    """1-based row of the last non-blank cell, or 1 when the column is empty."""
+    rows = np.flatnonzero(~_blank(col))
+    return int(rows[-1]) + 1 if len(rows) else 1
+
+
+def read_rates(config_values):
+    """
+    Build the exchange-rate table from Config!A2:B10.
+
+    Args:
+        config_values: 2-D list of (currency, rate) rows as read from A2:B10.
+
+    Returns:
+        dict mapping upper-cased currency code to its rate (first match wins,
+        as XMATCH does).
+    """
+    rates = {}
+    for row in config_values:
+        if not row or not isinstance(row[0], str):
+            continue
+        rate = row[1] if len(row) > 1 else None
+        rates.setdefault(row[0].upper(), rate)
+    return rates
+
+
+def _rate(rates, currency):
+    if not isinstance(currency, str) or currency.upper() not in rates:
+        return np.nan  # #N/A
+    rate = rates[currency.upper()]
+    if rate is None or rate == "":
+        return 0.0
+    if isinstance(rate, (int, float)) and not isinstance(rate, bool):
+        return float(rate)
+    return np.nan
+
+
+def lookahead_limit(last_row):
+    """
+    Bottom row (relative to row 3) of the lumpsum look-ahead ranges that
+    fill_formula() writes for formulas running to last_row (the last C row
+    + 1). Longer sheets look ahead over the whole sheet, so that no title
+    group is cut short.
+    """
+    return max(ROW_LIMIT, last_row + 1)
+
+
+def group_formula(formula, last_row):
+    """
+    Rewrite a fill_formula() formula to use the group key column.
+
+    The searches for the owning Title (backwards from every row) become an
+    INDEX on the key of the row above (1 for row 3, so that the header row 2
+    is never read), and the group totals of lumpsum Titles sum down to the
+    last row of the group, found by a binary MATCH on the (ascending) keys.
+    Both give the same numbers as the searches, at a recalculation cost
+    linear in the sheet length. Formulas are written from row 3 down to
+    last_row.
+    """
+    key = GROUP_COLUMN
+    end = lookahead_limit(last_row)
+
+    def owner(match):
+        column, above = match.group(1), match.group(2)
+        group = f"IF(ROW({key}{above})=2, 1, {key}{above})"
+        return f"INDEX(${column}$1:${column}${last_row}, {group})"
+
+    def total(match):
+        column, below = match.group(1), int(match.group(2))
+        row = f"ROW(AL{below - 1})"
+        group_end = f"MATCH({row}, ${key}$3:${key}${last_row}, 1)+2"
+        return (
+            # A Title right below: INDEX(..., 0) sums the whole look-ahead
+            f'IF(AL{below}="Title", SUM({column}{below}:${column}${end}), '
+            f"SUM({column}{below}:INDEX(${column}$1:${column}${last_row}, {group_end})))"
+        )
+
+    return _GROUP_SUM.sub(total, _OWNER_LOOKUP.sub(owner, formula))
+
+
+def price_sheet(values, rates, quoted_currency, row_limit=None):
+    """
+    Compute the fill_formula() columns of a system sheet.
+
+    Args:
+        values: 2-D list of raw sheet values starting at A1 (row 1 holds the
+            margin and escalation parameters, row 2 the headers). At least
+            columns A:AB are needed; H1, AJ1, AL2 and B1:B2 are read if present.
+        rates: dict from read_rates() (or any {currency: rate} mapping).
+        quoted_currency: The quoted currency (Config!B12).
+        row_limit: Bottom row of the lumpsum look-ahead ranges (AI4:AI1500).
+            Defaults to lookahead_limit(), as written by fill_formula().
+
+    Returns:
+        DataFrame indexed by Excel row number (3 .. last row + 1, the same rows
+        fill_formula() writes) with one column per entry in PRICING_COLUMNS.
+    """
+    rates = {str(k).upper(): v for k, v in rates.items()}
+    width = column_index("AL") + 1
+    grid = _grid(values, len(values), width)
+    last_row = max(_last_nonblank(grid[:, column_index("C")]), 2) + 1
+    if row_limit is None:
+        row_limit = lookahead_limit(last_row)
+    # Rows 1 .. last_row, plus the sentinel "Title" row written below the data.
+    height = last_row + 1
+    grid = np.vstack([grid[:height], _grid([], max(height - len(grid), 0), width)])
+    idx = np.arange(height)
+    data = idx >= 2  # Excel rows 3 .. last_row (the sentinel is excluded below)
+    data[-1] = False
+
+    def raw(letter):
+        return grid[:, column_index(letter)]
+
+    A, C, D, E, H, J, K, M, AB = (
+        raw(c) for c in ("A", "C", "D", "E", "H", "J", "K", "M", "AB")
+    )
+    blank_a, blank_c, blank_d, blank_e = _blank(A), _blank(C), _blank(D), _blank(E)
+    blank_j, blank_k, blank_ab = _blank(J), _blank(K), _blank(AB)
+    num_d, num_k = _is_number(D), _is_number(K)
+    d = _number(D, num_d, blank_d)
+    k = _number(K, num_k, blank_k)
+    m = _number(M, _is_number(M), _blank(M))
+    ab = _number(AB, _is_number(AB), blank_ab)
+
+    params = grid[0]
+    param_blank, param_num = _blank(params), _is_number(params)
+    p = _number(params, param_num, param_blank)
+    margin = p[column_index("J")]
+    escalation = {c: p[column_index(c)] for c in ("L", "N", "P", "R")}
+
+    h = _upper(H)
+    h_option, h_included, h_waived = h == "OPTION", h == "INCLUDED", h == "WAIVED"
+
+    # B: serial numbering condition is local to the row.
+    lineitem_cond = data & blank_a & num_d & num_k
+
+    # AL: format of each row.
+    fmt = np.full(height, "", dtype=object)
+    fmt[0] = "Title"
+    header = raw("AL")[1]
+    fmt[1] = header if isinstance(header, str) else ""
+    if height > 2:
+        fmt[2] = "System"
+    prev_blank_c = np.concatenate([[True], blank_c[:-1]])
+    next_blank_c = np.concatenate([blank_c[1:], [True]])
+    next_blank_d = np.concatenate([blank_d[1:], [True]])
+    comment = np.array(
+        [isinstance(v, str) and v[:3] == "***" for v in C], dtype=bool
+    )
+    computed = np.select(
+        [
+            blank_c,
+            ~blank_a,
+            lineitem_cond,
+            comment,
+            prev_blank_c & ~next_blank_c & ~next_blank_d,
+            prev_blank_c & next_blank_c,
+        ],
+        ["", "Title", "Lineitem", "Comment", "Subtitle", "Subsystem"],
+        default="Description",
+    ).astype(object)
+    body = data & (idx >= 3)
+    fmt[body] = computed[body]
+    fmt[-1] = "Title"
+
+    is_title = np.array([str(v).upper() == "TITLE" for v in fmt])
+    is_lineitem = fmt == "Lineitem"
+    title_row = fmt == "Title"
+
+    # Owning title: last Title strictly above each row (XMATCH search mode -1).
+    owner = np.maximum.accumulate(np.where(is_title, idx, -1))
+    owner = np.concatenate([[0], owner[:-1]])
+    owner[owner < 0] = 0
+    # Next title strictly below each row (XMATCH search mode 1).
+    upcoming = np.where(is_title, idx, height)
+    upcoming = np.minimum.accumulate(upcoming[::-1])[::-1]
+    next_title = np.concatenate([upcoming[1:], [height]])
+
+    # B: COUNT of numbers from the owning title to the row above, plus one.
+    counted = lineitem_cond.copy()
+    counted[:2] = _is_number(raw("B"))[:2]
+    running = np.concatenate([[0], np.cumsum(counted)])
+    B = np.where(lineitem_cond, running[idx] - running[owner] + 1, np.nan)
+
+    owner_option = h_option[owner]
+    dk = data & ~blank_d & ~blank_k
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        N = np.where(data & ~blank_k, k * (1 - m), np.nan)
+        L = np.where(dk & ~h_option, d * k, np.nan)
+        O = np.where(dk & ~h_option, d * N, np.nan)
+
+        quoted = _rate(rates, quoted_currency)
+        rate = np.array([_rate(rates, v) for v in J], dtype=float)
+        Q = _finite(np.where(data & ~blank_j, rate / quoted, np.nan))
+        R = np.where(dk, N * Q, np.nan)
+        cost_cond = dk & ~h_option & ~owner_option
+        S = np.where(cost_cond, d * R, np.nan)
+        factor = 1 + escalation["L"] + escalation["N"] + escalation["P"] + escalation["R"]
+        T = np.where(dk, (R * factor) / (1 - RISK), np.nan)
+        U = np.where(cost_cond, d * T, np.nan)
+        AA = np.where(dk, margin, np.nan)
+        AC = np.where(dk, np.ceil(_finite(T / (1 - AA))), np.nan)
+        price_cond = cost_cond & ~h_included & ~h_waived
+        AD = np.where(price_cond, d * AC, np.nan)
+        AE = np.where(dk, np.where(blank_ab, AC, ab), np.nan)
+        AF = np.where(price_cond, d * AE, np.nan)
+        AG = np.where(
+            dk & ~h_option & ~h_included & ~np.isnan(AF), AF - U, np.nan
+        )
+        AH = _finite(np.where(~np.isnan(AG) & (AG != 0), AG / AF, np.nan))
+        AI = np.where(dk & ~h_option, d * AE, np.nan)
+
+        lumpsum = title_row & num_d & ~blank_e & data
+        # XMATCH over AL(r+1):AL(r+row_limit-3); INDEX(..., 0) returns the whole
+        # range when the next row is itself a Title.
+        span = row_limit - 3
+        found = (next_title - idx) <= span
+        end = np.where(next_title == idx + 1, np.minimum(idx + span, height - 1), next_title - 1)
+
+        def group_sum(values, cond):
+            error = cond & np.isnan(values)
+            total = np.concatenate([[0.0], np.cumsum(np.where(cond, np.nan_to_num(values), 0.0))])
+            errors = np.concatenate([[0], np.cumsum(error)])
+            result = total[end + 1] - total[idx + 1]
+            result[(errors[end + 1] - errors[idx + 1]) > 0] = np.nan
+            return np.where(lumpsum & found, result, np.nan)
+
+        AJ = group_sum(AI, dk & ~h_option)
+        owner_aj = AJ.copy()
+        owner_aj[0] = p[column_index("AJ")] if param_num[column_index("AJ")] else np.nan
+        AK = np.where(
+            is_lineitem,
+            np.where(~np.isnan(owner_aj[owner]), "Lumpsum", "Unit Price"),
+            "",
+        ).astype(object)
+        unit_price = is_lineitem & (AK == "Unit Price")
+
+        AP = np.where(lumpsum, group_sum(S, cost_cond), np.where(unit_price, R, np.nan))
+        AQ = np.where(num_d & ~np.isnan(AP) & ~h_option, d * AP, np.nan)
+        AR = np.where(lumpsum, group_sum(U, cost_cond), np.where(unit_price, T, np.nan))
+        AS = np.where(num_d & ~np.isnan(AR) & ~h_option, d * AR, np.nan)
+        AT = np.where(lumpsum, group_sum(AF, price_cond), np.where(unit_price, AE, np.nan))
+        AU = np.where(
+            num_d & ~h_waived & ~h_included & ~h_option & ~np.isnan(AT),
+            d * AT,
+            np.nan,
+        )
+        AV = np.where(num_d & ~np.isnan(AS) & ~np.isnan(AU), AU - AS, np.nan)
+        AW = _finite(
+            np.where(
+                ~h_option & num_d & ~np.isnan(AU) & (AU != 0) & ~np.isnan(AV),
+                AV / AU,
+                np.nan,
+            )
+        )
+
+        title_escalation = title_row & num_d & ~blank_e & ~h_option
+        line_escalation = unit_price & ~h_option
+
+        def escalate(rate):
+            return np.where(
+                title_escalation,
+                AQ * rate,
+                np.where(line_escalation, S * rate, np.nan),
+            )
+
+        V, W, X, Y = (escalate(escalation[c]) for c in ("L", "N", "P", "R"))
+        Z = np.where(
+            title_escalation,
+            AS - (AQ + V + W + X + Y),
+            np.where(line_escalation, U - (S + V + W + X + Y), np.nan),
+        )
+
+        F = np.where(
+            title_row & ~np.isnan(AJ),
+            AJ,
+            np.where(is_lineitem & (AK == "Lumpsum") & ~h_option, np.nan, AE),
+        )
+        G = np.where(
+            ~np.isnan(F) & ~h_option & ~h_included & ~h_waived, d * F, np.nan
+        )
+
+    columns = {
+        "B": B, "F": F, "G": G, "L": L, "N": N, "O": O, "Q": Q, "R": R, "S": S,
+        "T": T, "U": U, "V": V, "W": W, "X": X, "Y": Y, "Z": Z, "AA": AA,
+        "AC": AC, "AD": AD, "AE": AE, "AF": AF, "AG": AG, "AH": AH, "AI": AI,
+        "AJ": AJ, "AK": AK, "AL": fmt, "AP": AP, "AQ": AQ, "AR": AR, "AS": AS,
+        "AT": AT, "AU": AU, "AV": AV, "AW": AW,
+    }  # fmt: skip
+    rows = slice(2, last_row)
+    priced = pd.DataFrame(
+        {c: columns[c][rows] for c in PRICING_COLUMNS},
+        index=pd.RangeIndex(3, last_row + 1, name="Row"),
+    )
+    for c in PRICING_COLUMNS:
+        if c not in TEXT_COLUMNS:
+            priced[c] = _finite(priced[c].to_numpy(dtype=float))
+    return priced
+
+
+def sheet_totals(priced):
+    """
+    Subtotal row of a priced sheet, as written by fill_lastrow_sheet().
+
+    Returns:
+        dict with the sums of TOTAL_COLUMNS and the grand margin "AW"
+        (NaN when the selling price total is zero).
+    """
+    totals = {c: float(np.nansum(priced[c].to_numpy(dtype=float))) for c in TOTAL_COLUMNS}
+    totals["AW"] = totals["AV"] / totals["AU"] if totals["AU"] != 0 else np.nan
+    return totals
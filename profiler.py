@@ -0,0 +1,318 @@
+"""
+COM round-trip profiler for xlwings operations.
+© Thiha Aung (infowizard@gmail.com)
+
+Counts the calls made on xlwings (or offline.py) objects, the bytes they
+transfer and their wall time, per function of functions.py, to see which
+steps spend their time in Excel and which in Python.
+
+    profile = Profiler()
+    with profile.instrument(functions):
+        wb = profile.wrap(wb)
+        functions.fill_formula_wb(wb)
+    profile.write("proposal.profile.json")
+
+wrap() returns a proxy that forwards every attribute access, method call
+and assignment to the real object, timing the ones that reach Excel and
+wrapping the Books, Sheets and Ranges they return. instrument() replaces
+the workbook functions of a module (those taking a wb, sheet or ws first)
+with timed versions until the block exits, so the calls are attributed to
+the innermost running function. Calls made outside of them are reported
+under TOP_LEVEL.
+
+report() also gives the hits and misses of the text caches of
+normalize.py during the run.
+
+Sizes are estimates of the data passed: 8 bytes per number, date or
+boolean and the UTF-8 length of strings. Profiling adds a few microseconds
+per call, so only use it to compare steps, not for absolute timings.
+"""
+
+import datetime as dt
+import functools
+import inspect
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+import normalize
+
+TOP_LEVEL = "(top level)"
+# Modules whose objects talk to Excel (or emulate it)
+BACKEND_MODULES = ("xlwings", "offline")
+# First parameter names of the functions instrument() times
+WORKBOOK_PARAMS = ("wb", "pwb", "sheet", "ws")
+# Methods that only build a new Python object, without a call to Excel
+LOCAL_METHODS = frozenset({"options"})
+
+
+def payload_size(value):
+    """Estimated bytes of a value read from or written to a range."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return payload_size(value.to_numpy().tolist()) + payload_size(
+            [str(label) for label in value.index]
+        )
+    if isinstance(value, np.ndarray):
+        return payload_size(value.tolist())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    if isinstance(value, (bool, int, float, dt.date, dt.datetime, np.generic)):
+        return 8
+    return 0
+
+
+def _is_backend(value):
+    return type(value).__module__.split(".")[0] in BACKEND_MODULES
+
+
+def _unwrap(value):
+    if isinstance(value, _Proxy):
+        return object.__getattribute__(value, "_target")
+    return value
+
+
+def _stats():
+    return {"calls": 0, "bytes": 0, "seconds": 0.0}
+
+
+class Profiler:
+    """Call counts, bytes and times of one run."""
+
+    def __init__(self):
+        self.functions = {}
+        self.operations = {}
+        self._stack = []  # [function name, seconds spent in timed callees]
+        # Text cache counters when the run started, see caches()
+        self._caches = normalize.cache_stats()
+
+    # Recording
+
+    def _function(self, name):
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = {
+                "invocations": 0,
+                "seconds": 0.0,
+                "self_seconds": 0.0,
+                "com_calls": 0,
+                "com_bytes": 0,
+                "com_seconds": 0.0,
+            }
+        return stats
+
+    def record(self, operation, seconds, nbytes=0):
+        """Add one call to Excel, e.g. record("Range.value", 0.02, 1200)."""
+        stats = self._function(self._stack[-1][0] if self._stack else TOP_LEVEL)
+        stats["com_calls"] += 1
+        stats["com_bytes"] += nbytes
+        stats["com_seconds"] += seconds
+        op = self.operations.setdefault(operation, _stats())
+        op["calls"] += 1
+        op["bytes"] += nbytes
+        op["seconds"] += seconds
+
+    def wrap(self, obj):
+        """Proxy of an xlwings object; other values are returned as they are."""
+        if isinstance(obj, _Proxy) or not _is_backend(obj):
+            return obj
+        return _Proxy(obj, self)
+
+    # Functions
+
+    def timed(self, name, func):
+        """Version of func recorded as function name."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            frame = [name, 0.0]
+            self._stack.append(frame)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                self._stack.pop()
+                stats = self._function(name)
+                stats["invocations"] += 1
+                stats["self_seconds"] += elapsed - frame[1]
+                # Recursive calls are already inside the outer call's time
+                if all(outer[0] != name for outer in self._stack):
+                    stats["seconds"] += elapsed
+                if self._stack:
+                    self._stack[-1][1] += elapsed
+
+        wrapper.__wrapped_by_profiler__ = True
+        return wrapper
+
+    @contextmanager
+    def instrument(self, *modules):
+        """Time the workbook functions of the modules inside the block."""
+        originals = []
+        for module in modules:
+            for name, func in list(vars(module).items()):
+                if (
+                    name.startswith("_")
+                    or not inspect.isfunction(func)
+                    or func.__module__ != module.__name__
+                    or getattr(func, "__wrapped_by_profiler__", False)
+                ):
+                    continue
+                params = list(inspect.signature(func).parameters)
+                if params and params[0] in WORKBOOK_PARAMS:
+                    originals.append((module, name, func))
+                    setattr(module, name, self.timed(name, func))
+        try:
+            yield self
+        finally:
+            for module, name, func in originals:
+                setattr(module, name, func)
+
+    # Report
+
+    def caches(self):
+        """Hits, misses and hit rate of each text cache during the run."""
+        caches = {}
+        for name, stats in normalize.cache_stats().items():
+            start = self._caches.get(name, {"hits": 0, "misses": 0})
+            hits = stats["hits"] - start["hits"]
+            misses = stats["misses"] - start["misses"]
+            if hits or misses:
+                caches[name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 4),
+                }
+        return caches
+
+    def report(self, **info):
+        """The recorded numbers as a dict, with the info given at the top."""
+        functions = {}
+        for name, stats in self.functions.items():
+            stats = {key: _round(value) for key, value in stats.items()}
+            # Time spent in the function itself, without Excel and callees
+            stats["python_seconds"] = _round(
+                max(stats["self_seconds"] - stats["com_seconds"], 0.0)
+            )
+            functions[name] = stats
+        operations = {
+            name: {key: _round(value) for key, value in stats.items()}
+            for name, stats in sorted(
+                self.operations.items(), key=lambda item: -item[1]["seconds"]
+            )
+        }
+        return {
+            **info,
+            "com_calls": sum(s["com_calls"] for s in self.functions.values()),
+            "com_bytes": sum(s["com_bytes"] for s in self.functions.values()),
+            "com_seconds": _round(
+                sum(s["com_seconds"] for s in self.functions.values())
+            ),
+            "functions": dict(
+                sorted(functions.items(), key=lambda item: -item[1]["com_seconds"])
+            ),
+            "operations": operations,
+            "caches": self.caches(),
+        }
+
+    def write(self, path, **info):
+        """Write report(**info) as JSON and return the path."""
+        path = Path(path)
+        path.write_text(json.dumps(self.report(**info), indent=2), encoding="utf-8")
+        return path
+
+
+def _round(value):
+    return round(value, 6) if isinstance(value, float) else value
+
+
+class _Proxy:
+    """Forwards to an xlwings object and records the calls that reach Excel."""
+
+    __slots__ = ("_target", "_profiler")
+
+    def __init__(self, target, profiler):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_profiler", profiler)
+
+    def _call(self, operation, func, args, kwargs, nbytes=0):
+        profiler = object.__getattribute__(self, "_profiler")
+        args = [_unwrap(arg) for arg in args]
+        kwargs = {key: _unwrap(value) for key, value in kwargs.items()}
+        start = perf_counter()
+        result = func(*args, **kwargs)
+        profiler.record(operation, perf_counter() - start, nbytes)
+        return profiler.wrap(result)
+
+    def _operation(self, name):
+        return f"{type(object.__getattribute__(self, '_target')).__name__}.{name}"
+
+    def __getattr__(self, name):
+        target = object.__getattribute__(self, "_target")
+        profiler = object.__getattribute__(self, "_profiler")
+        operation = self._operation(name)
+        start = perf_counter()
+        value = getattr(target, name)
+        seconds = perf_counter() - start
+        if inspect.ismethod(value) or inspect.isbuiltin(value):
+            if name in LOCAL_METHODS:
+                return functools.wraps(value)(
+                    lambda *args, **kwargs: profiler.wrap(
+                        value(
+                            *[_unwrap(arg) for arg in args],
+                            **{k: _unwrap(v) for k, v in kwargs.items()},
+                        )
+                    )
+                )
+            return functools.wraps(value)(
+                lambda *args, **kwargs: self._call(
+                    operation, value, args, kwargs, payload_size(args)
+                )
+            )
+        profiler.record(operation, seconds, payload_size(value))
+        return profiler.wrap(value)
+
+    def __setattr__(self, name, value):
+        target = object.__getattribute__(self, "_target")
+        value = _unwrap(value)
+        operation = self._operation(name)
+        self._call(operation, setattr, (target, name, value), {}, payload_size(value))
+
+    def __getitem__(self, key):
+        target = object.__getattribute__(self, "_target")
+        operation = self._operation("__getitem__")
+        return self._call(operation, target.__getitem__, (key,), {})
+
+    def __call__(self, *args, **kwargs):
+        target = object.__getattribute__(self, "_target")
+        return self._call(self._operation("__call__"), target, args, kwargs)
+
+    def __iter__(self):
+        profiler = object.__getattribute__(self, "_profiler")
+        for item in object.__getattribute__(self, "_target"):
+            yield profiler.wrap(item)
+
+    def __len__(self):
+        return len(object.__getattribute__(self, "_target"))
+
+    def __bool__(self):
+        return bool(object.__getattribute__(self, "_target"))
+
+    def __contains__(self, item):
+        return _unwrap(item) in object.__getattribute__(self, "_target")
+
+    def __eq__(self, other):
+        return object.__getattribute__(self, "_target") == _unwrap(other)
+
+    def __hash__(self):
+        return hash(object.__getattribute__(self, "_target"))
+
+    def __repr__(self):
+        return repr(object.__getattribute__(self, "_target"))
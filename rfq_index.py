@@ -0,0 +1,229 @@
+"""
+Persistent index of the workbooks in the @rfqs folder.
+© Thiha Aung (infowizard@gmail.com)
+
+Walking the synced SharePoint/OneDrive @rfqs tree on every lookup takes
+seconds, so the file names of its year folders are kept in SQLite under the
+user cache directory:
+
+    index = RfqIndex(base_path)
+    index.find("JEC-2026-001-v1.xlsx")   # -> Path of the folder, or None
+
+find() answers from the index and checks that the file is still there. On
+a miss the index is refreshed first: every indexed folder is stat()ed and
+only the folders whose modification time changed (a file or folder was
+added, removed or renamed in them) are listed again. The folders searched
+are the same as _find_workbook_in_rfqs(): year folders from the current
+year down to 2020, up to MAX_DEPTH levels, without following symbolic
+links. If several folders hold the file the shallowest is used.
+
+Both walk the tree with walk_levels(), which stats and lists the folders
+of a depth level in parallel.
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+MAX_DEPTH = 5
+FIRST_YEAR = 2020
+# Folders listed at the same time by walk_levels(). Listing synced
+# SharePoint/OneDrive folders is latency bound, so this can exceed the CPUs.
+SEARCH_THREADS = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,  -- relative to the base path
+    parent TEXT,
+    depth INTEGER NOT NULL,
+    mtime INTEGER NOT NULL  -- st_mtime_ns when the folder was listed
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT NOT NULL,  -- lower case
+    dir TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_name ON files (name);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+"""
+
+
+def cache_dir() -> Path:
+    """Per-user cache directory of minimalist."""
+    if sys.platform == "win32":
+        root = Path(os.environ.get("LOCALAPPDATA") or Path.home() / "AppData/Local")
+    elif sys.platform == "darwin":
+        root = Path.home() / "Library" / "Caches"
+    else:
+        root = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return root / "minimalist"
+
+
+def year_folders(base_path: Path) -> list[Path]:
+    """Year folders searched, most recent first."""
+    folders = []
+    for year in range(datetime.now().year, FIRST_YEAR - 1, -1):
+        path = base_path / str(year)
+        if path.is_dir() and not path.is_symlink():
+            folders.append(path)
+    return folders
+
+
+def list_folder(directory) -> tuple[list[str], list[str]]:
+    """
+    File and folder names of a directory. The entry types come with the
+    listing (no stat per entry); symbolic links are skipped to avoid cycles.
+    Folders we can't access list as empty.
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, subdirs
+
+
+def walk_levels(roots, expand, max_depth=MAX_DEPTH):
+    """
+    Walk breadth first from roots (depth 1), one depth level at a time.
+
+    expand(item) returns (result, children) and is called for the items of
+    a level in parallel, e.g. to list folders. Yields the [(item, result)]
+    of each level, in order; children below max_depth are not expanded.
+    Stop iterating to stop the walk.
+    """
+    level = list(roots)
+    depth = 1
+    with ThreadPoolExecutor(max_workers=SEARCH_THREADS) as pool:
+        while level and depth <= max_depth:
+            expanded = list(pool.map(expand, level))
+            yield [(item, result) for item, (result, _) in zip(level, expanded)]
+            level = [child for _, children in expanded for child in children]
+            depth += 1
+
+
+class RfqIndex:
+    """File name -> folder index of one @rfqs base path."""
+
+    def __init__(self, base_path, db_path=None):
+        self.base_path = Path(base_path)
+        if db_path is None:
+            key = hashlib.sha1(str(self.base_path).encode("utf-8")).hexdigest()[:12]
+            db_path = cache_dir() / f"rfq_index_{key}.sqlite3"
+        self.db_path = Path(db_path)
+        self.listed = 0  # Folders listed by the last refresh()
+
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _lookup(self, conn, name):
+        rows = conn.execute(
+            "SELECT files.dir FROM files JOIN dirs ON dirs.path = files.dir "
+            "WHERE files.name = ? "
+            # Shallowest first, then the most recent year as in the walk
+            "ORDER BY dirs.depth, substr(files.dir, 1, 4) DESC, files.dir",
+            (name.lower(),),
+        ).fetchall()
+        return [self.base_path / row[0] for row in rows]
+
+    def find(self, workbook_name: str) -> Path | None:
+        """Folder of the workbook (the shallowest one), or None."""
+        conn = self._connect()
+        try:
+            found = [
+                folder
+                for folder in self._lookup(conn, workbook_name)
+                if (folder / workbook_name).exists()
+            ]
+            if not found:
+                self._refresh(conn)
+                found = self._lookup(conn, workbook_name)
+        finally:
+            conn.close()
+
+        if not found:
+            return None
+        if len(found) > 1:
+            print(
+                f"Note: Found {len(found)} locations for '{workbook_name}'. "
+                f"Using: {found[0]}"
+            )
+        return found[0]
+
+    def refresh(self) -> int:
+        """Bring the index up to date; returns the number of folders listed."""
+        conn = self._connect()
+        try:
+            return self._refresh(conn)
+        finally:
+            conn.close()
+
+    def _refresh(self, conn) -> int:
+        self.listed = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            known = dict(conn.execute("SELECT path, mtime FROM dirs"))
+            children = {}
+            for path, parent in conn.execute("SELECT path, parent FROM dirs"):
+                children.setdefault(parent, []).append(path)
+
+            def expand(item):
+                """(mtime, files or None if unchanged), sub folders of a folder."""
+                rel, _ = item
+                try:
+                    mtime = os.stat(self.base_path / rel).st_mtime_ns
+                except OSError:
+                    return None, []
+                if known.get(rel) == mtime:
+                    # Unchanged: same files and sub folders as when indexed
+                    subdirs = children.get(rel, [])
+                    return (mtime, None), [(child, rel) for child in subdirs]
+                files, names = list_folder(self.base_path / rel)
+                return (mtime, files), [(str(Path(rel, name)), rel) for name in names]
+
+            seen = set()
+            roots = [(folder.name, None) for folder in year_folders(self.base_path)]
+            for depth, level in enumerate(walk_levels(roots, expand), 1):
+                for (rel, parent), result in level:
+                    if result is None:
+                        continue
+                    seen.add(rel)
+                    mtime, files = result
+                    if files is None:
+                        continue
+                    self.listed += 1
+                    conn.execute("DELETE FROM files WHERE dir = ?", (rel,))
+                    conn.executemany(
+                        "INSERT INTO files (name, dir) VALUES (?, ?)",
+                        [(name.lower(), rel) for name in files],
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO dirs (path, parent, depth, mtime) "
+                        "VALUES (?, ?, ?, ?)",
+                        (rel, parent, depth, mtime),
+                    )
+
+            gone = [(path,) for path in known if path not in seen]
+            conn.executemany("DELETE FROM files WHERE dir = ?", gone)
+            conn.executemany("DELETE FROM dirs WHERE path = ?", gone)
+        return self.listed
+
+
+def find_workbook(workbook_name: str, base_path) -> Path | None:
+    """RfqIndex(base_path).find(workbook_name)"""
+    return RfqIndex(base_path).find(workbook_name)
@@ -0,0 +1,283 @@
+"""
+Workbook snapshot: one read of every system sheet, shared by the functions
+of an operation (e.g. mini fix) instead of each of them probing and reading
+the same sheets again.
+© Thiha Aung (infowizard@gmail.com)
+
+    snapshot = WorkbookSnapshot(wb)
+    functions.number_title(wb, snapshot=snapshot)
+    functions.format_text(wb, snapshot=snapshot)
+
+Each system sheet is read as A1:BD(last row) with one call, plus the used
+range and the C and G last row probes. Writes made through the snapshot
+patch the cached values with the values written, and mark the formula
+columns (whose results depend on them) stale. Stale cells are read again
+only when asked for, and only the stale columns and rows of the request.
+Changes made outside of the snapshot need invalidate() (of the columns and
+rows written, if known) or deleted().
+"""
+
+import math
+import numbers
+
+import pandas as pd
+from xlwings.conversion import (  # type: ignore
+    PandasDataFrameConverter,
+    PandasSeriesConverter,
+)
+
+import pricing
+from functions import get_last_row, should_skip_sheet
+
+LAST_COLUMN = "BD"
+PROBE_COLUMNS = ("C", "G")
+# Columns filled with formulas by fill_formula(): stale after any input change
+FORMULA_COLUMNS = frozenset(pricing.PRICING_COLUMNS)
+
+
+def column_letter(index):
+    """Convert a 0-based column index to an Excel column letter (0 -> "A")."""
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+class _SheetData:
+    """
+    Values of one sheet (rows 1..last), its last row probes and the stale
+    cells, as {column letter: (first row, last row)}.
+    """
+
+    def __init__(self, values, last_rows):
+        self.values = values
+        self.last_rows = last_rows
+        self.stale = {}
+
+    def mark(self, columns, first_row=1, last_row=math.inf):
+        """Mark rows first_row..last_row of columns stale."""
+        for column in columns:
+            first, last = self.stale.get(column, (first_row, last_row))
+            self.stale[column] = (min(first, first_row), max(last, last_row))
+
+    def stale_box(self, c1, c2, r1, r2):
+        """
+        (c1, c2, r1, r2) bounds of the stale cells of columns c1..c2 (0-based)
+        and rows r1..r2, or None if all of them are up to date. Rows below
+        the cached ones count as stale.
+        """
+        boxes = []
+        if r2 > len(self.values):
+            boxes.append((c1, c2, max(r1, len(self.values) + 1), r2))
+        for column, (first, last) in self.stale.items():
+            c = pricing.column_index(column)
+            first, last = max(first, r1), min(last, r2)
+            if c1 <= c <= c2 and first <= last:
+                boxes.append((c, c, first, last))
+        if not boxes:
+            return None
+        columns = [box[:2] for box in boxes]
+        rows = [box[2:] for box in boxes]
+        return (
+            min(c for c, _ in columns),
+            max(c for _, c in columns),
+            min(r for r, _ in rows),
+            max(r for _, r in rows),
+        )
+
+    def patch(self, row, column, grid):
+        """Put a 2-D list of values at (1-based) row and (0-based) column."""
+        width = len(self.values[0]) if self.values else 0
+        for r, values in enumerate(grid, start=row - 1):
+            while r >= len(self.values):
+                self.values.append([None] * width)
+            for c, value in enumerate(values[: max(width - column, 0)], start=column):
+                self.values[r][c] = _cell(value)
+
+    def refreshed(self, columns, first_row, last_row):
+        """Columns read again over first_row..last_row: drop what they cover."""
+        for column in columns:
+            rows = self.stale.get(column)
+            if rows is None:
+                continue
+            first, last = rows
+            if first_row <= first and last <= last_row:
+                del self.stale[column]
+            elif first_row <= first <= last_row:
+                self.stale[column] = (last_row + 1, last)
+            elif first_row <= last <= last_row:
+                self.stale[column] = (first, first_row - 1)
+
+    def last_row(self, column):
+        """Last non-empty row of a column from the values (1 if empty)."""
+        c = pricing.column_index(column)
+        for r in range(len(self.values), 0, -1):
+            if self.values[r - 1][c] is not None:
+                return r
+        return 1
+
+
+class WorkbookSnapshot:
+    """Cached values of all system sheets of a workbook."""
+
+    def __init__(self, wb, last_column=LAST_COLUMN):
+        self.wb = wb  # Sheets are keyed by upper case name, as Excel ignores case
+        self.last_column = last_column
+        self._sheets = {}
+        self.reads = 0  # Range reads made, for profiling
+
+    @property
+    def system_names(self):
+        """Names of the system (non-skipped) sheets, in workbook order."""
+        return [name for name in self.wb.sheet_names if not should_skip_sheet(name)]
+
+    def _load(self, name):
+        sheet = self.wb.sheets[name]
+        bottom = sheet.used_range.last_cell.row
+        last_rows = {
+            column: get_last_row(sheet, column, bottom) for column in PROBE_COLUMNS
+        }
+        last_row = max(last_rows.values())
+        values = (
+            sheet.range(f"A1:{self.last_column}{last_row}").options(ndim=2).value
+        )
+        self.reads += len(PROBE_COLUMNS) + 2
+        data = _SheetData([list(row) for row in values], last_rows)
+        self._sheets[name.upper()] = data
+        return data
+
+    def last_row(self, name, column="C"):
+        """Same as functions.get_last_row(sheet, column)."""
+        data = self._sheets.get(name.upper())
+        if data is None:
+            data = self._load(name)
+        if column not in data.last_rows:
+            row = get_last_row(self.wb.sheets[name], column)
+            self.reads += 2
+            data.last_rows[column] = row
+        return data.last_rows[column]
+
+    def rows(self, name, first_col, last_col, first_row, last_row):
+        """2-D list of values, like sheet.range(...).options(ndim=2).value."""
+        c1 = pricing.column_index(first_col)
+        c2 = pricing.column_index(last_col)
+        r1, r2 = sorted((first_row, last_row))
+        data = self._sheets.get(name.upper())
+        if data is None:
+            data = self._load(name)
+        box = data.stale_box(c1, c2, r1, r2)
+        if box is not None:
+            self._refresh(name, data, *box)
+        return [list(values[c1 : c2 + 1]) for values in data.values[r1 - 1 : r2]]
+
+    def _refresh(self, name, data, c1, c2, r1, r2):
+        """Read the stale cells of columns c1..c2 and rows r1..r2 again."""
+        address = f"{column_letter(c1)}{r1}:{column_letter(c2)}{r2}"
+        values = self.wb.sheets[name].range(address).options(ndim=2).value
+        self.reads += 1
+        data.patch(r1, c1, values)
+        data.refreshed([column_letter(c) for c in range(c1, c2 + 1)], r1, r2)
+
+    def table(self, name, first_col, last_col, empty=None):
+        """
+        Rows 2..last C row of the given columns as a DataFrame, the same as
+        sheet.range(f"{first_col}2:{last_col}{last}")
+        .options(pd.DataFrame, index=False, empty=empty).value
+        """
+        last_row = self.last_row(name, "C")
+        values = self.rows(name, first_col, last_col, 2, last_row)
+        if empty is not None:
+            values = [[empty if v is None else v for v in row] for row in values]
+        return PandasDataFrameConverter.read_value(values, {"index": False})
+
+    def write(self, name, address, value, **options):
+        """
+        Write through to the sheet, e.g. write("CCTV", "C2", series, index=False),
+        and patch the cached values with the values written.
+        """
+        sheet = self.wb.sheets[name]
+        target = sheet.range(address)
+        if options:
+            target = target.options(**options)
+        target.value = value
+
+        data = self._sheets.get(name.upper())
+        if data is None:
+            return
+        grid = _grid(value, options)
+        data.patch(target.row, target.column - 1, grid)
+        first = target.column - 1
+        width = max((len(row) for row in grid), default=1)
+        columns = {column_letter(first + i) for i in range(width)}
+        # Calculated values may change in any row, e.g. the Title subtotals
+        data.mark(FORMULA_COLUMNS - columns)
+        for column in columns & set(data.last_rows):
+            if column in data.stale or column not in PROBE_COLUMNS:
+                del data.last_rows[column]
+            else:
+                data.last_rows[column] = data.last_row(column)
+
+    def deleted(self, name, runs):
+        """
+        Rows deleted from the sheet (shifting the rows below up), as
+        (first, last) pairs: drop them from the cached values.
+        """
+        data = self._sheets.get(name.upper())
+        if data is None or not runs:
+            return
+        for first, last in sorted(runs, reverse=True):
+            del data.values[first - 1 : last]
+        for column, row in list(data.last_rows.items()):
+            if any(first <= row <= last for first, last in runs):
+                del data.last_rows[column]
+            else:
+                data.last_rows[column] = row - sum(
+                    last - first + 1 for first, last in runs if last < row
+                )
+        # Stale rows moved, and references to the deleted rows changed
+        data.mark(set(data.stale) | FORMULA_COLUMNS)
+
+    def invalidate(self, name=None, columns=None, rows=(1, math.inf)):
+        """
+        Drop the cached data of one sheet, or of all sheets. With columns,
+        mark only rows (first, last) of those columns stale.
+        """
+        if columns is not None:
+            data = self._sheets.get(name.upper())
+            if data is not None:
+                data.mark(columns, *rows)
+                for column in set(columns) & set(data.last_rows):
+                    del data.last_rows[column]
+        elif name is None:
+            self._sheets.clear()
+        else:
+            self._sheets.pop(name.upper(), None)
+
+
+def _cell(value):
+    """A value written to a cell as it reads back (numbers as float)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, numbers.Number):
+        value = float(value)
+        return None if math.isnan(value) else value
+    return value
+
+
+def _grid(value, options):
+    """A value as the 2-D list of cell values xlwings writes."""
+    if isinstance(value, pd.DataFrame):
+        return PandasDataFrameConverter.write_value(value, dict(options))
+    if isinstance(value, pd.Series):
+        return PandasSeriesConverter.write_value(value, dict(options))
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], (list, tuple)):
+            return [list(row) for row in value]
+        if options.get("transpose"):
+            return [[v] for v in value]
+        return [list(value)]
+    return [[value]]
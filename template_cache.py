@@ -0,0 +1,153 @@
+"""
+Local cache of the files of the shared download folder.
+© Thiha Aung (infowizard@gmail.com)
+
+Template.xlsx, the project planner and the logo used to be downloaded every
+time they were needed. They are kept under the user cache directory with
+the SHA-256 of their content and the version the server gave them (its
+ETag, or Last-Modified):
+
+    cache = TemplateCache()
+    path = cache.path("Template.xlsx")   # Downloaded only on the first use
+    cache.refresh()                      # Check every cached file now
+
+Once a file is cached, path() returns it without waiting for the network.
+A copy older than MAX_AGE is checked in a background thread with a
+conditional request, so an unchanged file is not downloaded again. A copy
+that does not match its hash (e.g. an interrupted write) is downloaded
+again before it is returned.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from rfq_index import cache_dir
+
+BASE_URL = "https://filedn.com/liTeg81ShEXugARC7cg981h/"
+MAX_AGE = 24 * 60 * 60  # Seconds
+TIMEOUT = 30  # Seconds
+
+_lock = threading.Lock()
+
+
+def sha256(path) -> str:
+    """Hex SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TemplateCache:
+    """Files of BASE_URL (names relative to it) cached in a local folder."""
+
+    def __init__(self, directory=None, base_url=BASE_URL, max_age=MAX_AGE):
+        self.directory = Path(directory or cache_dir() / "templates")
+        self.base_url = base_url
+        self.max_age = max_age
+        self.manifest_path = self.directory / "manifest.json"
+        self.thread = None  # Background refresh started by the last path()
+
+    def file(self, name) -> Path:
+        """Where the cached copy of name is kept."""
+        return self.directory / Path(name).name
+
+    def manifest(self) -> dict:
+        """{name: {"sha256", "version", "fetched"}} of the cached files."""
+        try:
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_entry(self, name, entry):
+        with _lock:
+            manifest = self.manifest()
+            manifest[name] = entry
+            temp = self.manifest_path.with_name(f".manifest.{os.getpid()}.tmp")
+            temp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            os.replace(temp, self.manifest_path)
+
+    def path(self, name) -> Path:
+        """
+        Local copy of name: downloaded if it is not cached (or damaged),
+        refreshed in the background if it is older than max_age.
+        """
+        entry = self.manifest().get(name)
+        path = self.file(name)
+        if entry is None or not path.is_file() or sha256(path) != entry["sha256"]:
+            self._fetch(name, None)
+            return path
+        if time.time() - entry["fetched"] > self.max_age:
+            self.thread = threading.Thread(
+                target=self._refresh_quietly, args=(name,), daemon=True
+            )
+            self.thread.start()
+        return path
+
+    def refresh(self, names=None) -> list[str]:
+        """
+        Check the cached files (or names) against the server now. Returns
+        the names downloaded again because they changed.
+        """
+        manifest = self.manifest()
+        changed = []
+        for name in manifest if names is None else names:
+            if self._fetch(name, manifest.get(name)):
+                changed.append(name)
+        return changed
+
+    def _refresh_quietly(self, name):
+        try:
+            self._fetch(name, self.manifest().get(name))
+        except Exception as e:
+            # The cached copy is still good; try again on the next use
+            print(f"Could not refresh {name}: {e}")
+
+    def _fetch(self, name, entry) -> bool:
+        """Download name unless the server has the cached version."""
+        import requests
+
+        headers = {}
+        path = self.file(name)
+        if entry is not None and path.is_file():
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = requests.get(
+            self.base_url + name, headers=headers, stream=True, timeout=TIMEOUT
+        )
+        with response:
+            if response.status_code == 304:
+                self._save_entry(name, {**entry, "fetched": time.time()})  # type: ignore
+                return False
+            response.raise_for_status()
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            digest = hashlib.sha256()
+            with open(temp, "wb") as fd:
+                for chunk in response.iter_content(chunk_size=8192):
+                    digest.update(chunk)
+                    fd.write(chunk)
+            os.replace(temp, path)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        self._save_entry(
+            name,
+            {
+                "sha256": digest.hexdigest(),
+                "version": etag or last_modified,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched": time.time(),
+            },
+        )
+        print(f"Downloaded {name}")
+        return True
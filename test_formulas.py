@@ -9,121 +9,19 @@ Run with: python test_formulas.py
 
 import unittest
 
+import formulas
 
 # =============================================================================
-# MASTER FORMULA DEFINITIONS
-# These are the authoritative formulas. Any change here should be intentional
-# and reviewed carefully as it affects pricing calculations.
+# FORMULAS UNDER TEST
+# The formulas fill_formula() writes, from formulas.COLUMNS (the one source
+# of them) for a sheet within the default look-ahead, and the A1 reference.
+# Any change to formulas.py should be intentional and reviewed carefully as
+# it affects pricing calculations.
 # =============================================================================
 
 FORMULAS = {
-    # A1: Reference formula
-    "A1": '= "JASON REF: " & Config!B29 &  ", REVISION: " &  Config!B30 & ", PROJECT: " & Config!B26',
-
-    # B: Serial Numbering
-    "B": '=IF(AND(A3="", ISNUMBER(D3), ISNUMBER(K3)), COUNT(B2:INDEX($B$1:B2, XMATCH("Title", $AL$1:AL2, 0, -1))) + 1 , "")',
-
-    # N: UCD (Unit Cost after Discount)
-    "N": '=IF(K3<>"",K3*(1-M3),"")',
-
-    # O: SCD (Subtotal Cost after Discount)
-    "O": '=IF(AND(D3<>"", K3<>"",H3<>"OPTION"),D3*N3,"")',
-
-    # Q: Exchange rate
-    "Q": '=IF(J3<>"", INDEX(Config!$B$2:$B$10, XMATCH(J3, Config!$A$2:$A$10, 0))/INDEX(Config!$B$2:$B$10, XMATCH(Config!$B$12, Config!$A$2:$A$10, 0)), "")',
-
-    # R: UCDQ (Unit Cost after Discount in Quoted currency)
-    "R": '=IF(AND(D3<>"", K3<>""), N3*Q3,"")',
-
-    # S: SCDQ (Subtotal Cost after Discount in Quoted currency)
-    "S": '=IF(AND(D3<>"", K3<>"", H3<>"OPTION", INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*R3, "")',
-
-    # T: BUCQ (Base Unit Cost in Quoted currency) - includes escalations
-    "T": '=IF(AND(D3<>"",K3<>""), (R3*(1+$L$1+$N$1+$P$1+$R$1))/(1-0.05),"")',
-
-    # U: BSCQ (Base Subtotal Cost in Quoted currency)
-    "U": '=IF(AND(D3<>"",K3<>"",H3<>"OPTION",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*T3, "")',
-
-    # V: Default escalation
-    "V": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$L$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$L$1, ""))',
-
-    # W: Warranty escalation
-    "W": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$N$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$N$1, ""))',
-
-    # X: Freight escalation
-    "X": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$P$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$P$1, ""))',
-
-    # Y: Special escalation
-    "Y": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AQ3*$R$1, IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), S3*$R$1, ""))',
-
-    # Z: Risk calculation
-    "Z": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>"", H3<>"OPTION"), AS3-(AQ3+V3+W3+X3+Y3), IF(AND(AL3="Lineitem", AK3="Unit Price", H3<>"OPTION"), U3-(S3+V3+W3+X3+Y3), ""))',
-
-    # AA: Margin reference
-    "AA": '=IF(AND(D3<>"",K3<>""),$J$1,"")',
-
-    # AC: RUPQ (Recommended Unit Price in Quoted currency)
-    "AC": '=IF(AND(D3<>"",K3<>""),CEILING(T3/(1-AA3), 1),"")',
-
-    # AD: RSPQ (Recommended Subtotal Price in Quoted currency)
-    "AD": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*AC3,"")',
-
-    # AE: UPLS (Unit Price Lumpsum)
-    "AE": '=IF(AND(D3<>"",K3<>""), IF(AB3<>"", AB3, AC3),"")',
-
-    # AF: SPLS (Subtotal Price Lumpsum)
-    "AF": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED",INDEX($H$1:H2, XMATCH("Title", $AL$1:AL2, 0, -1))<>"OPTION"), D3*AE3,"")',
-
-    # AG: Profit
-    "AG": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED",AF3<>""),AF3-U3,"")',
-
-    # AH: Margin percentage
-    "AH": '=IF(AND(AG3<>"", AG3<>0), AG3/AF3, "")',
-
-    # AI: Total price per item
-    "AI": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION"), D3*AE3, "")',
-
-    # F: Unit Price (display)
-    "F": '=IF(AND(AL3="Title", ISNUMBER(AJ3)), AJ3, IF(AND(AL3="Lineitem", AK3="Lumpsum", H3<>"OPTION"), "", AE3))',
-
-    # G: Subtotal Price (display)
-    "G": '=IF(AND(F3<>"", H3<>"OPTION", H3<>"INCLUDED", H3<>"WAIVED"), D3*F3,"")',
-
-    # L: Subtotal Cost
-    "L": '=IF(AND(D3<>"",K3<>"",H3<>"OPTION"),D3*K3,"")',
-
-    # AL: Format field (row type detection)
-    "AL": '=IF(C4<>"",IF(AND(A4<>"",C4<>""),"Title", IF(B4<>"","Lineitem", IF(LEFT(C4,3)="***","Comment", IF(AND(A4="",B4="",C3="", C5<>"",D5<>""), "Subtitle", IF(AND(A4="",B4="",C3="", C5=""), "Subsystem", "Description"))))),"")',
-
-    # AJ: Lumpsum total
-    "AJ": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(AI4:INDEX(AI4:AI1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)), "")',
-
-    # AK: Lumpsum/Unit Price flag
-    "AK": '=IF(AL3="Lineitem", IF(ISNUMBER(INDEX($AJ$1:AJ2, XMATCH("Title", $AL$1:AL2, 0, -1))), "Lumpsum", "Unit Price"), "")',
-
-    # AP: SCDQL (Subtotal Cost after Discount in Quoted currency Lumpsum)
-    "AP": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(S4:INDEX(S4:S1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), R3, ""))',
-
-    # AQ: TCDQL (Total Cost after Discount in Quoted currency Lumpsum) - Material cost
-    "AQ": '=IF(AND(ISNUMBER(D3), ISNUMBER(AP3), H3<>"OPTION"), D3*AP3, "")',
-
-    # AR: BSCQL (Base Subtotal Cost in Quoted currency Lumpsum)
-    "AR": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(U4:INDEX(U4:U1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), T3, ""))',
-
-    # AS: BTCQL (Base Total Cost in Quoted currency Lumpsum) - Base cost
-    "AS": '=IF(AND(ISNUMBER(D3), ISNUMBER(AR3), H3<>"OPTION"), D3*AR3, "")',
-
-    # AT: SSPL (Subtotal Selling Price Lumpsum)
-    "AT": '=IF(AND(AL3="Title", ISNUMBER(D3), E3<>""), SUM(AF4:INDEX(AF4:AF1500, XMATCH("Title", AL4:AL1500, 0, 1)-1)), IF(AND(AL3="Lineitem", AK3="Unit Price"), AE3, ""))',
-
-    # AU: TSPL (Total Selling Price Lumpsum) - Selling price
-    "AU": '=IF(AND(ISNUMBER(D3), H3<>"WAIVED", H3<>"INCLUDED", H3<>"OPTION", ISNUMBER(AT3)), D3*AT3, "")',
-
-    # AV: Total Profit
-    "AV": '=IF(AND(ISNUMBER(D3), ISNUMBER(AS3), ISNUMBER(AU3)), AU3-AS3, "")',
-
-    # AW: Grand Margin
-    "AW": '=IF(AND(H3<>"OPTION", ISNUMBER(D3), ISNUMBER(AU3), AU3<>0, ISNUMBER(AV3)), AV3/AU3, "")',
+    "A1": formulas.REFERENCE,
+    **{column: formulas.formula(column, last_row=100) for column in formulas.COLUMNS},
 }
 
 
@@ -428,47 +326,65 @@ class TestCriticalPricingLogic(unittest.TestCase):
 
 class TestFormulasMatchSource(unittest.TestCase):
     """
-    CRITICAL: Verify formulas in this test file match functions.py
-    This catches any accidental changes to either file.
+    CRITICAL: Verify the formulas of formulas.py are written as they are,
+    and that the most critical ones have not changed.
     """
 
-    def test_formulas_match_fill_formula_function(self):
-        """
-        Read fill_formula() from functions.py and verify formulas match.
-        This is the most important test - it ensures test and source are in sync.
-        """
-        import re
-
-        # Read the functions.py file
-        with open("functions.py", "r") as f:
-            content = f.read()
-
-        # Extract the fill_formula function
-        match = re.search(
-            r'def fill_formula\(sheet\):.*?(?=\ndef |\Z)',
-            content,
-            re.DOTALL
-        )
-        self.assertIsNotNone(match, "Could not find fill_formula function")
-        func_content = match.group(0)
-
-        # Check each formula exists in the function
-        formulas_to_check = {
-            "N": '=IF(K3<>"",K3*(1-M3),"")',
-            "O": '=IF(AND(D3<>"", K3<>"",H3<>"OPTION"),D3*N3,"")',
-            "R": '=IF(AND(D3<>"", K3<>""), N3*Q3,"")',
-            "L": '=IF(AND(D3<>"",K3<>"",H3<>"OPTION"),D3*K3,"")',
-            "AC": '=IF(AND(D3<>"",K3<>""),CEILING(T3/(1-AA3), 1),"")',
-            "AG": '=IF(AND(D3<>"",K3<>"", H3<>"OPTION", H3<>"INCLUDED",AF3<>""),AF3-U3,"")',
-            "AH": '=IF(AND(AG3<>"", AG3<>0), AG3/AF3, "")',
-        }
-
-        for col, formula in formulas_to_check.items():
-            self.assertIn(
-                formula,
-                func_content,
-                f"Formula for column {col} not found in fill_formula():\n{formula}"
-            )
+    def test_blocks_write_every_formula(self):
+        """fill_formula() writes every column of formulas.COLUMNS once."""
+        written = []
+        for first, last in formulas.BLOCKS:
+            for number in range(formulas.column_number(first), formulas.column_number(last) + 1):
+                written.append(formulas.column_letters(number))
+        self.assertEqual(sorted(written), sorted(formulas.COLUMNS))
+
+    def test_lookahead_bound(self):
+        """The lumpsum look-ahead reaches row 1500, or the whole of longer sheets."""
+        self.assertIn("AI4:AI1500", FORMULAS["AJ"])
+        self.assertIn("AL4:AL1500", FORMULAS["AJ"])
+        self.assertIn("S4:S3001", formulas.formula("AP", last_row=3000))
+        self.assertNotIn("{end}", "".join(FORMULAS.values()))
+
+    def test_r1c1_templates_convert_back(self):
+        """Each R1C1 template gives back the A1 formula in every row."""
+        for first, last in formulas.BLOCKS:
+            templates = formulas.block(first, last, 100)
+            for offset, template in enumerate(templates):
+                col = formulas.column_letters(formulas.column_number(first) + offset)
+                number = formulas.column_number(col)
+                row = formulas.first_row(col)
+                self.assertEqual(formulas.from_r1c1(template, row, number), FORMULAS[col])
+                # No A1 reference is left over
+                self.assertEqual(formulas.to_r1c1(template, row, number), template)
+        self.assertEqual(formulas.block("N", "N", 100), ('=IF(RC[-3]<>"",RC[-3]*(1-RC[-1]),"")',))
+        self.assertEqual(formulas.from_r1c1("=SUM(R3C:R[-1]C)+$A$1", 20, 7), "=SUM(G$3:G19)+$A$1")
+        self.assertEqual(formulas.to_r1c1('=A$3+$B4&"A1"', 5, 3), '=R3C[-2]+R[-1]C2&"A1"')
+
+    def test_subtotal_row_formulas(self):
+        """fill_lastrow_sheet() writes the subtotal row formulas unchanged."""
+        import pricing
+
+        written = {}
+        for first, templates in formulas.subtotals(20):
+            for offset, template in enumerate(templates):
+                number = formulas.column_number(first) + offset
+                written[formulas.column_letters(number)] = formulas.from_r1c1(template, 20, number)
+        self.assertEqual(written, {
+            "F": '="Subtotal(" & Config!B12 & ")"',
+            "G": "=SUM(G3:G19)",
+            "V": "=SUM(V3:V19)",
+            "W": "=SUM(W3:W19)",
+            "X": "=SUM(X3:X19)",
+            "Y": "=SUM(Y3:Y19)",
+            "Z": "=SUM(Z3:Z19)",
+            "AQ": "=SUM(AQ3:AQ19)",
+            "AS": "=SUM(AS3:AS19)",
+            "AU": "=SUM(AU3:AU19)",
+            "AV": "=SUM(AV3:AV19)",
+            "AW": '=IF(AU20<>0,AV20/AU20, "")',
+        })
+        # The subtotal of every column pricing.sheet_totals() sums
+        self.assertLessEqual(set(pricing.TOTAL_COLUMNS), set(written))
 
     def test_critical_pricing_formulas_unchanged(self):
         """
@@ -503,5 +419,536 @@ class TestFormulasMatchSource(unittest.TestCase):
         self.assertEqual(FORMULAS["T"], expected)
 
 
+# =============================================================================
+# PRICING ENGINE PARITY
+# A minimal evaluator for the FORMULAS above, used to check pricing.py
+# cell-for-cell against what Excel would calculate.
+# =============================================================================
+
+import math
+import random
+import re
+import sys
+
+_TOKEN = re.compile(
+    r'\s*(?:(?P<str>"(?:[^"]|"")*")'
+    r"|(?P<num>\d+(?:\.\d+)?)"
+    r"|(?P<ref>(?:(?P<sheet>[A-Za-z_]+)!)?\$?[A-Z]{1,3}\$?\d+)"
+    r"|(?P<func>[A-Z][A-Z0-9.]*)\("
+    r"|(?P<op><>|<=|>=|[-+*/&=<>:(),]))"
+)
+_REF = re.compile(r"(?:(\w+)!)?(\$?)([A-Z]{1,3})(\$?)(\d+)")
+
+
+class _Err:
+    """An Excel error value such as #VALUE! or #N/A."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+class _Ref:
+    """A rectangular reference on a sheet (0-based columns, 1-based rows)."""
+
+    def __init__(self, sheet, c1, r1, c2, r2):
+        self.sheet = sheet
+        self.c1, self.c2 = min(c1, c2), max(c1, c2)
+        self.r1, self.r2 = min(r1, r2), max(r1, r2)
+
+    def cells(self):
+        for r in range(self.r1, self.r2 + 1):
+            for c in range(self.c1, self.c2 + 1):
+                yield (self.sheet, c, r)
+
+
+def _col(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+def _parse(formula):
+    tokens = []
+    pos = 1  # Skip "="
+    while pos < len(formula):
+        if not formula[pos:].strip():
+            break
+        match = _TOKEN.match(formula, pos)
+        if match is None:
+            raise ValueError(f"Cannot parse {formula[pos:]!r}")
+        tokens.append(match)
+        pos = match.end()
+    tokens.append(None)
+    state = {"i": 0}
+
+    def peek():
+        tok = tokens[state["i"]]
+        return tok.group("op") if tok is not None and tok.group("op") else None
+
+    def take():
+        tok = tokens[state["i"]]
+        state["i"] += 1
+        return tok
+
+    def expr():
+        node = concat()
+        while peek() in ("=", "<>", "<", ">", "<=", ">="):
+            node = ("bin", take().group("op"), node, concat())
+        return node
+
+    def concat():
+        node = additive()
+        while peek() == "&":
+            take()
+            node = ("bin", "&", node, additive())
+        return node
+
+    def additive():
+        node = term()
+        while peek() in ("+", "-"):
+            node = ("bin", take().group("op"), node, term())
+        return node
+
+    def term():
+        node = unary()
+        while peek() in ("*", "/"):
+            node = ("bin", take().group("op"), node, unary())
+        return node
+
+    def unary():
+        if peek() == "-":
+            take()
+            return ("neg", unary())
+        return ranged()
+
+    def ranged():
+        node = primary()
+        while peek() == ":":
+            take()
+            node = ("range", node, primary())
+        return node
+
+    def primary():
+        tok = take()
+        if tok.group("str") is not None:
+            return ("val", tok.group("str")[1:-1].replace('""', '"'))
+        if tok.group("num") is not None:
+            return ("val", float(tok.group("num")))
+        if tok.group("ref") is not None:
+            sheet, col_abs, col, row_abs, row = _REF.fullmatch(
+                tok.group("ref")
+            ).groups()
+            return ("ref", sheet, _col(col), int(row), bool(row_abs))
+        if tok.group("func") is not None:
+            args = []
+            if peek() != ")":
+                args.append(expr())
+                while peek() == ",":
+                    take()
+                    args.append(expr())
+            take()  # ")"
+            return ("func", tok.group("func"), args)
+        if tok.group("op") == "(":
+            node = expr()
+            take()  # ")"
+            return node
+        raise ValueError(f"Unexpected token in {formula!r}")
+
+    return expr()
+
+
+class _Book:
+    """Cells and formulas of a workbook, evaluated on demand."""
+
+    def __init__(self):
+        self.values = {}
+        self.formulas = {}
+        self.memo = {}
+        self.parsed = {}
+
+    def set_formula(self, sheet, col, row, formula, origin_row):
+        if formula not in self.parsed:
+            self.parsed[formula] = _parse(formula)
+        self.formulas[(sheet, col, row)] = (self.parsed[formula], row - origin_row)
+
+    def cell(self, key):
+        if key in self.formulas:
+            if key not in self.memo:
+                node, offset = self.formulas[key]
+                self.memo[key] = self.scalar(self.evaluate(node, key[0], offset))
+            return self.memo[key]
+        return self.values.get(key)
+
+    def scalar(self, value):
+        if isinstance(value, _Ref):
+            if value.r1 == value.r2 and value.c1 == value.c2:
+                return self.cell((value.sheet, value.c1, value.r1))
+            return _Err("#VALUE!")
+        return value
+
+    def evaluate(self, node, sheet, offset):
+        kind = node[0]
+        if kind == "val":
+            return node[1]
+        if kind == "ref":
+            _, ref_sheet, col, row, row_abs = node
+            row = row if row_abs else row + offset
+            ref_sheet = ref_sheet or sheet
+            return _Ref(ref_sheet, col, row, col, row)
+        if kind == "range":
+            a = self.evaluate(node[1], sheet, offset)
+            b = self.evaluate(node[2], sheet, offset)
+            return _Ref(
+                a.sheet, min(a.c1, b.c1), min(a.r1, b.r1), max(a.c2, b.c2), max(a.r2, b.r2)
+            )
+        if kind == "neg":
+            value = _number(self.scalar(self.evaluate(node[1], sheet, offset)))
+            return value if isinstance(value, _Err) else -value
+        if kind == "bin":
+            a = self.scalar(self.evaluate(node[2], sheet, offset))
+            b = self.scalar(self.evaluate(node[3], sheet, offset))
+            return _binary(node[1], a, b)
+        return self.function(node[1], node[2], sheet, offset)
+
+    def function(self, name, args, sheet, offset):
+        def arg(i):
+            return self.scalar(self.evaluate(args[i], sheet, offset))
+
+        if name == "IF":
+            condition = arg(0)
+            if isinstance(condition, _Err):
+                return condition
+            if isinstance(condition, str):
+                return _Err("#VALUE!")
+            if condition:
+                return arg(1)
+            return arg(2) if len(args) > 2 else False
+        if name == "AND":
+            result = True
+            for i in range(len(args)):
+                value = arg(i)
+                if isinstance(value, _Err):
+                    return value
+                result = result and bool(value)
+            return result
+        if name == "ISNUMBER":
+            return _is_num(arg(0))
+        if name == "INDEX":
+            ref = self.evaluate(args[0], sheet, offset)
+            n = arg(1)
+            if isinstance(n, _Err):
+                return n
+            n = int(n)
+            if n == 0:
+                return ref
+            if n > ref.r2 - ref.r1 + 1:
+                return _Err("#REF!")
+            return _Ref(ref.sheet, ref.c1, ref.r1 + n - 1, ref.c1, ref.r1 + n - 1)
+        if name == "XMATCH":
+            target = arg(0)
+            if isinstance(target, _Err):
+                return target
+            ref = self.evaluate(args[1], sheet, offset)
+            cells = [self.cell(key) for key in ref.cells()]
+            positions = range(len(cells))
+            if len(args) > 3 and arg(3) == -1:
+                positions = reversed(positions)
+            for i in positions:
+                if _equal(cells[i], target) and cells[i] is not None:
+                    return i + 1
+            return _Err("#N/A")
+        if name in ("SUM", "COUNT"):
+            total, count = 0.0, 0
+            for i in range(len(args)):
+                value = self.evaluate(args[i], sheet, offset)
+                values = (
+                    [self.cell(key) for key in value.cells()]
+                    if isinstance(value, _Ref)
+                    else [value]
+                )
+                for v in values:
+                    if isinstance(v, _Err):
+                        if name == "SUM":
+                            return v
+                    elif _is_num(v):
+                        total += v
+                        count += 1
+            return total if name == "SUM" else count
+        if name == "MATCH":
+            # Approximate match on ascending data: last value <= target
+            target = arg(0)
+            ref = self.evaluate(args[1], sheet, offset)
+            position = None
+            for i, key in enumerate(ref.cells()):
+                value = self.cell(key)
+                if _is_num(value) and value <= target:
+                    position = i + 1
+            return _Err("#N/A") if position is None else position
+        if name == "ROW":
+            return self.evaluate(args[0], sheet, offset).r1
+        if name == "CEILING":
+            value, significance = _number(arg(0)), _number(arg(1))
+            if isinstance(value, _Err):
+                return value
+            return math.ceil(value / significance) * significance
+        if name == "LEFT":
+            value = arg(0)
+            if isinstance(value, _Err):
+                return value
+            text = "" if value is None else _text(value)
+            return text[: int(arg(1))]
+        raise ValueError(f"Unsupported function {name}")
+
+
+def _is_num(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _text(value):
+    if _is_num(value) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _number(value):
+    if isinstance(value, _Err):
+        return value
+    if value is None:
+        return 0.0
+    if isinstance(value, bool):
+        return float(value)
+    if _is_num(value):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return _Err("#VALUE!")
+
+
+def _equal(a, b):
+    if a is None:
+        a = "" if isinstance(b, str) else 0.0
+    if b is None:
+        b = "" if isinstance(a, str) else 0.0
+    if isinstance(a, str) and isinstance(b, str):
+        return a.lower() == b.lower()
+    if _is_num(a) and _is_num(b):
+        return a == b
+    return False
+
+
+def _binary(op, a, b):
+    for value in (a, b):
+        if isinstance(value, _Err):
+            return value
+    if op == "=":
+        return _equal(a, b)
+    if op == "<>":
+        return not _equal(a, b)
+    if op == "&":
+        return ("" if a is None else _text(a)) + ("" if b is None else _text(b))
+    a, b = _number(a), _number(b)
+    for value in (a, b):
+        if isinstance(value, _Err):
+            return value
+    if op in ("<", ">", "<=", ">="):
+        return {"<": a < b, ">": a > b, "<=": a <= b, ">=": a >= b}[op]
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b
+    if op == "*":
+        return a * b
+    if b == 0:
+        return _Err("#DIV/0!")
+    return a / b
+
+
+SHEET_PARAMS = {"J": 0.25, "K": "Default", "L": 0.02, "M": "Warranty",
+                "N": 0.01, "O": "Freight", "P": 0.03, "Q": "Special", "R": 0.015}  # fmt: skip
+CONFIG_RATES = [["USD", 1.0], ["SGD", 1.35], ["EUR", 0.92], ["JPY", None]]
+
+
+def _sample_rows(seed, count):
+    """Random but realistic system sheet rows, starting at row 3."""
+    rng = random.Random(seed)
+    scopes = [None] * 6 + ["OPTION", "option", "INCLUDED", "WAIVED", "TBA"]
+    currencies = ["USD", "USD", "SGD", "EUR", "usd", "JPY", "XXX", None]
+    rows = [{"C": "CCTV SYSTEM"}]
+    number = 10
+    for _ in range(count):
+        kind = rng.choice(
+            ["title", "lump", "line", "line", "line", "line", "desc", "blank",
+             "comment", "sub", "bad"]
+        )  # fmt: skip
+        row = {}
+        if kind in ("title", "lump", "sub"):
+            row["A"] = number if kind != "sub" else "⠠1"
+            number += 10
+            row["C"] = f"Title {number}"
+            if kind == "lump":
+                row["D"] = float(rng.randint(1, 3))
+                row["E"] = "lot"
+            row["H"] = rng.choice(scopes)
+        elif kind in ("line", "bad"):
+            row["C"] = f"Item {rng.randint(1, 999)}"
+            row["D"] = float(rng.randint(1, 20)) if kind == "line" else "lot"
+            row["E"] = "ea"
+            row["H"] = rng.choice(scopes)
+            row["J"] = rng.choice(currencies)
+            row["K"] = round(rng.uniform(1, 5000), 2) if rng.random() > 0.05 else "TBA"
+            if rng.random() < 0.5:
+                row["M"] = rng.choice([0.1, 0.05, 0.2])
+            if rng.random() < 0.15:
+                row["AB"] = float(rng.randint(100, 9000))
+        elif kind == "desc":
+            row["C"] = "Description text"
+        elif kind == "comment":
+            row["C"] = "*** Note"
+        rows.append(row)
+    return rows
+
+
+def _build(rows, group_keys=False):
+    """
+    Return (raw values for the engine, evaluator book) for the given rows,
+    with the formulas of fill_formula(group_keys=group_keys).
+    """
+    import pricing
+
+    width = _col("AW") + 1
+    values = [[None] * width for _ in range(len(rows) + 4)]
+    for letter, value in SHEET_PARAMS.items():
+        values[0][_col(letter)] = value
+    values[1][_col("B")] = "SN"
+    values[1][_col("C")] = "Description"
+    values[1][_col("AL")] = "Format"
+    for i, row in enumerate(rows):
+        for letter, value in row.items():
+            values[i + 2][_col(letter)] = value
+
+    last_row = max(r for r, row in enumerate(values, 1) if row[_col("C")] is not None) + 1
+    book = _Book()
+    for r, row in enumerate(values, 1):
+        for c, value in enumerate(row):
+            book.values[("S", c, r)] = value
+    for r, (currency, rate) in enumerate(CONFIG_RATES, 2):
+        book.values[("Config", 0, r)] = currency
+        book.values[("Config", 1, r)] = rate
+    book.values[("Config", 1, 12)] = "SGD"
+    book.values[("S", _col("AL"), 1)] = "Title"
+    book.values[("S", _col("AL"), 3)] = "System"
+    book.values[("S", _col("AL"), last_row + 1)] = "Title"
+    formulas = dict(FORMULAS)
+    if group_keys:
+        formulas = {
+            letter: pricing.group_formula(formula, last_row)
+            for letter, formula in FORMULAS.items()
+        }
+        formulas[pricing.GROUP_COLUMN] = pricing.GROUP_KEY_FORMULA
+    for r in range(3, last_row + 1):
+        for letter, formula in formulas.items():
+            if letter == "A1" or (letter == "AL" and r == 3):
+                continue
+            origin = 4 if letter == "AL" else 3
+            book.set_formula("S", _col(letter), r, formula, origin)
+    return values, book, last_row
+
+
+class TestPricingEngine(unittest.TestCase):
+    """pricing.price_sheet must match the FORMULAS cell for cell."""
+
+    def assert_parity(self, rows, group_keys=False):
+        import numpy as np
+        import pricing
+
+        values, book, last_row = _build(rows, group_keys)
+        priced = pricing.price_sheet(
+            values, pricing.read_rates(CONFIG_RATES), "SGD"
+        )
+        self.assertEqual(list(priced.index), list(range(3, last_row + 1)))
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 20000))
+        try:
+            for r in priced.index:
+                for letter in ("AL", "B"):
+                    book.cell(("S", _col(letter), r))
+            for r in priced.index:
+                for letter in pricing.PRICING_COLUMNS:
+                    expected = book.cell(("S", _col(letter), r))
+                    actual = priced.at[r, letter]
+                    where = f"{letter}{r}: expected {expected!r}, got {actual!r}"
+                    if letter in pricing.TEXT_COLUMNS:
+                        self.assertEqual(actual, expected if isinstance(expected, str) else "", where)
+                    elif _is_num(expected):
+                        self.assertTrue(math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9), where)
+                    else:
+                        self.assertTrue(np.isnan(actual), where)
+        finally:
+            sys.setrecursionlimit(limit)
+
+    def test_worked_example(self):
+        rows = [
+            {"C": "FIRE ALARM SYSTEM"},
+            {"A": 10, "C": "Control panel", "H": "OPTION"},
+            {"C": "Panel", "D": 2.0, "E": "ea", "J": "USD", "K": 1000.0, "M": 0.1},
+            {"C": "Battery", "D": 4.0, "E": "ea", "J": "EUR", "K": 50.0, "AB": 120.0},
+            {},
+            {"A": 20, "C": "Detectors", "D": 1.0, "E": "lot"},
+            {"C": "Smoke", "D": 10.0, "E": "ea", "H": "INCLUDED", "J": "SGD", "K": 30.0},
+            {"C": "Heat", "D": 5.0, "E": "ea", "H": "waived", "J": "SGD", "K": 40.0},
+            {"C": "   • spare", "D": None},
+            {"A": 30, "C": "Cabling"},
+            {"C": "Cable", "D": 100.0, "E": "m", "J": "SGD", "K": 2.5},
+            {"C": "*** Supplied by others"},
+        ]
+        self.assert_parity(rows)
+
+    def test_adjacent_lumpsum_titles(self):
+        """A lumpsum Title followed directly by a Title sums everything below."""
+        rows = [
+            {"C": "SYSTEM"},
+            {"A": 10, "C": "Lumpsum", "D": 1.0, "E": "lot"},
+            {"A": 20, "C": "Next"},
+            {"C": "Item", "D": 3.0, "E": "ea", "J": "USD", "K": 10.0},
+        ]
+        self.assert_parity(rows)
+
+    def test_random_sheets(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                self.assert_parity(_sample_rows(seed, 120)[1:])
+
+    def test_group_key_formulas(self):
+        """fill_formula(group_keys=True) calculates the same numbers."""
+        import pricing
+
+        for letter in ("B", "S", "U", "AD", "AF", "AK", "AJ", "AP", "AR", "AT"):
+            self.assertNotIn("XMATCH", pricing.group_formula(FORMULAS[letter], 100))
+        rows = [
+            {"C": "SYSTEM"},
+            {"A": 10, "C": "Lumpsum", "D": 1.0, "E": "lot"},
+            {"A": 20, "C": "Next", "D": 2.0, "E": "lot", "H": "OPTION"},
+            {"C": "Item", "D": 3.0, "E": "ea", "J": "USD", "K": 10.0},
+        ]
+        self.assert_parity(rows, group_keys=True)
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.assert_parity(_sample_rows(seed, 120)[1:], group_keys=True)
+
+    def test_sheet_totals(self):
+        import pricing
+
+        values, _, _ = _build(_sample_rows(7, 80)[1:])
+        priced = pricing.price_sheet(values, pricing.read_rates(CONFIG_RATES), "SGD")
+        totals = pricing.sheet_totals(priced)
+        self.assertAlmostEqual(totals["G"], priced["G"].sum())
+        self.assertAlmostEqual(totals["AW"], totals["AV"] / totals["AU"])
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
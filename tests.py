@@ -10,6 +10,7 @@ Tests cover:
 These tests don't require Excel - they test the pure Python/pandas logic.
 """
 
+import os
 import unittest
 import pandas as pd
 import re
@@ -33,6 +34,7 @@ from functions import (
     _find_workbook_in_rfqs,
     sanitize_config_string,
     sanitize_config_date,
+    changed_runs,
 )
 from datetime import datetime
 
@@ -62,6 +64,131 @@ class TestSetNittyGritty(unittest.TestCase):
         self.assertEqual(set_nitty_gritty("normal text"), "normal text")
 
 
+class TestNormalizer(unittest.TestCase):
+    """The rule tables of normalize.py against the replacements they replaced."""
+
+    @staticmethod
+    def legacy_comma_space(text):
+        x = re.compile(r"\w+\s,")
+        if x.search(text):
+            for word in re.findall(r"\w+\s,", text):
+                text = re.sub(word, word[:-2] + ",", text)
+        x = re.compile(r",\d?\w+")
+        if x.search(text):
+            for word in re.findall(r"(?<![0-9]),\w+", text):
+                text = re.sub(word, ", " + word[1:], text)
+        return text
+
+    @staticmethod
+    def legacy_x(text):
+        steps = [
+            (r"\d+x(?!-)|\d+X(?!-)", r"(\d+x|\d+X)", lambda w: w[:-1] + " x"),
+            (r"(x\d+|X\d+)", r"(x\d+|X\d+)", lambda w: "x " + w[1:]),
+            (r"(\d+ X)", r"(\d+ X)", lambda w: w[:-1] + "x"),
+            (r"(X \d+)", r"(X \d+)", lambda w: "x" + w[1:]),
+        ]
+        for search, find, replace in steps:
+            if re.search(search, text):
+                for word in re.findall(find, text):
+                    text = re.sub(word, replace(word), text)
+        return text
+
+    @classmethod
+    def legacy_nitty_gritty(cls, text):
+        text = text.strip()
+        text = re.sub(" {2,}", " ", text)
+        text = re.sub("^(-|~)", "•", text)
+        text = re.sub(r"^[*?]\s", " • ", text)
+        text = re.sub(";$", ":", text)
+        return cls.legacy_x(cls.legacy_comma_space(text))
+
+    def corpus(self, count, seed=0):
+        import random
+
+        rng = random.Random(seed)
+        pieces = list("ab xX0129,, ;-~*?•_\t٣.") + [
+            "  ", "x-", "1,200", "20x", "X 3", ", ", " ,", "\n", "mm)", "Cat6",
+        ]  # fmt: skip
+        return [
+            "".join(rng.choice(pieces) for _ in range(rng.randint(0, 14)))
+            for _ in range(count)
+        ]
+
+    def test_fuzz_matches_legacy_replacements(self):
+        for text in self.corpus(20000):
+            self.assertEqual(set_comma_space(text), self.legacy_comma_space(text), text)
+            self.assertEqual(set_x(text), self.legacy_x(text), text)
+            self.assertEqual(set_nitty_gritty(text), self.legacy_nitty_gritty(text), text)
+
+    def test_digit_comma(self):
+        # Words after a comma are fixed wherever they appear, even after 1,
+        self.assertEqual(set_comma_space("1,200 and a,b"), "1,200 and a, b")
+        self.assertEqual(set_comma_space("1,abc x,ab"), "1, abc x, ab")
+        self.assertEqual(set_comma_space("1,ab x,abc"), "1,ab x, abc")
+
+    def test_series_matches_single_texts(self):
+        import normalize
+
+        texts = self.corpus(2000, seed=1) * 2
+        result = normalize.nitty_gritty_series(pd.Series(texts, index=range(5, 4005)))
+        self.assertEqual(list(result.index), list(range(5, 4005)))
+        self.assertEqual(result.tolist(), [set_nitty_gritty(t) for t in texts])
+
+
+class TestTextCache(unittest.TestCase):
+    """Tests for the LRU caches of the text helpers in normalize.py."""
+
+    def test_hits_misses_and_bound(self):
+        from normalize import TextCache
+
+        cache = TextCache(str.upper, maxsize=2)
+        self.assertEqual([cache(t) for t in ["a", "b", "a", "c"]], ["A", "B", "A", "C"])
+        self.assertEqual(cache.stats(),
+                         {"hits": 1, "misses": 3, "hit_rate": 0.25, "size": 2})  # fmt: skip
+        # "b" was the least recently used
+        self.assertEqual(list(cache.entries), [("a",), ("c",)])
+        cache.clear()
+        self.assertEqual(cache.stats()["hit_rate"], None)
+
+    def test_keyword_arguments_are_part_of_the_key(self):
+        import normalize
+
+        cache = normalize.CACHES["functions.set_case_preserve_acronym"]
+        cache.clear()
+        self.assertEqual(set_case_preserve_acronym("ip camera", upper=True), "IP CAMERA")
+        self.assertEqual(set_case_preserve_acronym("ip camera", title=True), "ip Camera")
+        self.assertEqual(set_case_preserve_acronym("ip camera", title=True), "ip Camera")
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_save_and_load(self):
+        import normalize
+
+        cache = normalize.CACHES["functions.set_case_preserve_acronym"]
+        set_case_preserve_acronym("cctv system", title=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "text_cache.json"
+            normalize.save(path)
+            saved = dict(cache.entries)
+            cache.entries.clear()
+            normalize._loaded = False
+            try:
+                normalize.load(path)
+                self.assertEqual(dict(cache.entries), saved)
+                self.assertIn(("cctv system", ("title", True)), cache.entries)
+
+                # Entries of another version of the code are not loaded
+                data = normalize.json.loads(path.read_text(encoding="utf-8"))
+                for entry in data.values():
+                    entry["version"] = "old"
+                path.write_text(normalize.json.dumps(data), encoding="utf-8")
+                cache.entries.clear()
+                normalize._loaded = False
+                normalize.load(path)
+                self.assertEqual(len(cache.entries), 0)
+            finally:
+                cache.entries.update(saved)
+
+
 class TestSetCommaSpace(unittest.TestCase):
     """Tests for set_comma_space function."""
 
@@ -554,6 +681,266 @@ class TestFindWorkbookInRfqs(unittest.TestCase):
         result = _find_workbook_in_rfqs("file.xlsx", self.base_path)
         self.assertEqual(result, self.base_path / "2026/a/b/c/d")
 
+    def test_prefers_recent_year_at_same_depth(self):
+        """Should use the most recent year when matches are equally deep."""
+        self._create_structure(
+            "2025/Old/01-Commercial/copy.xlsx",
+            "2026/New/01-Commercial/copy.xlsx",
+            "2024/Older/copy.xlsx",  # shallower than both
+        )
+        result = _find_workbook_in_rfqs("copy.xlsx", self.base_path)
+        self.assertEqual(result, self.base_path / "2024/Older")
+        (self.base_path / "2024/Older/copy.xlsx").unlink()
+        result = _find_workbook_in_rfqs("copy.xlsx", self.base_path)
+        self.assertEqual(result, self.base_path / "2026/New/01-Commercial")
+
+    def test_skips_symlinked_folders(self):
+        """Should not follow symbolic links to folders."""
+        self._create_structure("2026/Project/x.txt", "elsewhere/linked.xlsx")
+        try:
+            (self.base_path / "2026/Project/link").symlink_to(
+                self.base_path / "elsewhere", target_is_directory=True
+            )
+        except OSError:
+            self.skipTest("symbolic links not available")
+        self.assertIsNone(_find_workbook_in_rfqs("linked.xlsx", self.base_path))
+
+
+class TestRfqIndex(unittest.TestCase):
+    """Tests for the persistent @rfqs index in rfq_index.py."""
+
+    def setUp(self):
+        from rfq_index import RfqIndex
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base_path = Path(self.temp_dir.name) / "@rfqs"
+        self.index = RfqIndex(self.base_path, Path(self.temp_dir.name) / "index.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _create(self, *paths):
+        for path in paths:
+            full_path = self.base_path / path
+            full_path.parent.mkdir(parents=True, exist_ok=True)
+            full_path.touch()
+
+    def test_same_results_as_walk(self):
+        self._create(
+            "2026/ProjectABC/test.xlsx",
+            "2026/ProjectABC/01-Commercial/test.xlsx",
+            "2025/Old/01-Commercial/JEC-2025-001.xlsx",
+            "2026/a/b/c/d/file.xlsx",
+            "2026/a/b/c/d/e/deep.xlsx",
+        )
+        names = ["test.xlsx", "jec-2025-001.XLSX", "file.xlsx", "deep.xlsx", "x.xlsx"]
+        for name in names:
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.index.find(name), _find_workbook_in_rfqs(name, self.base_path)
+                )
+
+    def test_refresh_only_lists_changed_folders(self):
+        self._create("2026/P1/01-Commercial/a.xlsx", "2026/P2/01-Commercial/b.xlsx")
+        self.assertEqual(self.index.refresh(), 5)
+        self.assertEqual(self.index.refresh(), 0)
+
+        self._create("2026/P2/01-Commercial/c.xlsx")
+        self.assertEqual(
+            self.index.find("c.xlsx"), self.base_path / "2026/P2/01-Commercial"
+        )
+        self.assertEqual(self.index.listed, 1)
+
+    def test_refresh_walks_levels_in_parallel(self):
+        from unittest import mock
+
+        import rfq_index
+
+        self._create("2026/P1/a.xlsx", "2025/P2/b.xlsx")
+        with mock.patch.object(
+            rfq_index, "walk_levels", wraps=rfq_index.walk_levels
+        ) as walk:
+            self.assertEqual(self.index.refresh(), 4)
+        walk.assert_called_once()
+
+    def test_moved_and_deleted_workbooks(self):
+        self._create("2026/P1/a.xlsx")
+        self.assertEqual(self.index.find("a.xlsx"), self.base_path / "2026/P1")
+        (self.base_path / "2026/P2").mkdir()
+        (self.base_path / "2026/P1/a.xlsx").rename(self.base_path / "2026/P2/a.xlsx")
+        self.assertEqual(self.index.find("a.xlsx"), self.base_path / "2026/P2")
+
+        import shutil
+
+        shutil.rmtree(self.base_path / "2026/P2")
+        self.assertIsNone(self.index.find("a.xlsx"))
+
+
+class TestTemplateCache(unittest.TestCase):
+    """Tests for template_cache.py against a local stand-in server."""
+
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        from template_cache import TemplateCache
+
+        self.files = {"/Template.xlsx": b"template v1", "/Bid/logo.png": b"logo"}
+        self.requests = []
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = test.files.get(self.path)
+                etag = f'"{hash(body)}"'
+                test.requests.append((self.path, self.headers.get("If-None-Match")))
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                elif self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.cache = TemplateCache(Path(self.temp_dir.name), base_url)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_downloads_once_then_reads_the_cache(self):
+        path = self.cache.path("Template.xlsx")
+        self.assertEqual(path.read_bytes(), b"template v1")
+        self.assertEqual(self.cache.path("Template.xlsx"), path)
+        self.assertEqual(self.cache.path("Bid/logo.png").name, "logo.png")
+        self.assertEqual([p for p, _ in self.requests], ["/Template.xlsx", "/Bid/logo.png"])
+        self.assertIsNone(self.cache.thread)
+
+    def test_refresh_downloads_changed_files_only(self):
+        self.cache.path("Template.xlsx")
+        self.cache.path("Bid/logo.png")
+        self.files["/Template.xlsx"] = b"template v2"
+        self.assertEqual(self.cache.refresh(), ["Template.xlsx"])
+        self.assertEqual(self.cache.file("Template.xlsx").read_bytes(), b"template v2")
+        # Conditional requests: the logo was not sent again
+        self.assertTrue(all(etag for _, etag in self.requests[2:]))
+        self.assertEqual(self.cache.refresh(), [])
+
+    def test_stale_copy_is_returned_and_refreshed_in_background(self):
+        self.cache.path("Template.xlsx")
+        self.cache.max_age = 0
+        self.files["/Template.xlsx"] = b"template v2"
+        path = self.cache.path("Template.xlsx")
+        self.cache.thread.join(5)
+        self.assertEqual(path.read_bytes(), b"template v2")
+        self.assertEqual(self.cache.manifest()["Template.xlsx"]["version"],
+                         f'"{hash(b"template v2")}"')  # fmt: skip
+
+    def test_damaged_copy_is_downloaded_again(self):
+        path = self.cache.path("Template.xlsx")
+        path.write_bytes(b"temp")
+        self.assertEqual(self.cache.path("Template.xlsx").read_bytes(), b"template v1")
+        self.assertEqual(len(self.requests), 2)
+
+    def test_missing_file_raises(self):
+        import requests
+
+        with self.assertRaises(requests.HTTPError):
+            self.cache.path("Missing.xlsx")
+
+
+class TestCleanLegacySystems(unittest.TestCase):
+    """clean_legacy_systems against the row by row cleaning it replaced."""
+
+    @staticmethod
+    def clean_by_row(systems):
+        import numpy as np
+
+        systems = systems.reset_index(drop=True)
+        for idx in systems.index:
+            if str(systems.loc[idx, "NO"]).count(".") == 2:
+                systems.loc[idx, "NO"] = np.nan
+        for idx in systems.index:
+            if pd.notna(systems.loc[idx, "NO"]) and not pd.notna(systems.loc[idx, "Qty"]):
+                systems.loc[idx, "NO"] = np.nan
+        systems["Format"] = pd.Series(np.nan, index=systems.index, dtype=object)
+        item_count = 10
+        for idx in systems.index:
+            if pd.notna(systems.loc[idx, "NO"]):
+                systems.at[idx, "NO"] = item_count
+                systems.at[idx, "Format"] = "Title"
+                item_count += 10
+        systems["Scope"] = systems["Scope"].astype(object)
+        for idx in systems.index:
+            if str(systems.loc[idx, "Subtotal Price"]).lower() in ["option", "optional"]:
+                systems.at[idx, "Scope"] = "OPTION"
+            if str(systems.loc[idx, "Subtotal Price"]).lower() in ["included", "inclusive"]:
+                systems.at[idx, "Scope"] = "INCLUDED"
+        for idx in systems.index:
+            model = str(systems.loc[idx, "Model"]).lower().strip()
+            if model in ("start line:  delete forbidden", "true", "false"):
+                systems.at[idx, "Model"] = np.nan
+            for column in ("UC", "SC"):
+                if str(systems.loc[idx, column]).lower().strip() in ("true", "false"):
+                    systems.at[idx, column] = np.nan
+        return systems
+
+    def legacy_systems(self, rows, seed=0):
+        import random
+
+        rng = random.Random(seed)
+        data = []
+        for _ in range(rows):
+            data.append({
+                "NO": rng.choice([None, 1.0, 2, "1.1.1", "2.3", "A", "3.1.2"]),
+                "Qty": rng.choice([None, 1, 4.0, "lot"]),
+                "Subtotal Price": rng.choice([None, 100.0, "Option", "OPTIONAL", "Included", "inclusive", "TBA"]),
+                "Scope": None,
+                "Model": rng.choice([None, "AXIS P3245", True, "FALSE ", "Start line:  delete forbidden"]),
+                "UC": rng.choice([None, 12.5, True, False, "true"]),
+                "SC": rng.choice([None, 20, False, " TRUE"]),
+            })  # fmt: skip
+        # Index of concatenated sheets: repeats
+        return pd.DataFrame(data, index=[i % 7 for i in range(rows)])
+
+    def test_matches_row_by_row_cleaning(self):
+        from functions import clean_legacy_systems
+
+        for seed in range(5):
+            systems = self.legacy_systems(200, seed)
+            expected = self.clean_by_row(systems.copy())
+            result = clean_legacy_systems(systems.copy())
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    def test_titles_are_numbered_by_ten(self):
+        from functions import clean_legacy_systems
+
+        systems = pd.DataFrame({
+            "NO": [1, "1.1.1", 2, 3], "Qty": [1, 2, None, 1],
+            "Subtotal Price": [None] * 4, "Scope": [None] * 4,
+            "Model": [None] * 4, "UC": [None] * 4, "SC": [None] * 4,
+        })  # fmt: skip
+        result = clean_legacy_systems(systems)
+        self.assertEqual(result["NO"].tolist()[0], 10)
+        self.assertEqual(result["NO"].tolist()[3], 20)
+        self.assertTrue(result["NO"][1:3].isna().all())
+        self.assertEqual(result["Format"].tolist()[::3], ["Title", "Title"])
+
 
 class TestSanitizeConfigString(unittest.TestCase):
     """Tests for sanitize_config_string function."""
@@ -605,6 +992,839 @@ class TestSanitizeConfigDate(unittest.TestCase):
         self.assertEqual(sanitize_config_date(12345), 12345)
 
 
+class OfflineWorkbookTestCase(unittest.TestCase):
+    """Base class: a small proposal workbook opened with the offline backend."""
+
+    def setUp(self):
+        import openpyxl
+        import offline
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "proposal.xlsx"
+        xl = openpyxl.Workbook()
+        config = xl.active
+        config.title = "Config"
+        for row, (currency, rate) in enumerate([("USD", 1.0), ("SGD", 1.35)], 2):
+            config.cell(row, 1, currency)
+            config.cell(row, 2, rate)
+        config["B12"] = "SGD"
+        config["B16"] = "Double"
+        xl.create_sheet("Cover")
+        xl.create_sheet("Summary")
+        ws = xl.create_sheet("CCTV")
+        for col, value in {"J": 0.25, "L": 0.02, "N": 0.01, "P": 0.03, "R": 0}.items():
+            ws[f"{col}1"] = value
+        headers = {"A": "NO", "B": "SN", "C": "Description", "D": "Qty", "E": "Unit",
+                   "H": "Scope", "J": "Currency", "K": "UC", "AL": "Format"}  # fmt: skip
+        for col in range(1, 50):
+            ws.cell(2, col, f"H{col}")
+        for col, value in headers.items():
+            ws[f"{col}2"] = value
+        rows = [
+            ("cctv system", None, None, None, None, None),
+            (1, "cameras", None, None, None, None),
+            (None, "Dome camera", 4, "nos", "USD", 500),
+            (None, "- bracket", None, None, None, None),
+            (None, None, None, None, None, None),
+            (None, None, None, None, None, None),
+            (None, None, None, None, None, None),
+            (5, "Recorder", 1, "lot", None, None),
+            (None, "NVR", 1, "ea", "SGD", 1200),
+        ]
+        for row, (no, desc, qty, unit, currency, cost) in enumerate(rows, 3):
+            if row == 3:
+                ws["C3"] = no
+                continue
+            for col, value in zip("ACDEJK", (no, desc, qty, unit, currency, cost)):
+                ws[f"{col}{row}"] = value
+        xl.save(self.path)
+        self.app, self.wb = offline.open_workbook(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+class TestOfflineRange(OfflineWorkbookTestCase):
+    """Tests for the xlwings Range subset in offline.py."""
+
+    def test_values_are_read_like_xlwings(self):
+        ws = self.wb.sheets["CCTV"]
+        self.assertEqual(ws.range("D5").value, 4.0)
+        self.assertIsInstance(ws.range("D5").value, float)
+        self.assertEqual(ws.range("C5:D5").value, ["Dome camera", 4.0])
+        self.assertEqual(ws.range("D4:D5").value, [None, 4.0])
+        self.assertEqual(ws.range("C4:D5").value, [["cameras", None], ["Dome camera", 4.0]])
+
+    def test_end_up(self):
+        ws = self.wb.sheets["CCTV"]
+        self.assertEqual(ws.range("C1500").end("up").row, 11)
+        self.assertEqual(ws.range("C6").end("up").row, 2)
+        self.assertEqual(ws.range("C8").end("up").row, 6)
+        self.assertEqual(ws.range("K1500").end("up").row, 11)
+
+    def test_dataframe_read_and_series_write(self):
+        ws = self.wb.sheets["CCTV"]
+        data = ws.range("A2:C11").options(pd.DataFrame, index=False).value
+        self.assertEqual(list(data.columns), ["NO", "SN", "Description"])
+        self.assertEqual(len(data), 9)
+        ws.range("E2").options(index=False).value = pd.Series(["x"] * 3, name="Unit")
+        self.assertEqual(ws.range("E2:E5").value, ["Unit", "x", "x", "x"])
+
+    def test_formula_fill_adjusts_relative_references(self):
+        ws = self.wb.sheets["CCTV"]
+        ws.range("N3:O5").formula = [['=IF(K3<>"",K3*(1-M3),"")', "=D3*N3+$J$1"]]
+        self.assertEqual(ws.range("N5").formula, '=IF(K5<>"",K5*(1-M5),"")')
+        self.assertEqual(ws.range("O4").formula, "=D4*N4+$J$1")
+
+    def test_future_functions_are_stored_with_prefix(self):
+        ws = self.wb.sheets["CCTV"]
+        ws.range("B3").formula = '=XMATCH("Title", $AL$1:AL2, 0, -1)'
+        self.assertEqual(ws._ws["B3"].value, '=_xlfn.XMATCH("Title", $AL$1:AL2, 0, -1)')
+        self.assertEqual(ws.range("B3").formula, '=XMATCH("Title", $AL$1:AL2, 0, -1)')
+
+    def test_delete_rows_moves_cells_up(self):
+        ws = self.wb.sheets["CCTV"]
+        ws.range("8:9").delete(shift="up")
+        self.assertEqual(ws.range("C9").value, "NVR")
+        self.assertEqual(ws.range("C1500").end("up").row, 9)
+
+    def test_shift_formula(self):
+        from offline import shift_formula
+
+        self.assertEqual(shift_formula("=A1+$B$2+C$3", 2, 1), "=B3+$B$2+D$3")
+        self.assertEqual(shift_formula("='AB12'!A1&\"C3\"", 1), "='AB12'!A2&\"C3\"")
+        self.assertEqual(shift_formula("=LOG10(A1)", 1), "=LOG10(A2)")
+
+
+class TestWorkbookSnapshot(OfflineWorkbookTestCase):
+    """Tests for the shared sheet snapshot in snapshot.py."""
+
+    def run_fix(self, wb, snapshot=None):
+        import functions
+
+        functions.delete_extra_empty_row_wb(wb, snapshot=snapshot)
+        functions.number_title(wb, count=10, step=10, snapshot=snapshot)
+        functions.fill_formula_wb(wb, snapshot=snapshot)
+        functions.format_text(
+            wb, indent_description=True, bullet_description=True, snapshot=snapshot
+        )
+        wb.app.calculate()
+        return wb.sheets["CCTV"].range("A1:AL12").options(ndim=2).value
+
+    def test_table_matches_range_read(self):
+        import pandas as pd
+        from snapshot import WorkbookSnapshot
+
+        snapshot = WorkbookSnapshot(self.wb)
+        ws = self.wb.sheets["CCTV"]
+        self.assertEqual(snapshot.system_names, ["CCTV"])
+        self.assertEqual(snapshot.last_row("CCTV", "C"), 11)
+        for first, last, empty in [("A", "C", None), ("C", "AL", "")]:
+            expected = (
+                ws.range(f"{first}2:{last}11")
+                .options(pd.DataFrame, index=False, empty=empty)
+                .value
+            )
+            pd.testing.assert_frame_equal(
+                snapshot.table("cctv", first, last, empty=empty), expected
+            )
+        self.assertEqual(snapshot.reads, 4)
+
+    def test_writes_through_snapshot_patch_the_cache(self):
+        from snapshot import WorkbookSnapshot
+
+        snapshot = WorkbookSnapshot(self.wb)
+        snapshot.table("CCTV", "A", "C")
+        snapshot.write("CCTV", "E4", [["ea"], ["ea"]])
+        snapshot.write("CCTV", "C12", "Spare")
+        self.assertEqual(snapshot.table("CCTV", "A", "A")["NO"][1], 1)
+        self.assertEqual(snapshot.rows("CCTV", "E", "E", 4, 5), [["ea"], ["ea"]])
+        self.assertEqual(snapshot.last_row("CCTV", "C"), 12)
+        self.assertEqual(snapshot.reads, 4)
+        # Only the stale formula cells asked for are read again
+        self.wb.sheets["CCTV"].range("G5").value = 7
+        self.assertEqual(snapshot.rows("CCTV", "E", "G", 5, 5), [["ea", None, 7]])
+        self.assertEqual(snapshot.reads, 5)
+
+    def test_fix_matches_without_snapshot(self):
+        import offline
+        from snapshot import WorkbookSnapshot
+
+        app, wb = offline.open_workbook(self.path)
+        expected = self.run_fix(wb)
+        snapshot = WorkbookSnapshot(self.wb)
+        self.assertEqual(self.run_fix(self.wb, snapshot), expected)
+        # One block read (with the used range and the C and G probes), then
+        # only the formula columns: B after the delete, F:AL after fill
+        self.assertEqual(snapshot.reads, 6)
+
+
+class TestLongSheets(OfflineWorkbookTestCase):
+    """Sheets longer than the former 1500-row ceiling."""
+
+    def test_get_last_row_beyond_1500(self):
+        from functions import get_last_row
+
+        ws = self.wb.sheets["CCTV"]
+        self.assertEqual(get_last_row(ws), 11)
+        ws.range("C2000").value = "Spare"
+        ws.range("G1800").value = 1
+        self.assertEqual(get_last_row(ws), 2000)
+        self.assertEqual(get_last_row(ws, "G"), 1800)
+        self.assertEqual(get_last_row(ws, "BA"), 1)
+
+    def test_lumpsum_covers_long_groups(self):
+        import functions
+
+        ws = self.wb.sheets["CCTV"]
+        # Recorder (row 10) is a lumpsum title; give it 1600 more items
+        items = [["Disk", 1, "ea", None, None, None, None, "USD", 10]] * 1600
+        ws.range("C12:K1611").value = items
+        functions.fill_formula_wb(self.wb)
+        self.app.calculate()
+
+        self.assertIn("AI4:AI1613", ws.range("AJ3").formula)
+        self.assertEqual(ws.range("AL1613").value, "Title")
+        ai = ws.range("AI11:AI1611").options(ndim=1).value
+        self.assertAlmostEqual(ws.range("AJ10").value, sum(ai))
+
+    def test_group_key_formulas(self):
+        import functions
+
+        ws = self.wb.sheets["CCTV"]
+        ws.range("AX2").value = "Key"
+        functions.hide_columns(ws)
+        self.assertNotEqual(ws.range("AX1").column_width, 0)
+        functions.fill_formula_wb(self.wb, group_keys=True)
+        functions.hide_columns(ws)
+        self.assertEqual(ws.range("AX1").column_width, 0)
+        # Row 3 seeds the keys, the header row is left alone
+        self.assertEqual(ws.range("AX2").value, "Key")
+        self.assertEqual(
+            ws.range("AX5").formula, '=IF(AL5="Title", ROW(AL5), IF(ROW(AL5)=3, 1, AX4))'
+        )
+        for column in ("B", "S", "AJ", "AT"):
+            formula = ws.range(f"{column}4").formula
+            self.assertNotIn("XMATCH", formula)
+            self.assertIn("AX", formula)
+        # Lookups that are not group searches are left as they are
+        self.assertIn("XMATCH(J4, Config!$A$2", ws.range("Q4").formula)
+
+
+class TestChangedRuns(unittest.TestCase):
+    """Tests for changed_runs() used by the diff write-back."""
+
+    def test_unchanged_column_has_no_runs(self):
+        self.assertEqual(changed_runs([10.0, None, "ea"], [10, "", "ea"]), [])
+        self.assertEqual(changed_runs([float("nan"), ""], [None, float("nan")]), [])
+
+    def test_adjacent_changes_merge(self):
+        old = ["a", "b", "c", "d", "e"]
+        new = ["a", "B", "C", "d", "E"]
+        self.assertEqual(changed_runs(old, new), [(1, 3), (4, 5)])
+
+    def test_type_changes_are_changes(self):
+        self.assertEqual(changed_runs([10.0, "x"], ["10", None]), [(0, 2)])
+        self.assertEqual(changed_runs([], ["a"]), [(0, 1)])
+
+
+class TestDiffWriteBack(OfflineWorkbookTestCase):
+    """format_text and number_title only write cells that change."""
+
+    def test_second_run_writes_nothing(self):
+        from unittest import mock
+
+        import functions
+        import offline
+
+        functions.number_title(self.wb)
+        functions.fill_formula_wb(self.wb)
+        functions.format_text(self.wb, indent_description=True, bullet_description=True)
+        ws = self.wb.sheets["CCTV"]
+        self.assertEqual(ws.range("E5").value, "ea")
+        self.assertEqual(ws.range("C6").value, "   • bracket")
+
+        with mock.patch.object(
+            offline.Sheet, "_write", autospec=True, side_effect=offline.Sheet._write
+        ) as write:
+            functions.number_title(self.wb)
+            functions.format_text(
+                self.wb, indent_description=True, bullet_description=True
+            )
+        write.assert_not_called()
+
+    def test_system_sheets_are_read_once_in_order(self):
+        import openpyxl
+
+        import functions
+        import offline
+
+        xl = openpyxl.load_workbook(self.path)
+        ws = xl.copy_worksheet(xl["CCTV"])
+        ws.title = "PA"
+        ws["C4"] = "speakers"
+        ws.delete_rows(6, 7)
+        xl.save(self.path)
+        _, wb = offline.open_workbook(self.path)
+
+        systems, rows = functions.read_system_sheets(wb, "A", "C")
+        self.assertEqual(list(rows), ["CCTV", "PA"])
+        self.assertEqual(rows["PA"].tolist(), [9, 10, 11])
+        self.assertEqual(systems["System"].cat.categories.tolist(), ["CCTV", "PA"])
+        self.assertEqual(systems["Description"].iloc[rows["PA"]].tolist(),
+                         ["cctv system", "speakers", "Dome camera"])  # fmt: skip
+
+        # Numbering continues on the next sheet
+        functions.number_title(wb)
+        self.assertEqual(wb.sheets["CCTV"].range("A10").value, 20)
+        self.assertEqual(wb.sheets["PA"].range("A4").value, 30)
+
+    def test_indent_description_writes_changed_cells(self):
+        import functions
+
+        functions.fill_formula_wb(self.wb)
+        ws = self.wb.sheets["CCTV"]
+        ws.range("C6").value = "  # bracket"
+        self.assertEqual(ws.range("AL6").value, "Description")
+        self.assertEqual(functions.indent_description(self.wb), 1)
+        self.assertEqual(ws.range("C6").value, "      ‣ bracket")
+        self.assertEqual(ws.range("C5").value, "Dome camera")
+        self.assertEqual(functions.indent_description(self.wb), 0)
+
+        # Same text as the indent of format_text
+        functions.format_text(self.wb, indent_description=True, bullet_description=True)
+        self.assertEqual(ws.range("C6").value, "      ‣ bracket")
+
+    def test_only_changed_runs_are_written(self):
+        import functions
+
+        ws = self.wb.sheets["CCTV"]
+        old = ws.range("E4:E11").options(ndim=1).value
+        new = list(old)
+        new[1] = "ea"  # E5: "nos"
+        new[7] = None  # E11: "ea"
+        self.assertEqual(functions.write_changes(ws, "E", 4, old, new), 2)
+        self.assertEqual(ws.range("E5").value, "ea")
+        self.assertIsNone(ws.range("E11").value)
+        self.assertEqual(ws.range("E10").value, "lot")
+
+    def test_fill_formula_rewrites_only_changed_rows(self):
+        import functions
+
+        ws = self.wb.sheets["CCTV"]
+        self.assertGreater(functions.fill_formula(ws), 0)
+        self.assertEqual(functions.fill_formula(ws), 0)
+
+        # The cleared row, then rows 12:13 of the 9 column groups for the
+        # new line and its Title marker below
+        ws.range("N6:O6").clear_contents()
+        ws.range("C12:K12").value = ["Disk", 2, "ea", None, None, None, None, "USD", 10]
+        self.assertEqual(functions.fill_formula(ws), 11)
+        self.assertEqual(ws.range("N6").formula, '=IF(K6<>"",K6*(1-M6),"")')
+        self.assertEqual(ws.range("AL14").value, "Title")
+        self.assertEqual(functions.fill_formula(ws), 0)
+        incremental = ws.range("A1:AW14").formula
+
+        functions.fill_formula(ws, incremental=False)
+        self.assertEqual(ws.range("A1:AW14").formula, incremental)
+
+
+class TestProfiler(OfflineWorkbookTestCase):
+    """Tests for the Excel call profiler in profiler.py."""
+
+    def test_calls_are_counted_per_function(self):
+        import functions
+        from profiler import TOP_LEVEL, Profiler, payload_size
+
+        original = functions.fill_formula
+        profile = Profiler()
+        with profile.instrument(functions):
+            wb = profile.wrap(self.wb)
+            functions.fill_formula_wb(wb)
+            wb.sheets["CCTV"].range("C3").value
+        self.assertIs(functions.fill_formula, original)
+
+        report = profile.report(operation="test")
+        stats = report["functions"]["fill_formula"]
+        self.assertEqual(stats["invocations"], len(self.wb.sheet_names))
+        self.assertGreater(stats["com_calls"], 0)
+        self.assertGreater(stats["com_bytes"], 0)
+        self.assertGreaterEqual(report["functions"]["fill_formula_wb"]["seconds"],
+                                stats["seconds"])  # fmt: skip
+        # .sheets, ["CCTV"], .range("C3") and .value
+        self.assertEqual(report["functions"][TOP_LEVEL]["com_calls"], 4)
+        self.assertIn("Range.formula_r1c1", report["operations"])
+        self.assertEqual(report["operation"], "test")
+        self.assertIsInstance(report["caches"], dict)
+        self.assertEqual(payload_size([["ab", 1], [None, "é"]]), 12)
+
+    def test_text_cache_hits_are_reported(self):
+        import normalize
+        from profiler import Profiler
+
+        normalize.CACHES["functions.title_case_ignore_double_char"].clear()
+        profile = Profiler()
+        for _ in range(3):
+            title_case_ignore_double_char("profiled text cache")
+        stats = profile.report()["caches"]["functions.title_case_ignore_double_char"]
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertEqual(stats["hit_rate"], 0.6667)
+
+    def test_proxy_gives_the_same_results(self):
+        import functions
+        from profiler import Profiler
+
+        wb = Profiler().wrap(self.wb)
+        ws = wb.sheets["CCTV"]
+        self.assertEqual(functions.get_last_row(ws), 11)
+        self.assertEqual(ws.range("C4:C5").value, ["cameras", "Dome camera"])
+        self.assertEqual(wb.sheets[ws.name], ws)
+        self.assertIn("CCTV", [sheet.name for sheet in wb.sheets])
+        ws.range("D6").value = 2
+        self.assertEqual(self.wb.sheets["CCTV"].range("D6").value, 2)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Tests for the synthetic workbooks and pipeline timing in benchmark.py."""
+
+    def test_generated_workbook_runs_through_pipeline(self):
+        import openpyxl
+        import benchmark
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = benchmark.generate_workbook(Path(tmp, "a.xlsx"), 2, 30, seed=1)
+            again = benchmark.generate_workbook(Path(tmp, "b.xlsx"), 2, 30, seed=1)
+            xl = openpyxl.load_workbook(path)
+            self.assertEqual(xl.sheetnames, ["Config", "Cover", "Summary", "CCTV", "ACCESS"])
+            ws = xl["CCTV"]
+            self.assertGreaterEqual(ws.max_row, 33)
+            self.assertEqual(
+                [[c.value for c in row] for row in ws.iter_rows()],
+                [[c.value for c in row] for row in openpyxl.load_workbook(again)["CCTV"].iter_rows()],
+            )  # fmt: skip
+
+            times = benchmark.run_pipeline(str(path))
+            self.assertEqual(list(times), benchmark.STAGES)
+            summary = openpyxl.load_workbook(path)["Summary"]
+            self.assertEqual(summary["C20"].value, "='CCTV'!$C$3")
+            self.assertEqual(summary["C21"].value, "='ACCESS'!$C$3")
+
+    def test_compare_reports_slower_stages(self):
+        from benchmark import compare
+
+        baseline = {"sizes": {"100": {"summary": 1.0, "save": 0.01, "total": 2.0}}}
+        results = {"sizes": {"100": {"summary": 1.5, "save": 0.03, "total": 2.1}}}
+        self.assertEqual(compare(results, baseline), [("100", "summary", 1.0, 1.5)])
+        self.assertEqual(compare(results, baseline, threshold=0.6), [])
+
+        baseline["startup"] = {"excel": 0.5}
+        results["startup"] = {"excel": 0.7}
+        self.assertIn(("startup", "excel", 0.5, 0.7), compare(results, baseline))
+
+    def test_parse_importtime(self):
+        from benchmark import parse_importtime
+
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:      3074 |      61807 | site\n"
+            "import time:       120 |        120 |     numpy.core\n"
+            "import time:      2429 |      75938 |   numpy\n"
+            "import time:       406 |        406 |   checklist_collections\n"
+            "import time:      1231 |      77575 | excel\n"
+        )
+        seconds, children = parse_importtime(output, "excel")
+        self.assertAlmostEqual(seconds, 0.077575)
+        self.assertEqual(children, {"numpy": 0.075938, "checklist_collections": 0.000406})
+        with self.assertRaises(ValueError):
+            parse_importtime(output, "mini")
+
+
+class TestWorker(unittest.TestCase):
+    """Tests for the mini serve worker in worker.py."""
+
+    def setUp(self):
+        import threading
+        from unittest import mock
+
+        import worker
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(
+            worker, "WORKER_FILE", Path(self.tmpdir.name) / "worker.json"
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmpdir.cleanup)
+        self.jobs = []
+        ready = threading.Event()
+        self.thread = threading.Thread(
+            target=worker.serve,
+            args=(self.run_job,),
+            kwargs={"on_ready": lambda address: ready.set()},
+        )
+        self.thread.start()
+        ready.wait(5)
+
+    def tearDown(self):
+        import worker
+
+        worker.stop()
+        self.thread.join(5)
+
+    def run_job(self, job):
+        import click
+
+        self.jobs.append(job)
+        click.echo(f"Opening: {job['file']}")
+        if job["file"] == "bad.xlsx":
+            raise ValueError("not a workbook")
+        return True
+
+    def test_jobs_run_in_worker_with_output(self):
+        import io
+        from contextlib import redirect_stderr, redirect_stdout
+
+        import worker
+
+        self.assertTrue(worker.running())
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            self.assertTrue(worker.submit({"command": "fix", "file": "a.xlsx"}))
+            self.assertFalse(worker.submit({"command": "fix", "file": "bad.xlsx"}))
+        self.assertEqual(out.getvalue(), "Opening: a.xlsx\nOpening: bad.xlsx\n")
+        self.assertIn("ValueError: not a workbook", err.getvalue())
+        self.assertEqual(len(self.jobs), 2)
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "POSIX file modes")
+    def test_info_file_others_can_use_is_ignored(self):
+        import worker
+
+        self.assertEqual(worker.WORKER_FILE.stat().st_mode & 0o777, 0o600)
+        self.assertTrue(worker.running())
+        worker.WORKER_FILE.chmod(0o644)
+        self.assertIsNone(worker.submit({"command": "fix", "file": "a.xlsx"}))
+        worker.WORKER_FILE.chmod(0o600)
+        self.assertEqual(self.jobs, [])
+
+    def test_no_worker_after_stop(self):
+        import worker
+
+        self.assertTrue(worker.stop())
+        self.thread.join(5)
+        self.assertFalse(worker.WORKER_FILE.exists())
+        self.assertIsNone(worker.submit({"command": "fix", "file": "a.xlsx"}))
+        self.assertFalse(worker.stop())
+
+
+class TestBatch(OfflineWorkbookTestCase):
+    """Tests for mini batch (one workbook per process)."""
+
+    def test_batch_files(self):
+        from mini import batch_files
+
+        folder = Path(self.tmpdir.name)
+        (folder / "~$proposal.xlsx").write_text("lock")
+        (folder / "notes.txt").write_text("notes")
+        (folder / "sub").mkdir()
+        (folder / "sub" / "other.xlsm").write_bytes(self.path.read_bytes())
+        self.assertEqual(batch_files(str(folder)), [str(self.path.resolve())])
+        self.assertEqual(
+            [Path(f).name for f in batch_files(str(folder / "**" / "*.xls*"))],
+            ["proposal.xlsx", "other.xlsm"],
+        )
+
+    def test_batch_file_runs_ops_and_skips_after_failure(self):
+        from unittest import mock
+
+        from mini import batch_file
+
+        # Keep the saved text caches out of the user cache directory
+        cache = Path(self.tmpdir.name) / "text_cache.json"
+        patcher = mock.patch("normalize.cache_path", return_value=cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        results, output = batch_file(str(self.path), ["fix", "summary"], True, False)
+        self.assertEqual([(op, status) for op, status, _ in results],
+                         [("fix", "ok"), ("summary", "ok")])  # fmt: skip
+        self.assertIn("[TIME] fix_workbook completed", output)
+
+        bad = Path(self.tmpdir.name) / "bad.xlsx"
+        bad.write_text("not a workbook")
+        results, output = batch_file(str(bad), ["fix", "summary"], True, False)
+        self.assertEqual([(op, status) for op, status, _ in results],
+                         [("fix", "failed"), ("summary", "skipped")])  # fmt: skip
+        self.assertIn("[ERROR]", output)
+
+
+    def test_batch_app_leaves_a_shared_excel_running(self):
+        from unittest import mock
+
+        import mini
+
+        def run(platform, running):
+            apps = mock.MagicMock()
+            apps.__bool__.return_value = running
+            with mock.patch.object(mini.sys, "platform", platform), mock.patch(
+                "xlwings.apps", apps
+            ), mock.patch("xlwings.App") as new_app:
+                with mini.batch_app() as app:
+                    self.assertIs(mini.BATCH_APP, app)
+            self.assertIsNone(mini.BATCH_APP)
+            return app is new_app.return_value, app.quit.called
+
+        # Only an app the process started is quit
+        self.assertEqual(run("darwin", True), (False, False))
+        self.assertEqual(run("darwin", False), (True, True))
+        self.assertEqual(run("win32", True), (True, True))
+
+    def test_batch_app_uses_its_own_personal_macros(self):
+        from unittest import mock
+
+        import functions
+        import mini
+
+        personal = Path(self.tmpdir.name) / "PERSONAL.XLSB"
+        with mock.patch.object(mini.sys, "platform", "win32"), mock.patch(
+            "xlwings.App"
+        ), mock.patch("xlwings.Book") as other, mock.patch.object(
+            functions, "personal_macro_path", return_value=personal
+        ):
+            with mini.batch_app() as app:
+                # Not the PERSONAL.XLSB of another (interactive) Excel
+                self.assertIs(functions.get_macro_nb(), app.books.open.return_value)
+            app.books.open.assert_called_once_with(str(personal), read_only=True)
+            other.assert_not_called()
+            self.assertFalse(mini.shared_excel(["fix"]))
+        with mock.patch.object(mini.sys, "platform", "win32"), mock.patch.object(
+            functions, "personal_macro_path", return_value=None
+        ):
+            # No XLSTART copy: the running Excel, one process at a time
+            self.assertTrue(mini.shared_excel(["fix"]))
+
+
+class TestExport(OfflineWorkbookTestCase):
+    """Tests for mini export (several outputs from one snapshot)."""
+
+    def test_export_outputs(self):
+        from mini import export_outputs
+
+        folder = Path(self.tmpdir.name)
+        self.assertEqual(
+            [p.name for p in export_outputs(str(self.path), "commercial")],
+            ["Commercial proposal.xlsx", "Commercial proposal.pdf"],
+        )
+        self.assertEqual(
+            [p.name for p in export_outputs(str(self.path), "internal")],
+            ["Internal proposal.xlsx"],
+        )
+        commercial = str(folder / "Commercial proposal.xlsm")
+        self.assertEqual(
+            export_outputs(commercial, "technical"),
+            [folder / "Technical proposal.xlsx", folder / "Technical proposal.pdf"],
+        )
+
+    def test_existing_outputs_are_not_overwritten(self):
+        import io
+        from contextlib import redirect_stderr, redirect_stdout
+
+        from mini import run_export
+
+        (Path(self.tmpdir.name) / "Technical proposal.pdf").write_text("pdf")
+        output = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(output):
+            self.assertFalse(run_export(str(self.path), ["commercial", "technical"]))
+        output = output.getvalue()
+        self.assertIn("[ERROR] Already exists: Technical proposal.pdf", output)
+        self.assertNotIn("Opening", output)
+
+    def test_export_file_runs_in_the_batch_app(self):
+        from unittest import mock
+
+        import mini
+
+        with mock.patch.object(mini, "batch_app") as batch_app, mock.patch.object(
+            mini, "run_export_op", return_value=True
+        ), mock.patch.object(mini, "text_cache"):
+            result, _ = mini.export_file(str(self.path), "internal", "out", False, True)
+        # The ops use the macros of the app they run in (or the shared one)
+        batch_app.assert_called_once_with(True)
+        self.assertEqual(result[:2], ("internal", "ok"))
+        self.assertIn("internal", mini.MACRO_OPS)
+
+    def test_outputs_are_saved_with_automatic_calculation(self):
+        from unittest import mock
+
+        import functions
+        import mini
+
+        app, wb = mock.MagicMock(calculation="manual"), mock.MagicMock()
+        modes = []
+        with mock.patch.object(
+            mini, "open_workbook", return_value=(app, wb, False, True)
+        ), mock.patch.object(
+            functions,
+            "internal_costing",
+            side_effect=lambda wb, directory: modes.append(app.calculation),
+        ), mock.patch.object(mini, "export_outputs", return_value=[]), mock.patch.object(
+            mini, "write_profile"
+        ):
+            self.assertTrue(mini.run_export_op(str(self.path), "internal", "out"))
+        # Not the manual calculation of the snapshot copy
+        self.assertEqual(modes, ["automatic"])
+        self.assertEqual(app.calculation, "manual")
+
+
+class TestDeleteEmptyRows(OfflineWorkbookTestCase):
+    """Tests for delete_extra_empty_row and its run detection."""
+
+    @staticmethod
+    def legacy_runs(data):
+        """The row-by-row scan delete_extra_empty_row used before."""
+        empty = [all(cell is None or cell == "" for cell in row) for row in data]
+        runs = []
+        i = 0
+        while i < len(empty):
+            if empty[i]:
+                start = i
+                while i < len(empty) and empty[i]:
+                    i += 1
+                if i - start >= 2:
+                    runs.append((start + 2, i))
+            else:
+                i += 1
+        return runs
+
+    def test_runs_match_row_by_row_scan(self):
+        import random
+
+        from functions import empty_row_runs
+
+        rng = random.Random(0)
+        for _ in range(200):
+            data = [
+                [rng.choice([None, None, None, "", "x", 0]) for _ in range(8)]
+                for _ in range(rng.randint(1, 40))
+            ]
+            self.assertEqual(empty_row_runs(data), self.legacy_runs(data), data)
+
+    def test_areas_are_short_and_bottom_first(self):
+        from functions import row_areas
+
+        runs = [(row, row + 1) for row in range(10, 2000, 7)]
+        areas = row_areas(runs, limit=40)
+        self.assertTrue(all(len(address) <= 40 for address in areas))
+        parts = [part for address in areas for part in address.split(",")]
+        self.assertEqual(sorted(parts), sorted(f"{a}:{b}" for a, b in runs))
+        self.assertEqual(areas[0].split(",")[-1], "1998:1999")
+        self.assertEqual(row_areas([]), [])
+
+    def test_rows_deleted_at_once_and_second_call_deletes_nothing(self):
+        import functions
+
+        ws = self.wb.sheets["CCTV"]
+        ws.range("C14").value = "Switch"
+        ws.range("C18").value = "Cable"
+        self.assertEqual(functions.delete_extra_empty_row_wb(self.wb), 2 + 1 + 2)
+        column = ws.range("C3:C12").value
+        self.assertEqual(column, ["cctv system", "cameras", "Dome camera", "- bracket",
+                                  None, "Recorder", "NVR", None, "Switch", None])  # fmt: skip
+        self.assertEqual(ws.range("C13").value, "Cable")
+        self.assertEqual(functions.delete_extra_empty_row_wb(self.wb), 0)
+
+    def test_offline_areas_delete_like_excel(self):
+        ws = self.wb.sheets["CCTV"]
+        ws.range("C3:C13").options(transpose=True).value = list(range(3, 14))
+        ws.range("5:6,9:9,11:12").delete(shift="up")
+        self.assertEqual(ws.range("C3:C8").value, [3, 4, 7, 8, 10, 13])
+
+
+class TestFreezeValues(OfflineWorkbookTestCase):
+    """The export freeze: one calculation, then values only."""
+
+    def test_system_sheets_are_frozen_once_calculated(self):
+        import functions
+
+        functions.delete_extra_empty_row_wb(self.wb)
+        functions.fill_formula_wb(self.wb)
+        functions.fill_lastrow(self.wb)
+        self.app.calculate()
+        ws = self.wb.sheets["CCTV"]
+        # Formulas giving "" leave empty cells, as in Excel
+        expected = ws.range("A1:AL11").options(ndim=2, empty="").value
+
+        with functions.manual_calculation(self.wb):
+            self.assertEqual(self.app.calculation, "manual")
+            last_rows = functions.freeze_system_sheets(self.wb, column="G")
+        self.assertEqual(self.app.calculation, "automatic")
+
+        self.assertEqual(last_rows, {"CCTV": 11})
+        formulas = ws.range("A1:AL11").formula
+        self.assertFalse([f for row in formulas for f in row if f.startswith("=")])
+        self.assertEqual(ws.range("A1:AL11").options(ndim=2, empty="").value, expected)
+        # Columns past last_column keep their formulas
+        self.assertTrue(ws.range("AP5").formula.startswith("="))
+
+
+class TestOfflinePipeline(OfflineWorkbookTestCase):
+    """The fix workbook pipeline in functions.py runs on the offline backend."""
+
+    def test_fix_workbook_and_summary(self):
+        import functions
+        import pricing
+
+        functions.delete_extra_empty_row_wb(self.wb)
+        count, step = functions.get_num_scheme(self.wb)
+        functions.number_title(self.wb, count=count, step=step)
+        functions.fill_formula_wb(self.wb)
+        functions.format_text(self.wb, indent_description=True, bullet_description=True)
+        functions.format_cell_data(self.wb)
+        functions.fill_lastrow(self.wb)
+        functions.hide_columns_wb(self.wb)
+        self.app.calculate()
+
+        ws = self.wb.sheets["CCTV"]
+        self.assertEqual(ws.range("C1500").end("up").row, 9)
+        self.assertEqual(ws.range("A4").value, 10)
+        self.assertEqual(ws.range("A8").value, 20)
+        self.assertEqual(ws.range("C3").value, "CCTV SYSTEM")
+        self.assertEqual(ws.range("C6").value, "   • bracket")
+        self.assertEqual(ws.range("E5").value, "ea")
+
+        values = ws.range("A1:AL10").options(ndim=2).value
+        priced = pricing.price_sheet(values, {"USD": 1.0, "SGD": 1.35}, "SGD")
+        self.assertAlmostEqual(ws.range("G5").value, priced.at[5, "G"])
+        self.assertAlmostEqual(ws.range("G11").value, pricing.sheet_totals(priced)["G"])
+        self.assertEqual(ws.range("G11").formula, "=SUM(G3:G10)")
+        self.assertEqual(ws.range("F11").formula, '="Subtotal(" & Config!B12 & ")"')
+        self.assertEqual(ws.range("AW11").formula, '=IF(AU11<>0,AV11/AU11, "")')
+
+        functions.summary(self.wb, discount=True)
+        summary = self.wb.sheets["Summary"]
+        self.assertEqual(summary.range("C20").value, "CCTV SYSTEM")
+        self.assertAlmostEqual(summary.range("D20").value, ws.range("G11").value)
+
+        # Rebuilding keeps the remarks and lays out the simulation table
+        summary.range("E20").value = "OPTION"
+        functions.summary(self.wb, discount=True, detail=True)
+        self.assertEqual(summary.range("E20").value, "OPTION")
+        self.assertEqual(
+            summary.range("N22").formula, '=SUMIF(E20:E21,"<>OPTION",N20:N21)'
+        )
+        self.assertEqual(summary.range("I26").formula, "=-D23/D22")
+        self.assertEqual(
+            summary.range("J28:J29").formula,
+            (("=CEILING(H28*I28,1)",), ("=CEILING(H29*I29,1)",)),
+        )
+        self.assertEqual(summary.range("I42").value, 0.15)
+        self.assertIsNone(summary.range("H43").value)
+
+        self.wb.save()
+        reopened = type(self.wb)(self.path)
+        self.assertEqual(
+            reopened.sheets["CCTV"].range("N5").formula, '=IF(K5<>"",K5*(1-M5),"")'
+        )
+
+
 if __name__ == "__main__":
     # Run tests with verbosity
     unittest.main(verbosity=2)
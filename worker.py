@@ -0,0 +1,190 @@
+"""
+Background worker for the mini CLI.
+© Thiha Aung (infowizard@gmail.com)
+
+`mini serve` keeps one process running with pandas, xlwings and functions.py
+imported, the Excel app attached and the PERSONAL.XLSB range cache filled.
+The other mini commands submit their job to it over a local socket and only
+print what it sends back, so they skip the imports and Excel start up.
+
+    worker.serve(run_job)              # in `mini serve`
+    success = worker.submit(job)       # None when no worker is running
+
+Jobs are dicts of the command and its options (see mini.run_job) and run
+one at a time. Their output is streamed to the client as it is written.
+The address and a random key for the connection are kept in WORKER_FILE,
+under the user cache directory and readable only by the user. Clients
+ignore the file unless it belongs to them and nobody else can read or write
+it: connections unpickle what they receive. This module only uses the
+standard library so that clients start fast.
+
+Restart the worker after updating the code: it keeps running what it
+imported when it started.
+"""
+
+import io
+import json
+import os
+import secrets
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+from rfq_index import cache_dir
+
+WORKER_FILE = cache_dir() / "worker.json"
+HOST = "127.0.0.1"
+# Requests handled by the worker itself
+STOP = "stop"
+PING = "ping"
+
+
+class _Stream(io.TextIOBase):
+    """Text stream sending what is written to the client."""
+
+    encoding = "utf-8"
+
+    def __init__(self, conn, err=False):
+        self.conn = conn
+        self.err = err
+        self.connected = True
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if not isinstance(text, str):
+            # Also tells click that this is a text stream
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        if text and self.connected:
+            try:
+                self.conn.send(("out", text, self.err))
+            except OSError:
+                # Client went away (e.g. Ctrl+C): finish the job anyway
+                self.connected = False
+        return len(text)
+
+
+def _write_info(address, authkey):
+    """Write WORKER_FILE, readable by the current user only."""
+    info = {"address": list(address), "authkey": authkey.hex(), "pid": os.getpid()}
+    WORKER_FILE.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    temp = WORKER_FILE.with_name(f".{WORKER_FILE.name}.{os.getpid()}.tmp")
+    temp.unlink(missing_ok=True)
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    os.replace(temp, WORKER_FILE)
+
+
+def _read_info():
+    """The contents of WORKER_FILE, or None if it is missing or not trusted."""
+    try:
+        with open(WORKER_FILE, encoding="utf-8") as f:
+            if not _private(os.fstat(f.fileno())):
+                return None
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _private(stat):
+    """Whether a file is owned by the current user and only they can use it."""
+    if not hasattr(os, "getuid"):
+        # Windows: the user cache directory is private to the user
+        return True
+    return stat.st_uid == os.getuid() and stat.st_mode & 0o077 == 0
+
+
+def serve(run_job, port=0, on_ready=None):
+    """
+    Run jobs submitted by clients until a stop request. run_job(job) returns
+    True on success; its output goes to the client that submitted the job.
+    """
+    authkey = secrets.token_bytes(32)
+    with Listener((HOST, port), authkey=authkey) as listener:
+        _write_info(listener.address, authkey)
+        if on_ready is not None:
+            on_ready(listener.address)
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, OSError):
+                    continue
+                with conn:
+                    try:
+                        job = conn.recv()
+                    except (EOFError, OSError):
+                        continue
+                    if job.get("command") in (STOP, PING):
+                        conn.send(("done", True))
+                        if job["command"] == STOP:
+                            break
+                        continue
+                    _run(conn, run_job, job)
+        finally:
+            if (_read_info() or {}).get("pid") == os.getpid():
+                WORKER_FILE.unlink(missing_ok=True)
+
+
+def _run(conn, run_job, job):
+    """Run one job with its output sent to conn."""
+    out, err = _Stream(conn), _Stream(conn, err=True)
+    with redirect_stdout(out), redirect_stderr(err):  # type: ignore[type-var]
+        try:
+            success = bool(run_job(job))
+        except SystemExit as e:
+            success = not e.code
+        except Exception:
+            traceback.print_exc()
+            success = False
+    if out.connected:
+        try:
+            conn.send(("done", success))
+        except OSError:
+            pass
+
+
+def submit(job):
+    """
+    Run job in the worker, printing its output here. Returns its success, or
+    None if no worker is running.
+    """
+    info = _read_info()
+    if info is None:
+        return None
+    try:
+        conn = Client(tuple(info["address"]), authkey=bytes.fromhex(info["authkey"]))
+    except ConnectionRefusedError:
+        # Worker was killed without cleaning up
+        WORKER_FILE.unlink(missing_ok=True)
+        return None
+    except (AuthenticationError, OSError, KeyError, ValueError):
+        return None
+
+    with conn:
+        conn.send(job)
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                print("[ERROR] The worker stopped during the job.", file=sys.stderr)
+                return False
+            if message[0] == "done":
+                return message[1]
+            _, text, err = message
+            stream = sys.stderr if err else sys.stdout
+            stream.write(text)
+            stream.flush()
+
+
+def running():
+    """Whether a worker is running and answering."""
+    return submit({"command": PING}) is not None
+
+
+def stop():
+    """Stop the running worker. Returns False if there is none."""
+    return submit({"command": STOP}) is not None